@@ -3,6 +3,7 @@ from sqlalchemy import select, update
 from app.database import SessionLocal
 from app.modelo import Usuario
 from app.seguranca import gerar_hash_senha
+from app import notificacoes, jobs
 
 async def listar_usuarios():
     async with SessionLocal() as db:
@@ -44,14 +45,51 @@ async def resetar_senha():
         usuario.senha_hash = novo_hash
         
         db.add(usuario)
+        # derruba o usuário do cache de autenticação de todos os workers da API (entregue no commit)
+        await notificacoes.notificar(db, notificacoes.CANAL_USUARIOS, target_email)
         await db.commit()
         print(f" A senha de '{target_email}' foi atualizada")
 
+async def remover_usuario():
+    target_email = input("\nDigite o usuário a ser removido: ").strip()
+    
+    async with SessionLocal() as db:
+        usuario = await db.scalar(select(Usuario).where(Usuario.email == target_email))
+        
+        if not usuario:
+            print(f"Erro: Usuário '{target_email}' não encontrado.")
+            return
+
+        confirmacao = input(f"Confirma a remoção de '{target_email}'? (s/N): ").strip().lower()
+        if confirmacao != "s":
+            print("Operação cancelada.")
+            return
+
+        await db.delete(usuario)
+        await notificacoes.notificar(db, notificacoes.CANAL_USUARIOS, target_email)
+        await db.commit()
+        print(f" O usuário '{target_email}' foi removido")
+
+async def reconstruir_rollup():
+    # ação de operador: a reconstrução trava as escritas em 'titulos' enquanto roda
+    # vai para a fila de jobs (app/jobs.py); se já houver uma pendente ou rodando, ela é reaproveitada
+    confirmacao = input("A reconstrução bloqueia as escritas em títulos enquanto roda. Enfileirar? (s/N): ").strip().lower()
+    if confirmacao != "s":
+        print("Operação cancelada.")
+        return
+
+    async with SessionLocal() as db:
+        job = await jobs.enfileirar(db, "reconstruir_rollup", {})
+        await db.commit()
+        print(f" Job #{job.id} de reconstrução do rollup: {job.status} (criado em {job.data_criacao:%d/%m/%Y %H:%M:%S})")
+
 async def menu():
     while True:
         print("\nFERRAMENTAS ADMINISTRATIVAS")
         print("1. Listar Usuários")
         print("2. Resetar Senha de um Usuário")
+        print("3. Remover Usuário")
+        print("4. Reconstruir Rollup do Dashboard (fila de jobs)")
         print("0. Sair")
         
         op = input("Opção: ").strip()
@@ -60,6 +98,10 @@ async def menu():
             await listar_usuarios()
         elif op == "2":
             await resetar_senha()
+        elif op == "3":
+            await remover_usuario()
+        elif op == "4":
+            await reconstruir_rollup()
         elif op == "0":
             break
         else:
@@ -0,0 +1,246 @@
+import asyncio
+import sys
+from collections import defaultdict
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import select, func, delete, text, and_, case, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modelo import Titulo, ResumoMensal, SaldoContato
+from app import versao
+
+# Manutenção incremental dos rollups 'resumo_mensal' e 'saldo_contato'.
+#
+# Toda escrita em 'titulos' (inserção, troca de status, alteração de valor/data)
+# deve chamar aplicar_deltas() ANTES do commit, na mesma sessão, para que o
+# rollup e a tabela bruta fiquem consistentes na mesma transação. A mesma chamada
+# avança a versão dos dados (app/versao.py), invalidando ETags e respostas em cache.
+# O comando 'verificar' compara o rollup com a tabela bruta e 'reconstruir'
+# recalcula tudo do zero:
+#
+#   python -m app.agregados verificar
+#   python -m app.agregados reconstruir
+
+COLUNAS_CHAVE = ("mes", "tipo", "status", "categoria_id", "conta_bancaria_id")
+COLUNAS_CHAVE_SALDO = ("contato_id", "tipo")
+
+# status que contam como saldo em aberto de um contato
+STATUS_ABERTOS = ("PENDENTE", "VENCIDO")
+
+
+def _valor_str(valor) -> str:
+    # enums (str, Enum) e strings puras viram o mesmo valor na chave
+    return getattr(valor, "value", valor)
+
+
+def chave_resumo(titulo) -> tuple:
+    # aceita objetos Titulo do ORM ou linhas (Row) com os mesmos atributos
+    return (
+        titulo.data_vencimento.replace(day=1),
+        _valor_str(titulo.tipo),
+        _valor_str(titulo.status),
+        titulo.categoria_id,
+        titulo.conta_bancaria_id,
+    )
+
+
+async def aplicar_deltas(db: AsyncSession, removidos: Iterable = (), adicionados: Iterable = ()):
+
+    # subtrai do rollup os estados antigos ('removidos') e soma os novos ('adicionados')
+    # ex: troca de status de PENDENTE para PAGO = removidos=[antes], adicionados=[depois]
+    # tudo vira um único INSERT ... ON CONFLICT DO UPDATE, independente do volume
+
+    await versao.registrar_escrita(db)
+
+    deltas = defaultdict(lambda: [Decimal(0), 0])
+    deltas_saldo = defaultdict(lambda: [Decimal(0), 0])
+    for sinal, titulos in ((-1, removidos), (1, adicionados)):
+        for t in titulos:
+            d = deltas[chave_resumo(t)]
+            d[0] += sinal * t.valor
+            d[1] += sinal
+            if _valor_str(t.status) in STATUS_ABERTOS:
+                d = deltas_saldo[(t.contato_id, _valor_str(t.tipo))]
+                d[0] += sinal * t.valor
+                d[1] += sinal
+
+    await _upsert_deltas(db, ResumoMensal, COLUNAS_CHAVE, "total", "quantidade", deltas)
+    await _upsert_deltas(db, SaldoContato, COLUNAS_CHAVE_SALDO, "total_aberto", "quantidade_aberta", deltas_saldo)
+
+
+async def _upsert_deltas(db: AsyncSession, modelo, colunas_chave, col_total, col_qtd, deltas: dict):
+    # ordena as chaves para que transações concorrentes travem as linhas na mesma ordem (sem deadlock)
+    linhas = [
+        {**dict(zip(colunas_chave, chave)), col_total: total, col_qtd: qtd}
+        for chave, (total, qtd) in sorted(deltas.items())
+        if total != 0 or qtd != 0
+    ]
+    if not linhas:
+        return
+
+    stmt = insert(modelo).values(linhas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(colunas_chave),
+        set_={
+            col_total: getattr(modelo, col_total) + stmt.excluded[col_total],
+            col_qtd: getattr(modelo, col_qtd) + stmt.excluded[col_qtd],
+        },
+    )
+    await db.execute(stmt)
+
+
+async def registrar_insercao(db: AsyncSession, titulos: Iterable):
+    await aplicar_deltas(db, adicionados=titulos)
+
+
+def _select_agregado_bruto():
+    # mesma agregação do rollup, calculada direto da tabela 'titulos'
+    # 'month' literal (sem bind param) para o GROUP BY casar com a expressão do SELECT
+    mes = func.date_trunc(literal_column("'month'"), Titulo.data_vencimento).cast(ResumoMensal.mes.type)
+    return (
+        select(
+            mes.label("mes"),
+            Titulo.tipo.label("tipo"),
+            Titulo.status.label("status"),
+            Titulo.categoria_id.label("categoria_id"),
+            Titulo.conta_bancaria_id.label("conta_bancaria_id"),
+            func.sum(Titulo.valor).label("total"),
+            func.count().label("quantidade"),
+        )
+        .group_by(mes, Titulo.tipo, Titulo.status, Titulo.categoria_id, Titulo.conta_bancaria_id)
+    )
+
+
+def _select_saldo_bruto():
+    # saldo em aberto por contato/tipo direto de 'titulos'
+    # contatos sem nada em aberto também geram linha (zerada): assim a tabela só fica vazia
+    # quando não existe nenhum título, o que garantir_resumo() usa para detectar bancos antigos
+    aberto = Titulo.status.in_(STATUS_ABERTOS)
+    return (
+        select(
+            Titulo.contato_id.label("contato_id"),
+            Titulo.tipo.label("tipo"),
+            func.coalesce(func.sum(case((aberto, Titulo.valor))), 0).label("total_aberto"),
+            func.count(case((aberto, 1))).label("quantidade_aberta"),
+        )
+        .group_by(Titulo.contato_id, Titulo.tipo)
+    )
+
+
+async def reconstruir(db: AsyncSession) -> int:
+
+    # recalcula os rollups inteiros a partir de 'titulos'
+    # SHARE MODE bloqueia escritas em 'titulos' durante a reconstrução (leituras seguem livres)
+
+    await db.execute(text("LOCK TABLE titulos IN SHARE MODE"))
+    await db.execute(delete(ResumoMensal))
+    await db.execute(delete(SaldoContato))
+    result = await db.execute(
+        insert(ResumoMensal).from_select([*COLUNAS_CHAVE, "total", "quantidade"], _select_agregado_bruto())
+    )
+    inseridas = result.rowcount
+    result = await db.execute(
+        insert(SaldoContato).from_select(
+            [*COLUNAS_CHAVE_SALDO, "total_aberto", "quantidade_aberta"], _select_saldo_bruto()
+        )
+    )
+    inseridas += result.rowcount
+    # os totais podem ter mudado (é para isso que se reconstrói): invalida respostas em cache/ETags
+    await versao.registrar_escrita(db)
+    await db.commit()
+    return inseridas
+
+
+async def _divergencias(db: AsyncSession, select_bruto, modelo, colunas_chave, col_total, col_qtd) -> list:
+    bruto = select_bruto.subquery("bruto")
+    rollup = select(modelo).subquery("rollup")
+    condicao_join = and_(*[bruto.c[col] == rollup.c[col] for col in colunas_chave])
+
+    query = (
+        select(
+            *[func.coalesce(bruto.c[col], rollup.c[col]).label(col) for col in colunas_chave],
+            bruto.c[col_total].label("total_bruto"),
+            rollup.c[col_total].label("total_rollup"),
+            bruto.c[col_qtd].label("quantidade_bruta"),
+            rollup.c[col_qtd].label("quantidade_rollup"),
+        )
+        .select_from(bruto.join(rollup, condicao_join, full=True))
+        .where(
+            func.coalesce(bruto.c[col_total], 0).is_distinct_from(func.coalesce(rollup.c[col_total], 0))
+            | func.coalesce(bruto.c[col_qtd], 0).is_distinct_from(func.coalesce(rollup.c[col_qtd], 0))
+        )
+    )
+    result = await db.execute(query)
+    return [{"tabela": modelo.__tablename__, **row._mapping} for row in result.all()]
+
+
+async def verificar(db: AsyncSession) -> list:
+
+    # retorna as chaves onde os rollups divergem da tabela bruta (lista vazia = consistente)
+    # linhas do rollup zeradas equivalem a ausência na tabela bruta
+
+    return (
+        await _divergencias(
+            db, _select_agregado_bruto(), ResumoMensal, COLUNAS_CHAVE, "total", "quantidade"
+        )
+        + await _divergencias(
+            db, _select_saldo_bruto(), SaldoContato, COLUNAS_CHAVE_SALDO, "total_aberto", "quantidade_aberta"
+        )
+    )
+
+
+async def garantir_resumo(db: AsyncSession):
+    # usado no startup: popula os rollups em bancos que já tinham títulos antes deles existirem
+    tem_resumo = await db.scalar(select(select(ResumoMensal.mes).exists()))
+    tem_saldo = await db.scalar(select(select(SaldoContato.contato_id).exists()))
+    if tem_resumo and tem_saldo:
+        return
+    tem_titulos = await db.scalar(select(select(Titulo.id).exists()))
+    if tem_titulos:
+        await reconstruir(db)
+
+
+async def _cli(comando: str):
+    from app.database import SessionLocal
+
+    async with SessionLocal() as db:
+        if comando == "reconstruir":
+            inseridas = await reconstruir(db)
+            print(f"Rollup reconstruído: {inseridas} linhas.")
+            return 0
+
+        divergencias = await verificar(db)
+        if not divergencias:
+            print("Rollup consistente com a tabela 'titulos'.")
+            return 0
+
+        print(f"{len(divergencias)} divergência(s) encontrada(s):")
+        for d in divergencias:
+            if d["tabela"] == ResumoMensal.__tablename__:
+                chave = f"{d['mes']} {d['tipo']:<8} {d['status']:<9} cat={d['categoria_id']} conta={d['conta_bancaria_id']}"
+            else:
+                chave = f"contato={d['contato_id']} {d['tipo']:<8}"
+            print(
+                f"  [{d['tabela']}] {chave}"
+                f" | bruto={d['total_bruto']} ({d['quantidade_bruta']})"
+                f" rollup={d['total_rollup']} ({d['quantidade_rollup']})"
+            )
+        print("Execute 'python -m app.agregados reconstruir' para corrigir.")
+        return 1
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else "verificar"
+    if comando not in ("verificar", "reconstruir"):
+        print("Uso: python -m app.agregados [verificar|reconstruir]")
+        sys.exit(2)
+
+    sys.exit(asyncio.run(_cli(comando)))
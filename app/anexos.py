@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import AsyncIterator
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+# Armazenamento dos anexos em disco, endereçado pelo conteúdo.
+#
+# Cada arquivo é gravado uma única vez em ANEXOS_DIR/ab/cd/<sha256>: o mesmo boleto anexado a
+# vários títulos vira vários registros em 'anexos' apontando para o mesmo arquivo.
+#
+# Upload: o corpo da requisição é lido em pedaços e gravado num temporário enquanto o SHA-256
+# é calculado (hash + write em thread, blocos de TAMANHO_BLOCO); nenhum momento tem o arquivo
+# inteiro em memória. No fim, o temporário é renomeado para o caminho do hash (os.replace é
+# atômico) ou descartado se o conteúdo já existia.
+#
+# Download: FileResponse do Starlette, com suporte a Range (206, If-Range) e, em servidores
+# ASGI com a extensão 'http.response.pathsend' (ex: Granian, Hypercorn), envio pelo próprio
+# servidor via sendfile; no uvicorn, leitura em blocos de TAMANHO_BLOCO fora do event loop.
+#
+# Não há coleta de arquivos órfãos: um upload cujo registro em 'anexos' não chega a ser criado
+# (título excluído durante o envio, conexão perdida depois do gravar) deixa o arquivo no
+# diretório. Uma varredura teria que comparar com anexos.sha256 sem correr com um upload do
+# mesmo conteúdo em andamento; por ora, arquivos sem registro ocupam espaço mas são inofensivos.
+
+DIRETORIO_ANEXOS = os.getenv("ANEXOS_DIR", "dados/anexos")
+TAMANHO_MAX_ANEXO = int(os.getenv("ANEXOS_TAMANHO_MAX_MB", "200")) * 1024 * 1024
+TAMANHO_BLOCO = 1024 * 1024
+
+
+class AnexoGrandeDemais(Exception):
+    pass
+
+
+def caminho_relativo(sha256: str) -> str:
+    # dois níveis de diretório: nenhuma pasta acumula milhões de arquivos
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def caminho_absoluto(sha256: str) -> str:
+    return os.path.join(DIRETORIO_ANEXOS, caminho_relativo(sha256))
+
+
+def _gravar_bloco(arquivo, hasher, bloco: bytes):
+    # hashlib e write liberam o GIL: rodam em paralelo com o event loop
+    hasher.update(bloco)
+    arquivo.write(bloco)
+
+
+def _publicar(arquivo, caminho_tmp: str, destino: str) -> bool:
+    # retorna True se o conteúdo era novo
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+    arquivo.close()
+    if os.path.exists(destino):
+        os.remove(caminho_tmp)
+        return False
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # dois uploads simultâneos do mesmo conteúdo: ambos renomeiam, o resultado é idêntico
+    os.replace(caminho_tmp, destino)
+    return True
+
+
+async def gravar(fluxo: AsyncIterator[bytes], limite: int = TAMANHO_MAX_ANEXO) -> tuple:
+
+    # consome o fluxo (ex: request.stream()) e devolve (sha256, tamanho, novo)
+    # AnexoGrandeDemais se passar de 'limite' bytes; o temporário é apagado em qualquer falha
+
+    diretorio_tmp = os.path.join(DIRETORIO_ANEXOS, "tmp")
+    os.makedirs(diretorio_tmp, exist_ok=True)
+    fd, caminho_tmp = tempfile.mkstemp(dir=diretorio_tmp)
+    arquivo = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    tamanho = 0
+    pedacos, acumulado = [], 0
+
+    try:
+        async for pedaco in fluxo:
+            tamanho += len(pedaco)
+            if tamanho > limite:
+                raise AnexoGrandeDemais(f"Anexo maior que {limite // (1024 * 1024)} MB.")
+            pedacos.append(pedaco)
+            acumulado += len(pedaco)
+            # o servidor entrega pedaços pequenos (~64 KB): agrupa antes de ir para a thread
+            if acumulado >= TAMANHO_BLOCO:
+                await asyncio.to_thread(_gravar_bloco, arquivo, hasher, b"".join(pedacos))
+                pedacos, acumulado = [], 0
+        if pedacos:
+            await asyncio.to_thread(_gravar_bloco, arquivo, hasher, b"".join(pedacos))
+
+        sha256 = hasher.hexdigest()
+        novo = await asyncio.to_thread(_publicar, arquivo, caminho_tmp, caminho_absoluto(sha256))
+    except BaseException:
+        arquivo.close()
+        try:
+            os.remove(caminho_tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+    return sha256, tamanho, novo
+
+
+class RespostaAnexo(FileResponse):
+
+    # blocos maiores que os 64 KB padrão: menos idas à thread por arquivo grande
+    chunk_size = TAMANHO_BLOCO
+
+
+def responder_download(request: Request, anexo) -> Response:
+
+    # o hash é a ETag: o conteúdo de um caminho nunca muda, então o cliente pode guardar
+    # para sempre e retomar downloads com Range + If-Range
+
+    cabecalhos = {"ETag": f'"{anexo.sha256}"', "Cache-Control": "private, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == cabecalhos["ETag"]:
+        return Response(status_code=304, headers=cabecalhos)
+    return RespostaAnexo(
+        caminho_absoluto(anexo.sha256),
+        media_type=anexo.tipo_conteudo or "application/octet-stream",
+        filename=anexo.nome_arquivo,
+        headers=cabecalhos,
+    )
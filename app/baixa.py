@@ -0,0 +1,62 @@
+from datetime import date
+from types import SimpleNamespace
+from typing import List, Optional
+
+from sqlalchemy import select, update, any_, cast, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import agregados
+from app.consultas import aplicar_filtros_titulos
+from app.modelo import Titulo, StatusTitulo
+from app.schemas import FiltroTitulos
+
+# Baixa (pagamento) em lote de títulos: PENDENTE/VENCIDO -> PAGO com a data de pagamento.
+#
+# Um único UPDATE ... FROM alvo RETURNING, qualquer que seja o volume:
+# - 'alvo' seleciona os títulos em aberto, ORDER BY id + FOR UPDATE: os locks são pegos
+#   sempre na mesma ordem, então duas baixas sobrepostas esperam uma pela outra em vez de
+#   entrarem em deadlock
+# - o status anterior sai do próprio 'alvo' no RETURNING (o UPDATE só devolve o valor novo)
+#   e alimenta os deltas do rollup, aplicados na mesma transação (app/agregados.py)
+
+STATUS_BAIXAVEIS = (StatusTitulo.PENDENTE.value, StatusTitulo.VENCIDO.value)
+
+
+async def baixar_titulos(
+    db: AsyncSession,
+    data_pagamento: date,
+    ids: Optional[List[int]] = None,
+    filtros: Optional[FiltroTitulos] = None,
+) -> dict:
+
+    # não faz commit: a rota decide (e registra a escrita para o roteamento de leituras)
+
+    alvo = select(Titulo.id, Titulo.status).where(Titulo.status.in_(STATUS_BAIXAVEIS))
+    if ids is not None:
+        # um único parâmetro array, em vez de um bind por id
+        alvo = alvo.where(Titulo.id == any_(cast(ids, ARRAY(Integer))))
+    else:
+        alvo = aplicar_filtros_titulos(alvo, filtros)
+    # MATERIALIZED: o lock na ordem do ORDER BY acontece uma vez, antes do UPDATE
+    alvo = alvo.order_by(Titulo.id).with_for_update().cte("alvo").prefix_with("MATERIALIZED")
+
+    stmt = (
+        update(Titulo)
+        .where(Titulo.id == alvo.c.id)
+        .values(status=StatusTitulo.PAGO, data_pagamento=data_pagamento)
+        .returning(
+            Titulo.id, Titulo.valor, Titulo.data_vencimento, Titulo.tipo, Titulo.status,
+            Titulo.categoria_id, Titulo.conta_bancaria_id, Titulo.contato_id,
+            alvo.c.status.label("status_anterior"),
+        )
+    )
+    baixados = (await db.execute(stmt)).all()
+
+    if baixados:
+        antes = [SimpleNamespace(**{**linha._mapping, "status": linha.status_anterior}) for linha in baixados]
+        await agregados.aplicar_deltas(db, removidos=antes, adicionados=baixados)
+
+    ids_baixados = sorted(linha.id for linha in baixados)
+    ignorados = sorted(set(ids) - set(ids_baixados)) if ids is not None else []
+    return {"baixados": len(ids_baixados), "ids": ids_baixados, "ignorados": ignorados}
@@ -0,0 +1,427 @@
+import codecs
+import csv
+import re
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import baixa
+from app.database import copiar_registros
+from app.modelo import TipoLancamento
+
+# Conciliação de extratos bancários (OFX ou CSV) com os títulos em aberto de uma conta.
+#
+# 1. o extrato é lido em streaming (request.stream()) sem conexão com o banco (o upload pode
+#    ser lento); em memória fica só o resumo de cada linha, que depois vai, em lotes, por COPY
+#    para uma tabela temporária da transação
+# 2. uma única consulta cruza a temporária com 'titulos' da conta:
+#    - 1 para 1: mesmo valor e tipo (chaves do hash join), vencimento dentro de +-janela dias
+#    - 1 para N (parcelas de um mesmo id_transacao_pai pagas juntas): soma acumulada das
+#      parcelas em aberto do grupo, em ordem de vencimento, igual ao valor do lançamento
+#    o lado de 'titulos' é limitado por conta + faixa de vencimento do extrato inteiro
+#    (índice (conta_bancaria_id, data_vencimento, id) / partições do período), então o custo
+#    acompanha o extrato e o período, não o histórico
+# 3. classificação:
+#    - confirmado: único candidato da linha, não disputado por outra linha, e com documento
+#      do contato igual ao do extrato ou vencimento no próprio dia
+#    - sugerido: demais casos, até MAX_SUGESTOES candidatos por linha (documento igual primeiro,
+#      depois menor distância entre vencimento e data do lançamento)
+#
+# Formatos:
+# - CSV com cabeçalho: data, valor (negativo = saída), descricao/historico e, opcionais,
+#   documento (CPF/CNPJ) e id; separador ',' ou ';', datas AAAA-MM-DD ou DD/MM/AAAA
+# - OFX 1.x/2.x: blocos <STMTTRN> (DTPOSTED, TRNAMT, FITID, NAME/MEMO)
+
+MAX_LINHAS_EXTRATO = 200_000
+TAMANHO_LOTE = 10_000
+JANELA_PADRAO_DIAS = 3
+MAX_SUGESTOES = 3
+VALOR_MAXIMO = Decimal(10) ** 13
+MAX_LINHAS_REGISTRO = 50
+MAX_TAMANHO_REGISTRO = 64 * 1024
+
+COLUNAS_EXTRATO = ["linha", "data", "valor", "tipo", "documento"]
+
+# aliases aceitos no cabeçalho do CSV
+CAMPOS_CSV = {
+    "data": ("data", "data_lancamento", "dt"),
+    "valor": ("valor", "montante", "vlr"),
+    "descricao": ("descricao", "historico", "descrição", "histórico", "memo"),
+    "documento": ("documento", "cpf_cnpj", "cnpj", "cpf"),
+    "id_externo": ("id", "id_externo", "fitid", "identificador"),
+}
+
+# CPF/CNPJ no histórico (comum em PIX/TED quando o extrato não tem coluna própria)
+_DOCUMENTO_NO_TEXTO = re.compile(r"(?<!\d)(\d{14}|\d{11})(?!\d)")
+_ABRE_OFX = re.compile(r"<STMTTRN>", re.I)
+_FECHA_OFX = re.compile(r"</STMTTRN>", re.I)
+_CAMPO_OFX = re.compile(r"<(\w+)>\s*([^<\r\n]*)")
+
+
+class ErroExtrato(ValueError):
+    pass
+
+
+# --- leitura ---
+
+def _valor(bruto: str) -> Decimal:
+    limpo = bruto.replace("R$", "").replace(" ", "").strip()
+    # com '.' e ',' o último é o separador decimal: 1.234,56 (BR) ou 1,234.56 (OFX/US);
+    # só ',' é decimal (1234,56); só '.' também (1234.56)
+    decimal = "," if limpo.rfind(",") > limpo.rfind(".") else "."
+    milhar = "." if decimal == "," else ","
+    limpo = limpo.replace(milhar, "").replace(decimal, ".")
+    try:
+        valor = Decimal(limpo)
+    except InvalidOperation:
+        raise ErroExtrato(f"valor inválido: {bruto!r}")
+    # mais de 2 casas não é centavo (ex: '1.234' ambíguo): arredondar casaria o título errado
+    # fora do numeric(15, 2) da tabela temporária, o COPY falharia para o extrato inteiro
+    if not valor.is_finite() or valor.as_tuple().exponent < -2 or abs(valor) >= VALOR_MAXIMO:
+        raise ErroExtrato(f"valor inválido: {bruto!r}")
+    return valor
+
+
+def _data(bruto: str) -> date:
+    bruto = bruto.strip()
+    for formato, tamanho in (("%Y-%m-%d", 10), ("%d/%m/%Y", 10), ("%Y%m%d", 8)):
+        try:
+            return datetime.strptime(bruto[:tamanho], formato).date()
+        except ValueError:
+            continue
+    raise ErroExtrato(f"data inválida: {bruto!r}")
+
+
+def _documento(bruto: Optional[str], descricao: Optional[str]) -> Optional[str]:
+    # só dígitos, como em Contato.documento; só CPF (11) ou CNPJ (14), como em _DOCUMENTO_NO_TEXTO
+    # coluna com outro tamanho é ignorada (o documento só desempata candidatos)
+    if bruto:
+        digitos = re.sub(r"\D", "", bruto)
+        if len(digitos) in (11, 14):
+            return digitos
+    if descricao:
+        achado = _DOCUMENTO_NO_TEXTO.search(descricao)
+        return achado.group(1) if achado else None
+    return None
+
+
+def _lancamento(data_bruta, valor_bruto, descricao, documento, id_externo) -> dict:
+    valor = _valor(valor_bruto)
+    if valor == 0:
+        raise ErroExtrato("valor zerado")
+    return {
+        "data": _data(data_bruta),
+        "valor": abs(valor).quantize(Decimal("0.01")),
+        "tipo": TipoLancamento.RECEITA.value if valor > 0 else TipoLancamento.DESPESA.value,
+        "descricao": (descricao or "").strip() or None,
+        "documento": _documento(documento, descricao),
+        "id_externo": (id_externo or "").strip() or None,
+    }
+
+
+async def _texto(fluxo: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # decodifica em pedaços; OFX 1.x de bancos brasileiros costuma vir em CP1252 (CHARSET:1252)
+    # o cabeçalho é acumulado até 1 KB antes de escolher a codificação
+    decodificador, cabecalho = None, b""
+    async for pedaco in fluxo:
+        if decodificador is None:
+            cabecalho += pedaco
+            if len(cabecalho) < 1024:
+                continue
+            pedaco, decodificador = cabecalho, _decodificador(cabecalho)
+        yield decodificador.decode(pedaco)
+    if decodificador is None:
+        decodificador = _decodificador(cabecalho)
+        yield decodificador.decode(cabecalho)
+    yield decodificador.decode(b"", final=True)
+
+
+def _decodificador(cabecalho: bytes):
+    codificacao = "cp1252" if b"CHARSET:1252" in cabecalho[:1024] else "utf-8-sig"
+    return codecs.getincrementaldecoder(codificacao)(errors="replace")
+
+
+async def _linhas(fluxo: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    resto = ""
+    async for texto in _texto(fluxo):
+        partes = (resto + texto).split("\n")
+        resto = partes.pop()
+        for parte in partes:
+            yield parte.rstrip("\r")
+        if len(resto) > MAX_TAMANHO_REGISTRO:
+            raise ErroExtrato("Linha do extrato longa demais (arquivo sem quebras de linha?).")
+    if resto:
+        yield resto.rstrip("\r")
+
+
+async def _registros_csv(fluxo: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+
+    # (registro, linhas físicas, desbalanceado)
+    # um registro pode ocupar várias linhas físicas (campo entre aspas com quebra de linha):
+    # as linhas são acumuladas até o número de aspas ficar par; uma aspa solta puxaria o resto
+    # do arquivo para um único registro, então o acúmulo para em MAX_LINHAS_REGISTRO linhas /
+    # MAX_TAMANHO_REGISTRO caracteres (ou no fim do arquivo) e o registro sai como desbalanceado
+
+    pendentes, aspas, tamanho = [], 0, 0
+    async for linha in _linhas(fluxo):
+        pendentes.append(linha)
+        aspas += linha.count('"')
+        tamanho += len(linha)
+        estourou = len(pendentes) > MAX_LINHAS_REGISTRO or tamanho > MAX_TAMANHO_REGISTRO
+        if aspas % 2 and not estourou:
+            continue
+        yield "\n".join(pendentes), len(pendentes), estourou
+        pendentes, aspas, tamanho = [], 0, 0
+    if pendentes:
+        yield "\n".join(pendentes), len(pendentes), True
+
+
+async def ler_csv(fluxo: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+
+    # (numero, lancamento | ErroExtrato) para cada registro após o cabeçalho
+    # registro malformado vira erro da linha; cabeçalho malformado, ErroExtrato (extrato inteiro)
+
+    indices, separador = None, ","
+    numero = 0
+    async for registro_bruto, linhas_fisicas, desbalanceado in _registros_csv(fluxo):
+        if not registro_bruto.strip():
+            continue
+
+        if indices is None:
+            if desbalanceado:
+                raise ErroExtrato("Cabeçalho do CSV com aspas desbalanceadas.")
+            separador = ";" if registro_bruto.count(";") > registro_bruto.count(",") else ","
+            try:
+                cabecalho = [c.strip().lower() for c in next(csv.reader([registro_bruto], delimiter=separador))]
+            except csv.Error as e:
+                raise ErroExtrato(f"Cabeçalho do CSV inválido: {e}")
+            indices = {
+                campo: next((cabecalho.index(a) for a in aliases if a in cabecalho), None)
+                for campo, aliases in CAMPOS_CSV.items()
+            }
+            if indices["data"] is None or indices["valor"] is None:
+                raise ErroExtrato("CSV sem as colunas obrigatórias 'data' e 'valor'.")
+            continue
+
+        numero += 1
+        if desbalanceado:
+            yield numero, ErroExtrato(f"aspas desbalanceadas ({linhas_fisicas} linha(s) descartada(s))")
+            continue
+        try:
+            campos = next(csv.reader([registro_bruto], delimiter=separador))
+        except csv.Error as e:
+            yield numero, ErroExtrato(f"linha CSV inválida: {e}")
+            continue
+
+        def campo(nome):
+            indice = indices[nome]
+            return campos[indice] if indice is not None and indice < len(campos) else None
+
+        try:
+            lancamento = _lancamento(campo("data") or "", campo("valor") or "", campo("descricao"),
+                                     campo("documento"), campo("id_externo"))
+        except ErroExtrato as e:
+            lancamento = e
+        yield numero, lancamento
+
+
+async def ler_ofx(fluxo: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+
+    # só os blocos <STMTTRN> completos são processados
+    # o buffer guarda apenas o bloco aberto (o texto fora dos blocos é descartado) e cada
+    # pedaço novo é procurado a partir de onde a busca anterior parou; um bloco sem fechamento
+    # maior que MAX_TAMANHO_REGISTRO recusa o arquivo, como uma linha longa demais no CSV
+
+    buffer, busca, aberto = "", 0, False
+    numero = 0
+    async for texto in _texto(fluxo):
+        buffer += texto
+        while True:
+            if not aberto:
+                inicio = _ABRE_OFX.search(buffer, busca)
+                if inicio is None:
+                    # só o suficiente para uma tag dividida entre dois pedaços
+                    buffer, busca = buffer[-(len("<STMTTRN>") - 1):], 0
+                    break
+                buffer, busca, aberto = buffer[inicio.end():], 0, True
+            fim = _FECHA_OFX.search(buffer, busca)
+            if fim is None:
+                if len(buffer) > MAX_TAMANHO_REGISTRO:
+                    raise ErroExtrato("Bloco <STMTTRN> longo demais (arquivo sem </STMTTRN>?).")
+                busca = max(0, len(buffer) - (len("</STMTTRN>") - 1))
+                break
+            bloco = buffer[:fim.start()]
+            buffer, busca, aberto = buffer[fim.end():], 0, False
+
+            numero += 1
+            campos = {nome.upper(): valor.strip() for nome, valor in _CAMPO_OFX.findall(bloco)}
+            descricao = " ".join(filter(None, (campos.get("NAME"), campos.get("MEMO"))))
+            try:
+                lancamento = _lancamento(campos.get("DTPOSTED", ""), campos.get("TRNAMT", ""),
+                                         descricao, None, campos.get("FITID"))
+            except ErroExtrato as e:
+                lancamento = e
+            yield numero, lancamento
+
+
+def detectar_formato(inicio: bytes) -> str:
+    cabecalho = inicio[:4096].upper()
+    return "ofx" if b"OFXHEADER" in cabecalho or b"<OFX>" in cabecalho else "csv"
+
+
+# --- cruzamento ---
+
+_SQL_CANDIDATOS = text("""
+    WITH abertos AS (
+        SELECT t.id, t.valor, t.tipo, t.data_vencimento, t.contato_id, t.id_transacao_pai
+        FROM titulos t
+        WHERE t.conta_bancaria_id = :conta
+          AND t.status IN ('PENDENTE', 'VENCIDO')
+          AND t.data_vencimento BETWEEN :de AND :ate
+    ),
+    grupos AS (
+        SELECT DISTINCT id_transacao_pai FROM abertos WHERE id_transacao_pai IS NOT NULL
+    ),
+    prefixos AS (
+        -- parcelas em aberto de cada grupo (inclusive vencidas antes do período), acumuladas
+        SELECT t.tipo, t.contato_id, t.data_vencimento,
+               sum(t.valor) OVER w AS acumulado,
+               count(*) OVER w AS parcelas,
+               array_agg(t.id) OVER w AS ids
+        FROM titulos t
+        JOIN grupos g ON g.id_transacao_pai = t.id_transacao_pai
+        WHERE t.conta_bancaria_id = :conta AND t.status IN ('PENDENTE', 'VENCIDO')
+        WINDOW w AS (PARTITION BY t.id_transacao_pai ORDER BY t.data_vencimento, t.id)
+    )
+    SELECT e.linha, ARRAY[a.id] AS titulo_ids,
+           coalesce(e.documento = c.documento, false) AS documento_coincide,
+           a.data_vencimento - e.data AS diferenca_dias
+    FROM extrato_conciliacao e
+    JOIN abertos a ON a.valor = e.valor AND a.tipo = e.tipo
+    LEFT JOIN contatos c ON c.id = a.contato_id
+    WHERE a.data_vencimento BETWEEN e.data - CAST(:janela AS integer) AND e.data + CAST(:janela AS integer)
+    UNION ALL
+    SELECT e.linha, p.ids,
+           coalesce(e.documento = c.documento, false),
+           p.data_vencimento - e.data
+    FROM extrato_conciliacao e
+    JOIN prefixos p ON p.acumulado = e.valor AND p.tipo = e.tipo
+    LEFT JOIN contatos c ON c.id = p.contato_id
+    WHERE p.parcelas >= 2 AND p.data_vencimento <= e.data + CAST(:janela AS integer)
+""")
+
+
+async def _ler_extrato(leitor: AsyncIterator[tuple], resumo: dict, erros: list) -> tuple:
+    # devolve (menor data, maior data) dos lançamentos válidos; não usa o banco
+    menor = maior = None
+    async for numero, lancamento in leitor:
+        if numero > MAX_LINHAS_EXTRATO:
+            raise ErroExtrato(f"Extrato limitado a {MAX_LINHAS_EXTRATO} lançamentos por requisição.")
+        if isinstance(lancamento, ErroExtrato):
+            erros.append({"linha": numero, "erros": [str(lancamento)]})
+            continue
+        resumo[numero] = lancamento
+        menor = lancamento["data"] if menor is None else min(menor, lancamento["data"])
+        maior = lancamento["data"] if maior is None else max(maior, lancamento["data"])
+    return menor, maior
+
+
+async def _carregar_extrato(db: AsyncSession, resumo: dict):
+    await db.execute(text(
+        "CREATE TEMP TABLE extrato_conciliacao (linha integer, data date, valor numeric(15, 2), "
+        "tipo varchar(10), documento varchar(20)) ON COMMIT DROP"
+    ))
+    lote = []
+    for numero, lancamento in resumo.items():
+        lote.append((numero, lancamento["data"], lancamento["valor"], lancamento["tipo"], lancamento["documento"]))
+        if len(lote) >= TAMANHO_LOTE:
+            await copiar_registros(db, "extrato_conciliacao", COLUNAS_EXTRATO, lote)
+            lote = []
+    if lote:
+        await copiar_registros(db, "extrato_conciliacao", COLUNAS_EXTRATO, lote)
+
+
+def _classificar(candidatos: list, resumo: dict) -> tuple:
+    por_linha = defaultdict(list)
+    linhas_por_titulo = defaultdict(set)
+    for linha, titulo_ids, documento_coincide, diferenca_dias in candidatos:
+        por_linha[linha].append({
+            "titulo_ids": list(titulo_ids),
+            "documento_coincide": documento_coincide,
+            "diferenca_dias": diferenca_dias,
+        })
+        for titulo_id in titulo_ids:
+            linhas_por_titulo[titulo_id].add(linha)
+
+    confirmados, sugeridos, sem_correspondencia = [], [], []
+    for numero in sorted(resumo):
+        lancamento = {"linha": numero, **resumo[numero]}
+        opcoes = por_linha.get(numero)
+        if not opcoes:
+            sem_correspondencia.append(numero)
+            continue
+        if len(opcoes) == 1:
+            unica = opcoes[0]
+            exclusiva = all(linhas_por_titulo[t] == {numero} for t in unica["titulo_ids"])
+            if exclusiva and (unica["documento_coincide"] or unica["diferenca_dias"] == 0):
+                confirmados.append({**lancamento, "titulo_ids": unica["titulo_ids"]})
+                continue
+        opcoes.sort(key=lambda o: (not o["documento_coincide"], abs(o["diferenca_dias"]), len(o["titulo_ids"])))
+        sugeridos.append({**lancamento, "candidatos": opcoes[:MAX_SUGESTOES]})
+    return confirmados, sugeridos, sem_correspondencia
+
+
+async def conciliar(
+    db: AsyncSession,
+    conta_id: int,
+    leitor: AsyncIterator[tuple],
+    janela_dias: int = JANELA_PADRAO_DIAS,
+    baixar: bool = False,
+) -> dict:
+
+    # não faz commit: a tabela temporária some no commit/rollback feito pela rota
+    # baixar=True: os confirmados são baixados (app/baixa.py) com a data do lançamento
+    # o banco só é usado depois do extrato inteiro lido: 'db' não deve estar com uma
+    # transação aberta durante o upload (a rota faz commit antes)
+
+    resumo, erros = {}, []
+    menor, maior = await _ler_extrato(leitor, resumo, erros)
+
+    candidatos = []
+    if resumo:
+        await _carregar_extrato(db, resumo)
+        # estatísticas da temporária: sem elas o planner estima 1 linha e cai em nested loop
+        await db.execute(text("ANALYZE extrato_conciliacao"))
+        # memória para o hash join dos títulos do período ficar inteiro em RAM
+        await db.execute(text("SET LOCAL work_mem = '64MB'"))
+        result = await db.execute(_SQL_CANDIDATOS, {
+            "conta": conta_id,
+            "de": menor - timedelta(days=janela_dias),
+            "ate": maior + timedelta(days=janela_dias),
+            "janela": janela_dias,
+        })
+        candidatos = result.all()
+
+    confirmados, sugeridos, sem_correspondencia = _classificar(candidatos, resumo)
+
+    baixados = 0
+    if baixar and confirmados:
+        por_data = defaultdict(list)
+        for item in confirmados:
+            por_data[item["data"]].extend(item["titulo_ids"])
+        for data_pagamento in sorted(por_data):
+            resultado = await baixa.baixar_titulos(db, data_pagamento, por_data[data_pagamento])
+            baixados += resultado["baixados"]
+
+    return {
+        "linhas": len(resumo) + len(erros),
+        "confirmados": confirmados,
+        "sugeridos": sugeridos,
+        "sem_correspondencia": sem_correspondencia,
+        "erros": sorted(erros, key=lambda e: e["linha"]),
+        "baixados": baixados,
+    }
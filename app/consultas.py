@@ -0,0 +1,523 @@
+import base64
+import json
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import select, func, case, tuple_, bindparam, literal, union_all, cast, Date, Interval
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.modelo import Titulo, Categoria, Contato, ContaBancaria, ResumoMensal, SaldoContato
+from app.schemas import FiltroTitulos, FiltroDashboard, CAMPOS_TITULO_RESPONSE
+from app.agregados import STATUS_ABERTOS
+
+# Consultas de leitura do dashboard.
+# Ficam fora das rotas para que os endpoints individuais (/dashboard/resumo, ...)
+# e o endpoint agregado (/dashboard) reaproveitem exatamente as mesmas queries,
+# todas rodando na sessão (e portanto na conexão) recebida.
+
+
+def _primeiro_dia_proximo_mes(dia: date) -> date:
+    return (dia.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _dividir_periodo(de: Optional[date], ate: Optional[date]) -> tuple:
+
+    # separa [de, ate] em meses inteiros, lidos do rollup, e pontas parciais, lidas de 'titulos'
+    # retorna ((mes_inicial, mes_final_exclusivo) ou None, [(de, ate), ...])
+    # ex: 15/01 a 10/04 -> meses [01/02, 01/04) + pontas 15/01..31/01 e 01/04..10/04
+
+    inicio_meses = de if de is None or de.day == 1 else _primeiro_dia_proximo_mes(de)
+    fim_meses = None
+    if ate is not None:
+        seguinte = _primeiro_dia_proximo_mes(ate)
+        fim_meses = seguinte if seguinte - timedelta(days=1) == ate else ate.replace(day=1)
+
+    if inicio_meses is not None and fim_meses is not None and inicio_meses >= fim_meses:
+        return None, [(de, ate)]  # nenhum mês inteiro no período
+
+    pontas = []
+    if de is not None and de < inicio_meses:
+        pontas.append((de, inicio_meses - timedelta(days=1)))
+    if ate is not None and fim_meses <= ate:
+        pontas.append((fim_meses, ate))
+    return (inicio_meses, fim_meses), pontas
+
+
+def _sem_filtros(filtros: Optional[FiltroDashboard]) -> bool:
+    return filtros is None or not filtros.model_dump(exclude_none=True)
+
+
+def _fonte_resumo(filtros: Optional[FiltroDashboard]):
+
+    # linhas no formato do 'resumo_mensal' (mes, tipo, status, categoria_id, conta_bancaria_id,
+    # total, quantidade) restritas aos filtros. Meses inteiros saem do rollup; só as pontas
+    # parciais do período agregam 'titulos', por range em data_vencimento (índices compostos
+    # com data_vencimento e, com a tabela particionada, só as partições dessas datas)
+
+    if _sem_filtros(filtros):
+        return ResumoMensal.__table__
+
+    meses, pontas = _dividir_periodo(filtros.de, filtros.ate)
+    partes = []
+
+    if meses is not None:
+        rollup = select(
+            ResumoMensal.mes, ResumoMensal.tipo, ResumoMensal.status,
+            ResumoMensal.categoria_id, ResumoMensal.conta_bancaria_id,
+            ResumoMensal.total, ResumoMensal.quantidade,
+        )
+        inicio_meses, fim_meses = meses
+        if inicio_meses is not None:
+            rollup = rollup.where(ResumoMensal.mes >= inicio_meses)
+        if fim_meses is not None:
+            rollup = rollup.where(ResumoMensal.mes < fim_meses)
+        if filtros.conta_bancaria_id is not None:
+            rollup = rollup.where(ResumoMensal.conta_bancaria_id == filtros.conta_bancaria_id)
+        if filtros.categoria_id is not None:
+            rollup = rollup.where(ResumoMensal.categoria_id == filtros.categoria_id)
+        partes.append(rollup)
+
+    mes_titulo = cast(func.date_trunc("month", Titulo.data_vencimento), Date)
+    for ponta_de, ponta_ate in pontas:
+        bruto = (
+            select(
+                mes_titulo.label("mes"), Titulo.tipo, Titulo.status,
+                Titulo.categoria_id, Titulo.conta_bancaria_id,
+                func.sum(Titulo.valor).label("total"), func.count().label("quantidade"),
+            )
+            .where(Titulo.data_vencimento >= ponta_de, Titulo.data_vencimento <= ponta_ate)
+            .group_by(mes_titulo, Titulo.tipo, Titulo.status, Titulo.categoria_id, Titulo.conta_bancaria_id)
+        )
+        if filtros.conta_bancaria_id is not None:
+            bruto = bruto.where(Titulo.conta_bancaria_id == filtros.conta_bancaria_id)
+        if filtros.categoria_id is not None:
+            bruto = bruto.where(Titulo.categoria_id == filtros.categoria_id)
+        partes.append(bruto)
+
+    return (union_all(*partes) if len(partes) > 1 else partes[0]).subquery("resumo")
+
+
+async def resumo_financeiro(db: AsyncSession, filtros: Optional[FiltroDashboard] = None) -> dict:
+
+    # lê do rollup 'resumo_mensal' (app/agregados.py) em vez de varrer 'titulos'
+    r = _fonte_resumo(filtros).c
+    query = select(
+        # 1. Saldo Líquido (Tudo que entrou - Tudo que saiu, independente do status)
+        # (Ou ajustamos para ser apenas PAGOS se quiser fluxo de caixa realizado)
+        func.sum(case((r.tipo == "RECEITA", r.total), else_=0)) -
+        func.sum(case((r.tipo == "DESPESA", r.total), else_=0)),
+
+        # 2. A Receber (Apenas Pendentes)
+        func.sum(case((
+            (r.tipo == "RECEITA") & (r.status == "PENDENTE"),
+            r.total
+        ), else_=0)),
+
+        # 3. A Pagar (Apenas Pendentes)
+        func.sum(case((
+            (r.tipo == "DESPESA") & (r.status == "PENDENTE"),
+            r.total
+        ), else_=0)),
+
+        # 4. Total Vencido (Crítico - Risco Financeiro)
+        func.sum(case((r.status == "VENCIDO", r.total), else_=0))
+    )
+
+    result = await db.execute(query)
+    saldo, a_receber, a_pagar, vencido = result.one()
+
+    # Tratamento de Nulos (Se o banco estiver vazio, retorna 0.00)
+    return {
+        "saldo_geral": saldo or 0,
+        "total_a_receber": a_receber or 0,
+        "total_a_pagar": a_pagar or 0,
+        "total_inadimplente": vencido or 0
+    }
+
+
+async def totais_por_categoria(db: AsyncSession, filtros: Optional[FiltroDashboard] = None) -> list:
+
+    #Dados para Gráfico de Rosca.
+    #Mostra onde o dinheiro está indo (Top Despesas/Receitas).
+
+    r = _fonte_resumo(filtros).c
+    query = (
+        select(Categoria.nome, func.sum(r.total))
+        .join(Categoria, Categoria.id == r.categoria_id)
+        .group_by(Categoria.nome)
+        # linhas zeradas do rollup equivalem a categorias sem títulos
+        .having(func.sum(r.quantidade) > 0)
+        .order_by(func.sum(r.total).desc()) # Ordena do maior para o menor
+    )
+
+    result = await db.execute(query)
+    dados = result.all()
+
+    return [{"categoria": nome, "total": valor} for nome, valor in dados]
+
+
+async def fluxo_caixa_mensal(db: AsyncSession, filtros: Optional[FiltroDashboard] = None) -> list:
+
+    # Extrai o 'YYYY-MM' do mês do rollup no Postgres
+    r = _fonte_resumo(filtros).c
+    mes_ano = func.to_char(r.mes, 'YYYY-MM')
+
+    query = (
+        select(
+            mes_ano.label("mes"),
+            r.tipo,
+            func.sum(r.total)
+        )
+        .group_by(mes_ano, r.tipo)
+        .having(func.sum(r.quantidade) > 0)
+        .order_by(mes_ano)
+    )
+
+    result = await db.execute(query)
+    dados = result.all()
+
+    # Transforma a lista plana do SQL em um objeto estruturado para o Front
+    # De: [('2025-01', 'RECEITA', 100), ('2025-01', 'DESPESA', 50)]
+    # Para: {'2025-01': {'receitas': 100, 'despesas': 50}}
+    relatorio = {}
+    for mes, tipo, valor in dados:
+        if mes not in relatorio:
+            relatorio[mes] = {"mes": mes, "receitas": 0, "despesas": 0}
+
+        if tipo == "RECEITA":
+            relatorio[mes]["receitas"] = valor
+        else:
+            relatorio[mes]["despesas"] = valor
+
+    return list(relatorio.values())
+
+
+def _top_contatos_filtrado(tipo, filtros: FiltroDashboard):
+
+    # 'saldo_contato' não tem data, conta nem categoria: com filtros, o saldo em aberto é
+    # agregado de 'titulos' no recorte (range em data_vencimento / índices por conta e categoria)
+
+    query = (
+        select(Contato.nome, func.sum(Titulo.valor))
+        .join(Contato, Contato.id == Titulo.contato_id)
+        .where(Titulo.tipo == tipo, Titulo.status.in_(STATUS_ABERTOS))
+        .group_by(Contato.nome)
+        .order_by(func.sum(Titulo.valor).desc())
+        .limit(5)
+    )
+    if filtros.de is not None:
+        query = query.where(Titulo.data_vencimento >= filtros.de)
+    if filtros.ate is not None:
+        query = query.where(Titulo.data_vencimento <= filtros.ate)
+    if filtros.conta_bancaria_id is not None:
+        query = query.where(Titulo.conta_bancaria_id == filtros.conta_bancaria_id)
+    if filtros.categoria_id is not None:
+        query = query.where(Titulo.categoria_id == filtros.categoria_id)
+    return query
+
+
+async def ranking_contatos(db: AsyncSession, filtros: Optional[FiltroDashboard] = None) -> dict:
+
+    # lê do saldo em aberto pré-calculado ('saldo_contato') em vez de agregar 'titulos'
+
+    def top_por_tipo(tipo):
+        if not _sem_filtros(filtros):
+            return _top_contatos_filtrado(tipo, filtros)
+        return (
+            select(Contato.nome, func.sum(SaldoContato.total_aberto))
+            .join(Contato, Contato.id == SaldoContato.contato_id)
+            .where(SaldoContato.tipo == tipo)
+            .group_by(Contato.nome)
+            .having(func.sum(SaldoContato.quantidade_aberta) > 0)
+            .order_by(func.sum(SaldoContato.total_aberto).desc())
+            .limit(5) # Top 5
+        )
+
+    # 1. Top Devedores (Quem nos deve)
+    query_devedores = top_por_tipo("RECEITA")
+
+    # 2. Top Credores (Quem nós devemos)
+    query_credores = top_por_tipo("DESPESA")
+
+    res_devedores = await db.execute(query_devedores)
+    res_credores = await db.execute(query_credores)
+
+    return {
+        "devedores": [{"nome": nome, "total": valor} for nome, valor in res_devedores.all()],
+        "credores": [{"nome": nome, "total": valor} for nome, valor in res_credores.all()]
+    }
+
+
+def _valor_com_sinal(tipo_col, valor_col):
+    # receitas somam, despesas subtraem
+    return case((tipo_col == "RECEITA", valor_col), else_=-valor_col)
+
+
+async def projecao_saldos(db: AsyncSession, de: date, ate: date) -> dict:
+
+    # Saldo projetado dia a dia por conta bancária e consolidado, na janela [de, ate].
+    # Cada título entra no dia do vencimento (CANCELADO não entra):
+    # - saldo_projetado: PAGO + PENDENTE + VENCIDO (o que se espera ter no caixa)
+    # - saldo_realizado: só PAGO
+    # O saldo de abertura em 'de' não varre o histórico: saldo_inicial da conta + rollup
+    # 'resumo_mensal' dos meses fechados anteriores + títulos crus só do mês parcial até 'de'.
+    # Assim o custo depende do tamanho da janela (índice conta/vencimento), não do histórico.
+    # Uma única query: SUM() OVER (PARTITION BY conta ORDER BY dia) acumula os movimentos.
+
+    inicio_mes = de.replace(day=1)
+    pago = "PAGO"
+    cancelado = "CANCELADO"
+
+    # abertura = saldo_inicial + meses fechados (rollup) + começo do mês de 'de' (títulos crus)
+    valor_rollup = _valor_com_sinal(ResumoMensal.tipo, ResumoMensal.total)
+    valor_titulo = _valor_com_sinal(Titulo.tipo, Titulo.valor)
+    partes_abertura = union_all(
+        select(
+            ContaBancaria.id.label("conta_id"),
+            ContaBancaria.saldo_inicial.label("projetado"),
+            ContaBancaria.saldo_inicial.label("realizado"),
+        ),
+        select(
+            ResumoMensal.conta_bancaria_id,
+            func.sum(valor_rollup).filter(ResumoMensal.status != cancelado),
+            func.sum(valor_rollup).filter(ResumoMensal.status == pago),
+        )
+        .where(ResumoMensal.mes < inicio_mes)
+        .group_by(ResumoMensal.conta_bancaria_id),
+        select(
+            Titulo.conta_bancaria_id,
+            func.sum(valor_titulo).filter(Titulo.status != cancelado),
+            func.sum(valor_titulo).filter(Titulo.status == pago),
+        )
+        .where(Titulo.data_vencimento >= inicio_mes, Titulo.data_vencimento < de)
+        .group_by(Titulo.conta_bancaria_id),
+    ).subquery("partes_abertura")
+
+    abertura = (
+        select(
+            partes_abertura.c.conta_id,
+            func.coalesce(func.sum(partes_abertura.c.projetado), 0).label("projetado"),
+            func.coalesce(func.sum(partes_abertura.c.realizado), 0).label("realizado"),
+        )
+        .group_by(partes_abertura.c.conta_id)
+        .cte("abertura")
+    )
+
+    movimentos = (
+        select(
+            Titulo.conta_bancaria_id.label("conta_id"),
+            Titulo.data_vencimento.label("dia"),
+            func.sum(valor_titulo).filter(Titulo.status != cancelado).label("projetado"),
+            func.sum(valor_titulo).filter(Titulo.status == pago).label("realizado"),
+        )
+        .where(Titulo.data_vencimento >= de, Titulo.data_vencimento <= ate)
+        .group_by(Titulo.conta_bancaria_id, Titulo.data_vencimento)
+        .cte("movimentos")
+    )
+
+    # grade conta x dia: dias sem movimento também aparecem, com o saldo do dia anterior
+    dias = select(
+        cast(func.generate_series(de, ate, cast(literal("1 day"), Interval)), Date).label("dia")
+    ).subquery("dias")
+
+    mov_projetado = func.coalesce(movimentos.c.projetado, 0)
+    mov_realizado = func.coalesce(movimentos.c.realizado, 0)
+    janela = {"partition_by": ContaBancaria.id, "order_by": dias.c.dia}
+
+    query = (
+        select(
+            ContaBancaria.id.label("conta_id"),
+            ContaBancaria.descricao,
+            dias.c.dia,
+            mov_projetado.label("movimento_projetado"),
+            mov_realizado.label("movimento_realizado"),
+            (abertura.c.projetado + func.sum(mov_projetado).over(**janela)).label("saldo_projetado"),
+            (abertura.c.realizado + func.sum(mov_realizado).over(**janela)).label("saldo_realizado"),
+        )
+        .select_from(ContaBancaria)
+        .join(dias, literal(True))
+        .join(abertura, abertura.c.conta_id == ContaBancaria.id)
+        .outerjoin(movimentos, (movimentos.c.conta_id == ContaBancaria.id) & (movimentos.c.dia == dias.c.dia))
+        .order_by(ContaBancaria.id, dias.c.dia)
+    )
+
+    result = await db.execute(query)
+
+    contas = {}
+    consolidado = {}
+    for row in result.all():
+        conta = contas.setdefault(row.conta_id, {"conta_id": row.conta_id, "descricao": row.descricao, "dias": []})
+        conta["dias"].append({
+            "dia": row.dia,
+            "movimento_projetado": row.movimento_projetado,
+            "movimento_realizado": row.movimento_realizado,
+            "saldo_projetado": row.saldo_projetado,
+            "saldo_realizado": row.saldo_realizado,
+        })
+        total = consolidado.setdefault(row.dia, {"dia": row.dia, "saldo_projetado": 0, "saldo_realizado": 0})
+        total["saldo_projetado"] += row.saldo_projetado
+        total["saldo_realizado"] += row.saldo_realizado
+
+    return {
+        "de": de,
+        "ate": ate,
+        "contas": list(contas.values()),
+        "consolidado": list(consolidado.values()),
+    }
+
+
+def _escapar_like(termo: str) -> str:
+    return termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def buscar_contatos(db: AsyncSession, termo: str, limite: int = 10) -> list:
+
+    # Autocomplete de contatos com a situação financeira de cada um.
+    # - termos com 3+ letras: 'contém' via índice de trigramas (GIN, pg_trgm)
+    # - termos curtos: só 'começa com', via btree em lower(nome) (trigramas não ajudam com 2 letras)
+    # Ranking: quem começa com o termo primeiro, depois pela similaridade, depois alfabético.
+    # Os saldos vêm de 'saldo_contato' (pré-calculado), sem reagregar 'titulos'.
+
+    # o padrão do 'começa com' vai renderizado na query (literal_execute): o planner só usa o
+    # btree text_pattern_ops para LIKE quando conhece o prefixo, o que não acontece com plano genérico
+    prefixo = bindparam("prefixo", f"{_escapar_like(termo.lower())}%", literal_execute=True)
+    comeca_com = func.lower(Contato.nome).like(prefixo, escape="\\")
+
+    if len(termo) >= 3:
+        filtro = Contato.nome.ilike(f"%{_escapar_like(termo)}%", escape="\\")
+    else:
+        filtro = comeca_com
+
+    query = (
+        select(
+            Contato.nome,
+            # Soma Receitas Pendentes/Vencidas (Quanto ele nos deve)
+            func.sum(case((SaldoContato.tipo == "RECEITA", SaldoContato.total_aberto), else_=0)).label("divida_cliente"),
+            # Soma Despesas Pendentes/Vencidas (Quanto nós devemos a ele)
+            func.sum(case((SaldoContato.tipo == "DESPESA", SaldoContato.total_aberto), else_=0)).label("credito_fornecedor"),
+        )
+        .outerjoin(SaldoContato, SaldoContato.contato_id == Contato.id)
+        .where(filtro)
+        .group_by(Contato.nome)
+        .order_by(
+            func.bool_or(comeca_com).desc(),
+            func.max(func.similarity(Contato.nome, termo)).desc(),
+            Contato.nome,
+        )
+        .limit(limite)
+    )
+
+    result = await db.execute(query)
+    return [
+        {
+            "nome": row.nome,
+            "a_receber": row.divida_cliente or 0,
+            "a_pagar": row.credito_fornecedor or 0
+        }
+        for row in result.all()
+    ]
+
+
+def codificar_cursor(titulo) -> str:
+    # cursor opaco para o front: a posição (data_vencimento, id) do último item da página
+    bruto = json.dumps([titulo.data_vencimento.isoformat(), titulo.id]).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple:
+    # ValueError para qualquer cursor malformado (a rota responde 400)
+    try:
+        preenchimento = "=" * (-len(cursor) % 4)
+        vencimento, id_titulo = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        return date.fromisoformat(vencimento), int(id_titulo)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def aplicar_filtros_titulos(query, filtros: Optional[FiltroTitulos]):
+    if filtros is None:
+        return query
+    if filtros.tipo is not None:
+        query = query.where(Titulo.tipo == filtros.tipo)
+    if filtros.status is not None:
+        query = query.where(Titulo.status == filtros.status)
+    if filtros.categoria_id is not None:
+        query = query.where(Titulo.categoria_id == filtros.categoria_id)
+    if filtros.contato_id is not None:
+        query = query.where(Titulo.contato_id == filtros.contato_id)
+    if filtros.conta_bancaria_id is not None:
+        query = query.where(Titulo.conta_bancaria_id == filtros.conta_bancaria_id)
+    if filtros.vencimento_de is not None:
+        query = query.where(Titulo.data_vencimento >= filtros.vencimento_de)
+    if filtros.vencimento_ate is not None:
+        query = query.where(Titulo.data_vencimento <= filtros.vencimento_ate)
+    return query
+
+
+def _paginar_titulos(query, filtros: Optional[FiltroTitulos], limit: int, cursor: Optional[str], skip: int):
+
+    # paginação por cursor (keyset) em (data_vencimento, id):
+    # o 'id' desempata vencimentos iguais, então a ordem é estável entre páginas,
+    # e o WHERE (data_vencimento, id) > cursor desce direto no índice composto
+    # em vez de percorrer e descartar 'skip' linhas como o OFFSET.
+    # 'skip' continua aceito por compatibilidade, mas só é usado sem cursor.
+
+    query = aplicar_filtros_titulos(query, filtros)
+
+    if cursor is not None:
+        vencimento, id_titulo = decodificar_cursor(cursor)
+        # o '>=' isolado é redundante com a comparação de tuplas, mas é ele que permite ao
+        # planner descartar partições anteriores ao cursor (app/particionamento.py)
+        query = query.where(
+            Titulo.data_vencimento >= vencimento,
+            tuple_(Titulo.data_vencimento, Titulo.id) > tuple_(vencimento, id_titulo),
+        )
+    elif skip:
+        query = query.offset(skip)
+
+    # busca 1 item a mais só para saber se existe próxima página
+    return query.order_by(Titulo.data_vencimento, Titulo.id).limit(limit + 1)
+
+
+def _cortar_pagina(itens: list, limit: int) -> tuple:
+    proximo_cursor = None
+    if len(itens) > limit:
+        itens = itens[:limit]
+        proximo_cursor = codificar_cursor(itens[-1])
+    return itens, proximo_cursor
+
+
+async def listar_titulos(
+    db: AsyncSession,
+    filtros: Optional[FiltroTitulos] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> tuple:
+
+    # Retorna (titulos, proximo_cursor) - proximo_cursor é None na última página.
+
+    query = _paginar_titulos(select(Titulo), filtros, limit, cursor, skip)
+    result = await db.execute(query)
+    return _cortar_pagina(result.scalars().all(), limit)
+
+
+# só as colunas de TituloResponse, na ordem dos campos
+COLUNAS_TITULO_RESPONSE = tuple(getattr(Titulo, campo) for campo in CAMPOS_TITULO_RESPONSE)
+
+
+async def listar_titulos_linhas(
+    db: AsyncSession,
+    filtros: Optional[FiltroTitulos] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+) -> tuple:
+
+    # mesma página de listar_titulos, em dicts no formato de schemas.TituloLinha:
+    # tuplas do driver direto, sem identity map nem objetos do ORM, prontas para dump_json
+
+    query = _paginar_titulos(select(*COLUNAS_TITULO_RESPONSE), filtros, limit, cursor, skip)
+    result = await db.execute(query)
+    linhas, proximo_cursor = _cortar_pagina(result.all(), limit)
+    return [dict(zip(CAMPOS_TITULO_RESPONSE, linha)) for linha in linhas], proximo_cursor
@@ -1,6 +1,11 @@
 import os
+import time
+from sqlalchemy import text, inspect
+from sqlalchemy.schema import AddConstraint
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.modelo import Base
+from app.metricas import espera_pool
 
 # carrega a URL do banco de variáveis de ambiente
 DATABASE_URL = os.environ.get("DATABASE_URL")
@@ -8,12 +13,33 @@ DATABASE_URL = os.environ.get("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("A variável DATABASE_URL não foi definida. Verifique o arquivo .env")
 
+class PoolMedido(AsyncAdaptedQueuePool):
+
+    # mesmo pool padrão do engine async, medindo quanto cada checkout espera por uma conexão
+    # (pool esgotado = requisições paradas aqui); exposto em /metrics como db_pool_wait_seconds
+    # com a label pool=<nome> (atributo de classe: sobrevive ao pool.recreate() do engine)
+
+    nome = "primario"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera_pool[self.nome].observar(time.perf_counter() - inicio)
+
+class PoolMedidoLeitura(PoolMedido):
+    nome = "leitura"
+
 # gerencia o pool de conexões com o postgres
 engine = create_async_engine(
     DATABASE_URL, 
-    echo=True,
+    # echo escreve cada comando no stdout de forma síncrona: só para depuração local
+    # em produção, a instrumentação por requisição fica em app/instrumentacao.py
+    echo=os.getenv("SQL_ECHO", "0") == "1",
     pool_size=10,      # Mantém até 10 conexões abertas
-    max_overflow=20    # Permite estourar até 20 em picos de carga
+    max_overflow=20,   # Permite estourar até 20 em picos de carga
+    poolclass=PoolMedido,
 )
 
 # cria sessões de banco para cada requisição
@@ -23,6 +49,26 @@ SessionLocal = async_sessionmaker(
     expire_on_commit=False # não desliga o objeto após o commit
 )
 
+# réplica de leitura opcional (streaming replication) para consultas pesadas do dashboard/listagens
+# quem decide quando usá-la é app/leitura.py (atraso da réplica, leitura das próprias escritas)
+DATABASE_READ_URL = os.environ.get("DATABASE_READ_URL")
+
+engine_leitura = None
+SessionLeitura = None
+if DATABASE_READ_URL:
+    engine_leitura = create_async_engine(
+        DATABASE_READ_URL,
+        echo=os.getenv("SQL_ECHO", "0") == "1",
+        pool_size=10,
+        max_overflow=20,
+        poolclass=PoolMedidoLeitura,
+    )
+    SessionLeitura = async_sessionmaker(
+        bind=engine_leitura,
+        class_=AsyncSession,
+        expire_on_commit=False
+    )
+
 # fastapi usa isso para entregar uma sessão limpa para cada endpoint
 async def get_db():
     async with SessionLocal() as session:
@@ -38,5 +84,56 @@ async def get_db():
 # utilitário para criar tabelas usado apenas no startup/dev
 async def init_db():
     async with engine.begin() as conn:
+        # extensões usadas por índices dos Models (trigramas da busca de contatos)
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
         # recria o schema baseado nos Models importados
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        # create_all não cria colunas nem índices novos em tabelas que já existem
+        # os índices ficam para 'python -m app.indices' (CREATE INDEX CONCURRENTLY, fora do boot)
+        await conn.run_sync(_criar_colunas_faltantes)
+        await conn.run_sync(_atualizar_ondelete)
+
+def _criar_colunas_faltantes(conn):
+    # só colunas opcionais (NULL) podem ser adicionadas assim a tabelas com dados
+    inspetor = inspect(conn)
+    for tabela in Base.metadata.sorted_tables:
+        existentes = {coluna["name"] for coluna in inspetor.get_columns(tabela.name)}
+        for coluna in tabela.columns:
+            if coluna.name not in existentes and coluna.nullable:
+                tipo = coluna.type.compile(dialect=conn.dialect)
+                conn.execute(text(f'ALTER TABLE {tabela.name} ADD COLUMN IF NOT EXISTS "{coluna.name}" {tipo}'))
+
+def _atualizar_ondelete(conn):
+    # nem altera FKs existentes: recria as que o modelo declara com outro ON DELETE
+    # (ex: jobs.usuario_id passou a SET NULL)
+    inspetor = inspect(conn)
+    for tabela in Base.metadata.sorted_tables:
+        existentes = {tuple(fk["constrained_columns"]): fk for fk in inspetor.get_foreign_keys(tabela.name)}
+        for fk in tabela.foreign_key_constraints:
+            atual = existentes.get(tuple(fk.column_keys))
+            if not fk.ondelete or atual is None:
+                continue
+            if (atual["options"].get("ondelete") or "").upper() == fk.ondelete.upper():
+                continue
+            conn.execute(text(f'ALTER TABLE {tabela.name} DROP CONSTRAINT "{atual["name"]}"'))
+            conn.execute(AddConstraint(fk))
+
+# utilitários de carga em massa (importação e seed)
+
+async def reservar_ids(db: AsyncSession, tabela: str, quantidade: int) -> list:
+    # pré-aloca 'quantidade' ids da sequence da tabela em uma única ida ao banco
+    # permite usar COPY (que não tem RETURNING) e ainda saber os ids gerados
+    result = await db.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:tabela, 'id')) FROM generate_series(1, :qtd)"),
+        {"tabela": tabela, "qtd": quantidade}
+    )
+    return [linha[0] for linha in result.all()]
+
+async def copiar_registros(db: AsyncSession, tabela: str, colunas: list, registros: list):
+    # COPY ... FROM STDIN (binário) via asyncpg, dentro da transação corrente da sessão
+    # ordem de grandeza mais rápido que INSERT para dezenas de milhares de linhas
+    conexao = await db.connection()
+    conexao_bruta = await conexao.get_raw_connection()
+    await conexao_bruta.driver_connection.copy_records_to_table(
+        tabela, records=registros, columns=colunas
+    )
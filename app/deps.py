@@ -1,49 +1,157 @@
-from typing import Annotated
-from fastapi import Depends, HTTPException, status
+import os
+import time
+from collections import OrderedDict
+from typing import Annotated, Optional
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.database import get_db
+from app.database import get_db, SessionLocal, SessionLeitura
 from app.seguranca import ALGORITMO, CHAVE_SECRETA
 from app.modelo import Usuario
 from app.schemas import TokenData
+from app import notificacoes, leitura
 
 
 # Define que o token vem do header Authorization: Bearer <token>
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+
+class CacheUsuarios:
+
+    # cache LRU com TTL de token -> snapshot do Usuario
+    # a validade de cada entrada é o menor entre o TTL configurado e o 'exp' do próprio token,
+    # então um token nunca é aceito pelo cache depois de expirar.
+    # invalidação explícita por email (troca de senha / remoção) via invalidar_usuario()
+
+    def __init__(self, max_entradas: int, ttl_segundos: float):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas: "OrderedDict[str, tuple]" = OrderedDict()  # token -> (expira_em, usuario)
+        self._tokens_por_email: dict = {}
+        # incrementada a cada invalidação: uma busca no banco iniciada antes dela não é cacheada
+        self.geracao = 0
+
+    def obter(self, token: str) -> Optional[Usuario]:
+        entrada = self._entradas.get(token)
+        if entrada is None:
+            return None
+        expira_em, usuario = entrada
+        if expira_em <= time.time():
+            self._remover(token)
+            return None
+        self._entradas.move_to_end(token)
+        return usuario
+
+    def guardar(self, token: str, usuario: Usuario, exp_token: float, geracao: int):
+        if self.max_entradas <= 0 or geracao != self.geracao:
+            return
+        expira_em = min(time.time() + self.ttl_segundos, exp_token)
+        self._entradas[token] = (expira_em, usuario)
+        self._entradas.move_to_end(token)
+        self._tokens_por_email.setdefault(usuario.email, set()).add(token)
+        while len(self._entradas) > self.max_entradas:
+            token_antigo = next(iter(self._entradas))
+            self._remover(token_antigo)
+
+    def invalidar_email(self, email: str):
+        self.geracao += 1
+        for token in self._tokens_por_email.pop(email, set()):
+            self._entradas.pop(token, None)
+
+    def limpar(self):
+        self.geracao += 1
+        self._entradas.clear()
+        self._tokens_por_email.clear()
+
+    def _remover(self, token: str):
+        _, usuario = self._entradas.pop(token)
+        tokens = self._tokens_por_email.get(usuario.email)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_por_email[usuario.email]
+
+
+cache_usuarios = CacheUsuarios(
+    max_entradas=int(os.getenv("AUTH_CACHE_MAX", "10000")),
+    ttl_segundos=float(os.getenv("AUTH_CACHE_TTL", "60")),
+)
+
+def invalidar_usuario(email: str):
+    # chamado localmente ou via NOTIFY de outro processo (admin.py, outros workers)
+    cache_usuarios.invalidar_email(email)
+
+notificacoes.registrar(notificacoes.CANAL_USUARIOS, invalidar_usuario)
+notificacoes.registrar_conexao(cache_usuarios.limpar)
+
+
+def _snapshot(usuario: Usuario) -> Usuario:
+    # cópia desanexada da sessão: pode ser reaproveitada entre requisições com segurança
+    return Usuario(
+        id=usuario.id,
+        email=usuario.email,
+        senha_hash=usuario.senha_hash,
+        data_criacao=usuario.data_criacao,
+    )
+
+
 async def obter_usuario_logado(
     token: Annotated[str, Depends(oauth2_scheme)],
     db: Annotated[AsyncSession, Depends(get_db)]
 ):
-    
+
     # decodifica o token JWT e busca o usuário no banco
     # se o token for falso ou expirado, barra a requisição aqui mesmo
-    
+    # em regime o usuário vem do cache em memória: nenhuma ida ao banco para autenticar
+
+    usuario = cache_usuarios.obter(token)
+    if usuario is not None:
+        return usuario
+
     exception_auth = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas ou expiradas",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
     try:
         payload = jwt.decode(token, CHAVE_SECRETA, algorithms=[ALGORITMO])
         email: str = payload.get("sub")
         if email is None:
             raise exception_auth
-        
+
         token_data = TokenData(email=email)
-        
+
     except JWTError:
         raise exception_auth
-    
+
+    geracao = cache_usuarios.geracao
     query = select(Usuario).where(Usuario.email == token_data.email)
     result = await db.execute(query)
     usuario = result.scalar_one_or_none()
-    
+
     if usuario is None:
         raise exception_auth
-        
-    return usuario
\ No newline at end of file
+
+    snapshot = _snapshot(usuario)
+    cache_usuarios.guardar(token, snapshot, payload.get("exp", 0), geracao)
+    return snapshot
+
+
+async def get_read_db(
+    request: Request,
+    usuario_atual: Annotated[Usuario, Depends(obter_usuario_logado)]
+):
+
+    # sessão para rotas somente leitura: réplica quando ela está em dia o suficiente
+    # (ver app/leitura.py), primário caso contrário ou logo após uma escrita do próprio usuário
+    # o limite de versão da réplica vai em request.state para o cache de respostas (app/versao.py)
+
+    limite = leitura.versao_limite_replica(usuario_atual.id)
+    fabrica = SessionLocal if limite is None else SessionLeitura
+    request.state.versao_replica = limite
+    async with fabrica() as session:
+        yield session
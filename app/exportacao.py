@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterator, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.consultas import aplicar_filtros_titulos
+from app.database import SessionLocal
+from app.modelo import Titulo
+from app.schemas import FiltroTitulos
+
+# Exportação do razão de títulos em CSV ou NDJSON.
+# As linhas saem de um cursor do lado do servidor (db.stream + yield_per), em lotes,
+# como tuplas de colunas - sem hidratar objetos do ORM nem modelos Pydantic.
+# A memória fica limitada a um lote, qualquer que seja o tamanho da exportação.
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+COLUNAS_EXPORTACAO = (
+    "id", "descricao", "valor", "data_vencimento", "data_pagamento", "data_criacao",
+    "tipo", "status", "id_transacao_pai", "numero_parcela", "total_parcelas",
+    "categoria_id", "contato_id", "conta_bancaria_id",
+)
+
+TAMANHO_LOTE = 2000
+
+
+def _valor_json(valor):
+    # mesmo formato da API: Decimal como string (sem perder centavos), datas em ISO 8601
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, UUID):
+        return str(valor)
+    return valor
+
+
+def _formatar_csv(linhas, cabecalho: bool = False) -> str:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    if cabecalho:
+        escritor.writerow(COLUNAS_EXPORTACAO)
+    escritor.writerows(linhas)
+    return buffer.getvalue()
+
+
+def _formatar_ndjson(linhas) -> str:
+    return "".join(
+        json.dumps(dict(zip(COLUNAS_EXPORTACAO, map(_valor_json, linha))), ensure_ascii=False) + "\n"
+        for linha in linhas
+    )
+
+
+async def gerar_exportacao(
+    db: AsyncSession,
+    filtros: Optional[FiltroTitulos] = None,
+    formato: str = "csv",
+) -> AsyncIterator[str]:
+
+    # gerador assíncrono de pedaços de texto, na ordem (data_vencimento, id) da listagem
+    colunas = [getattr(Titulo, nome) for nome in COLUNAS_EXPORTACAO]
+    query = aplicar_filtros_titulos(select(*colunas), filtros).order_by(Titulo.data_vencimento, Titulo.id)
+
+    # o cabeçalho sai antes da primeira ida ao banco: o cliente recebe o primeiro byte imediatamente
+    if formato == "csv":
+        yield _formatar_csv([], cabecalho=True)
+
+    result = await db.stream(query.execution_options(yield_per=TAMANHO_LOTE))
+    async for lote in result.partitions():
+        yield _formatar_csv(lote) if formato == "csv" else _formatar_ndjson(lote)
+
+
+async def stream_exportacao(filtros: Optional[FiltroTitulos], formato: str) -> AsyncIterator[str]:
+
+    # a StreamingResponse continua lendo depois que o endpoint retorna,
+    # então a exportação usa uma sessão própria em vez da sessão da requisição
+    async with SessionLocal() as db:
+        async for pedaco in gerar_exportacao(db, filtros, formato):
+            yield pedaco
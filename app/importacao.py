@@ -0,0 +1,134 @@
+import csv
+import io
+from decimal import Decimal, ROUND_HALF_EVEN
+from types import SimpleNamespace
+from typing import Iterable, List
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select, any_, cast, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import agregados
+from app.database import reservar_ids, copiar_registros
+from app.modelo import Titulo, Categoria, Contato, ContaBancaria, StatusTitulo
+from app.schemas import TituloBase, ErroLinhaImportacao, ResultadoImportacao
+
+# Importação em massa de títulos (integração com ERP).
+# 1. valida cada linha com as regras de TituloBase (valor > 0, ids > 0, enums...)
+# 2. confere as FKs de todas as linhas com uma consulta por tabela
+# 3. grava as linhas válidas com COPY, em lotes, com ids pré-alocados da sequence
+# Linhas inválidas entram no relatório de erros sem abortar o restante.
+
+MAX_LINHAS = 200_000
+TAMANHO_LOTE = 10_000
+
+# limites das colunas de 'titulos' (String(255) e Numeric(15, 2))
+LIMITE_DESCRICAO = 255
+LIMITE_VALOR = Decimal(10) ** 13
+CENTAVOS = Decimal("0.01")
+
+_validador_titulo = TypeAdapter(TituloBase)
+
+COLUNAS_COPY = [
+    "id", "descricao", "valor", "data_vencimento", "tipo", "status",
+    "numero_parcela", "total_parcelas", "categoria_id", "contato_id", "conta_bancaria_id",
+]
+
+
+class ImportacaoGrandeDemais(ValueError):
+    pass
+
+
+class ArquivoInvalido(ValueError):
+    # CSV malformado ou com codificação inválida: o arquivo inteiro é recusado
+    pass
+
+
+def ler_csv(conteudo: io.TextIOBase) -> Iterable[dict]:
+    # cabeçalho com os nomes dos campos de TituloBase; colunas vazias viram ausentes
+    # o TextIOWrapper do multipart decodifica sob demanda, em blocos: o UnicodeDecodeError
+    # aparece aqui e sem o número exato da linha
+    leitor = csv.DictReader(conteudo)
+    try:
+        for linha in leitor:
+            yield {campo: valor for campo, valor in linha.items() if campo and valor not in (None, "")}
+    except UnicodeDecodeError:
+        raise ArquivoInvalido("CSV não está em UTF-8.")
+    except csv.Error as e:
+        raise ArquivoInvalido(f"CSV inválido na linha {leitor.line_num}: {e}")
+
+
+def _mensagens(erro: ValidationError) -> List[str]:
+    return [f"{'.'.join(map(str, e['loc'])) or 'linha'}: {e['msg']}" for e in erro.errors()]
+
+
+async def _ids_existentes(db: AsyncSession, modelo, ids: set) -> set:
+    if not ids:
+        return set()
+    # '= ANY(array)' manda um único parâmetro, qualquer que seja o número de ids
+    result = await db.execute(select(modelo.id).where(modelo.id == any_(cast(list(ids), ARRAY(Integer)))))
+    return set(result.scalars().all())
+
+
+async def importar_titulos(db: AsyncSession, linhas: Iterable[dict]) -> ResultadoImportacao:
+
+    # 1. validação (pura CPU, sem banco)
+    validos = []
+    erros = []
+    for numero, bruto in enumerate(linhas, start=1):
+        if numero > MAX_LINHAS:
+            raise ImportacaoGrandeDemais(f"Importação limitada a {MAX_LINHAS} linhas por requisição")
+        try:
+            validos.append((numero, _validador_titulo.validate_python(bruto)))
+        except ValidationError as e:
+            erros.append(ErroLinhaImportacao(linha=numero, erros=_mensagens(e)))
+
+    # 2. integridade referencial: uma consulta por tabela para o lote inteiro,
+    # em vez de deixar uma FK inválida abortar o COPY de todas as linhas
+    categorias = await _ids_existentes(db, Categoria, {t.categoria_id for _, t in validos})
+    contatos = await _ids_existentes(db, Contato, {t.contato_id for _, t in validos})
+    contas = await _ids_existentes(db, ContaBancaria, {t.conta_bancaria_id for _, t in validos})
+
+    aceitos = []
+    for numero, t in validos:
+        faltantes = []
+        # limites das colunas: um único valor fora deles abortaria o COPY do lote inteiro
+        if len(t.descricao) > LIMITE_DESCRICAO:
+            faltantes.append(f"descricao: máximo de {LIMITE_DESCRICAO} caracteres")
+        t.valor = t.valor.quantize(CENTAVOS, rounding=ROUND_HALF_EVEN)
+        if t.valor >= LIMITE_VALOR:
+            faltantes.append(f"valor: deve ser menor que {LIMITE_VALOR}")
+        if t.categoria_id not in categorias:
+            faltantes.append(f"categoria_id: categoria {t.categoria_id} não existe")
+        if t.contato_id not in contatos:
+            faltantes.append(f"contato_id: contato {t.contato_id} não existe")
+        if t.conta_bancaria_id not in contas:
+            faltantes.append(f"conta_bancaria_id: conta {t.conta_bancaria_id} não existe")
+        if faltantes:
+            erros.append(ErroLinhaImportacao(linha=numero, erros=faltantes))
+        else:
+            aceitos.append(t)
+
+    erros.sort(key=lambda e: e.linha)
+    if not aceitos:
+        return ResultadoImportacao(inseridos=0, ids=[], erros=erros)
+
+    # 3. carga: ids pré-alocados + COPY em lotes, tudo na mesma transação do rollup
+    ids = await reservar_ids(db, Titulo.__tablename__, len(aceitos))
+    registros = [
+        (
+            id_titulo, t.descricao, t.valor, t.data_vencimento, t.tipo.value, StatusTitulo.PENDENTE.value,
+            1, 1, t.categoria_id, t.contato_id, t.conta_bancaria_id,
+        )
+        for id_titulo, t in zip(ids, aceitos)
+    ]
+    for inicio in range(0, len(registros), TAMANHO_LOTE):
+        await copiar_registros(db, Titulo.__tablename__, COLUNAS_COPY, registros[inicio:inicio + TAMANHO_LOTE])
+
+    await agregados.registrar_insercao(
+        db, (SimpleNamespace(**t.model_dump(), status=StatusTitulo.PENDENTE) for t in aceitos)
+    )
+    await db.commit()
+
+    return ResultadoImportacao(inseridos=len(ids), ids=ids, erros=erros)
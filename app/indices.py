@@ -0,0 +1,109 @@
+import asyncio
+import sys
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+from app.database import engine
+from app.modelo import Base
+
+# Criação dos índices do modelo que faltam em tabelas já existentes (create_all só cria os
+# índices junto com tabelas novas). Fora do init_db: um CREATE INDEX comum trava as escritas
+# na tabela até terminar, o que numa 'titulos' grande é deixar a API parada no boot.
+#
+#   python -m app.indices            cria os índices que faltam
+#   python -m app.indices listar     só lista
+#
+# Cada índice é criado com CONCURRENTLY numa conexão em autocommit (CONCURRENTLY não roda
+# dentro de transação), com a API no ar:
+# - um índice INVALID (build concorrente interrompido) é removido e refeito
+# - tabela particionada (app/particionamento.py) não aceita CONCURRENTLY: o índice é criado
+#   ON ONLY no pai (só catálogo), concorrentemente em cada partição e anexado a ele; o índice
+#   do pai fica válido quando a última partição é anexada
+
+_SQL_INDICE = text("""
+    SELECT i.indisvalid AS valido, c.relkind = 'I' AS particionado
+    FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+    WHERE c.oid = to_regclass(:nome)
+""")
+
+
+async def _estado(conexao, nome: str):
+    return (await conexao.execute(_SQL_INDICE, {"nome": nome})).first()
+
+
+async def faltantes(conexao) -> list:
+    # índices do modelo inexistentes ou inválidos no banco
+    indices = []
+    for tabela in Base.metadata.sorted_tables:
+        for indice in sorted(tabela.indexes, key=lambda i: i.name):
+            estado = await _estado(conexao, indice.name)
+            if estado is None or not estado.valido:
+                indices.append(indice)
+    return indices
+
+
+def _ddl(indice, nome: str, tabela: str, prefixo: str) -> str:
+    ddl = str(CreateIndex(indice).compile(dialect=engine.dialect))
+    cabecalho = f"INDEX {indice.name} ON {indice.table.name} "
+    assert cabecalho in ddl, ddl
+    return ddl.replace(cabecalho, f"INDEX {prefixo}{nome} ON {tabela} ", 1)
+
+
+async def _criar(conexao, indice):
+    tabela = indice.table.name
+    estado = await _estado(conexao, indice.name)
+    particoes = (await conexao.execute(text(
+        "SELECT inhrelid::regclass::text FROM pg_inherits i "
+        "JOIN pg_partitioned_table p ON p.partrelid = i.inhparent "
+        "WHERE i.inhparent = to_regclass(:tabela) ORDER BY 1"
+    ), {"tabela": tabela})).scalars().all()
+
+    if not particoes:
+        if estado is not None:
+            await conexao.execute(text(f"DROP INDEX CONCURRENTLY {indice.name}"))
+        await conexao.execute(text(_ddl(indice, indice.name, tabela, "CONCURRENTLY ")))
+        return
+
+    if estado is None:
+        await conexao.execute(text(_ddl(indice, indice.name, f"ONLY {tabela}", "")))
+    for particao in particoes:
+        nome = f"{indice.name}_{particao}"[:63]
+        estado_particao = await _estado(conexao, nome)
+        if estado_particao is not None and not estado_particao.valido:
+            await conexao.execute(text(f"DROP INDEX CONCURRENTLY {nome}"))
+            estado_particao = None
+        if estado_particao is None:
+            await conexao.execute(text(_ddl(indice, nome, particao, "CONCURRENTLY ")))
+        # já anexado ao mesmo pai: não faz nada
+        await conexao.execute(text(f"ALTER INDEX {indice.name} ATTACH PARTITION {nome}"))
+
+
+async def _cli(comando: str) -> int:
+    async with engine.execution_options(isolation_level="AUTOCOMMIT").connect() as conexao:
+        indices = await faltantes(conexao)
+        if not indices:
+            print("Nenhum índice faltando.")
+            return 0
+        for indice in indices:
+            if comando == "listar":
+                print(f"{indice.table.name}: {indice.name}")
+                continue
+            print(f"criando {indice.name} em {indice.table.name}...")
+            await _criar(conexao, indice)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else "criar"
+    if comando not in ("criar", "listar"):
+        print("Uso: python -m app.indices [listar]")
+        sys.exit(2)
+
+    sys.exit(asyncio.run(_cli(comando)))
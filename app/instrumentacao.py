@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.database import engine, engine_leitura
+
+# Instrumentação de SQL por requisição (substitui o echo=True do engine).
+#
+# Eventos do engine (before/after_cursor_execute) acumulam, na requisição corrente, o número
+# de comandos, o tempo total no banco, as linhas retornadas/afetadas e o comando mais lento.
+# A requisição corrente vem de um ContextVar: o SQLAlchemy executa os eventos num greenlet
+# que herda o contexto da task do asyncio, então cada requisição enxerga só os próprios comandos.
+#
+# Saídas:
+# - cabeçalho Server-Timing em toda resposta (db = tempo total; db-lenta = comando mais lento,
+#   identificado só pelo hash da impressão digital, para não expor SQL ao cliente)
+# - log "app.sql" dos comandos acima de SQL_LENTA_MS, com amostragem (SQL_LENTA_AMOSTRAGEM)
+#
+# Com SQL_INSTRUMENTACAO=0 nenhum evento nem middleware é registrado: custo zero.
+
+SQL_INSTRUMENTACAO = os.getenv("SQL_INSTRUMENTACAO", "1") == "1"
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", "200"))
+SQL_LENTA_AMOSTRAGEM = float(os.getenv("SQL_LENTA_AMOSTRAGEM", "1.0"))  # fração dos lentos que vai para o log
+
+logger = logging.getLogger("app.sql")
+
+
+class EstatisticasSql:
+
+    __slots__ = ("rota", "comandos", "tempo_ms", "linhas", "mais_lento_ms", "mais_lento")
+
+    def __init__(self, rota: str):
+        self.rota = rota
+        self.comandos = 0
+        self.tempo_ms = 0.0
+        self.linhas = 0
+        self.mais_lento_ms = 0.0
+        self.mais_lento: Optional[str] = None
+
+    def server_timing(self) -> str:
+        valor = f'db;dur={self.tempo_ms:.2f};desc="{self.comandos} consultas, {self.linhas} linhas"'
+        if self.mais_lento is not None:
+            valor += f', db-lenta;dur={self.mais_lento_ms:.2f};desc="{_hash(self.mais_lento)}"'
+        return valor
+
+
+_estatisticas: ContextVar[Optional[EstatisticasSql]] = ContextVar("estatisticas_sql", default=None)
+
+
+def estatisticas_atuais() -> Optional[EstatisticasSql]:
+    return _estatisticas.get()
+
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![$\w])\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def impressao_digital(statement: str) -> str:
+    # mesmo comando com valores diferentes -> mesma impressão digital
+    # (os parâmetros já vêm separados; isto cobre literais embutidos e listas IN de tamanho variável)
+    texto = _RE_STRING.sub("?", statement)
+    texto = _RE_NUMERO.sub("?", texto)
+    texto = _RE_LISTA.sub("(?...)", texto)
+    return _RE_ESPACOS.sub(" ", texto).strip()
+
+
+@lru_cache(maxsize=1024)
+def _hash(fingerprint: str) -> str:
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:10]
+
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicio_sql", []).append(time.perf_counter())
+
+
+def _depois(conn, cursor, statement, parameters, context, executemany):
+    duracao_ms = (time.perf_counter() - conn.info["inicio_sql"].pop()) * 1000
+    linhas = max(cursor.rowcount, 0)
+
+    estatisticas = _estatisticas.get()
+    if estatisticas is not None:
+        estatisticas.comandos += 1
+        estatisticas.tempo_ms += duracao_ms
+        estatisticas.linhas += linhas
+        if duracao_ms > estatisticas.mais_lento_ms:
+            estatisticas.mais_lento_ms = duracao_ms
+            estatisticas.mais_lento = impressao_digital(statement)
+
+    if duracao_ms >= SQL_LENTA_MS and random.random() < SQL_LENTA_AMOSTRAGEM:
+        fingerprint = impressao_digital(statement)
+        logger.warning(json.dumps({
+            "evento": "sql_lenta",
+            "duracao_ms": round(duracao_ms, 2),
+            "linhas": linhas,
+            "rota": estatisticas.rota if estatisticas is not None else None,
+            "hash": _hash(fingerprint),
+            "sql": fingerprint,
+        }, ensure_ascii=False))
+
+
+def _erro(contexto_excecao):
+    # comando que falhou: descarta o início pendente para não desalinhar a pilha da conexão
+    conn = contexto_excecao.connection
+    if conn is not None and conn.info.get("inicio_sql"):
+        conn.info["inicio_sql"].pop()
+
+
+class MiddlewareSql:
+
+    # ASGI puro (sem BaseHTTPMiddleware): não cria task extra nem bufferiza a resposta
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        estatisticas = EstatisticasSql(f"{scope['method']} {scope['path']}")
+        token = _estatisticas.set(estatisticas)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                cabecalhos = list(mensagem.get("headers", []))
+                cabecalhos.append((b"server-timing", estatisticas.server_timing().encode()))
+                mensagem["headers"] = cabecalhos
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _estatisticas.reset(token)
+
+
+def instalar(app):
+    if not SQL_INSTRUMENTACAO:
+        return
+    for motor in (engine, engine_leitura):
+        if motor is None:
+            continue
+        event.listen(motor.sync_engine, "before_cursor_execute", _antes)
+        event.listen(motor.sync_engine, "after_cursor_execute", _depois)
+        event.listen(motor.sync_engine, "handle_error", _erro)
+    app.add_middleware(MiddlewareSql)
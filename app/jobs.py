@@ -0,0 +1,319 @@
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import select, update, case, literal_column, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import agregados, anexos, conciliacao, exportacao, leitura, notificacoes
+from app.database import SessionLocal
+from app.modelo import Job, StatusJob
+from app.schemas import FiltroTitulos, ResultadoConciliacao
+
+# Fila de jobs no próprio Postgres (tabela 'jobs'), sem broker externo.
+#
+# - enfileirar(): INSERT na transação de quem pede + NOTIFY (entregue só no commit) que acorda
+#   os workers de todos os processos; sem notificação (LISTEN caído), eles consultam a fila a
+#   cada JOBS_INTERVALO segundos
+# - retirada: UPDATE ... FROM (SELECT ... FOR UPDATE SKIP LOCKED LIMIT 1) RETURNING, numa
+#   transação curta: vários workers, em qualquer número de processos, nunca pegam o mesmo job
+#   e não esperam uns pelos outros; nenhuma conexão fica presa durante a execução
+# - cada job roda com tempo limite (JOBS_TEMPO_LIMITE) e abre as próprias sessões
+# - falha: volta para PENDENTE com backoff exponencial (com jitter) até max_tentativas, depois
+#   FALHOU; ErroPermanente (ex: extrato inválido) vai direto para FALHOU
+# - worker que morre no meio: a trava (travado_ate) vence e o job volta para a fila
+#
+# Workers: JOBS_WORKERS tarefas asyncio no lifespan da API (0 desliga) e/ou processos
+# dedicados com 'python -m app.worker'.
+
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+INTERVALO_FILA = float(os.getenv("JOBS_INTERVALO", "5"))  # segundos entre consultas sem NOTIFY
+TEMPO_LIMITE = int(os.getenv("JOBS_TEMPO_LIMITE", "3600"))  # segundos por execução
+MAX_TENTATIVAS = int(os.getenv("JOBS_MAX_TENTATIVAS", "5"))
+BACKOFF_BASE = 10  # segundos; dobra a cada tentativa
+BACKOFF_MAX = 3600
+DIRETORIO_RESULTADOS = os.getenv("JOBS_DIR", "dados/jobs")
+
+# tipos com no máximo um job PENDENTE/EXECUTANDO por vez: um novo pedido reaproveita o ativo
+# (a reconstrução do rollup trava as escritas em 'titulos'; pedidos repetidos só empilhariam locks)
+TIPOS_UNICOS = {"reconstruir_rollup"}
+# chave do pg_advisory_xact_lock que serializa a verificação de TIPOS_UNICOS
+CHAVE_LOCK_JOBS_UNICOS = 7_310_003
+
+# margem entre o tempo limite do job e a trava: quem recupera jobs travados não pode pegar
+# um que ainda está rodando
+MARGEM_TRAVA = 60
+INTERVALO_RECUPERACAO = 60
+
+
+class ErroPermanente(Exception):
+    # falha que não muda numa nova tentativa: o job vai direto para FALHOU
+    pass
+
+
+async def enfileirar(
+    db: AsyncSession,
+    tipo: str,
+    parametros: dict,
+    usuario_id: Optional[int] = None,
+    max_tentativas: int = MAX_TENTATIVAS,
+) -> Job:
+
+    # não faz commit: o job só fica visível (e os workers só são acordados) no commit de quem pede
+    # tipos de TIPOS_UNICOS devolvem o job já ativo, se houver, em vez de criar outro
+
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de job desconhecido: {tipo}")
+    if tipo in TIPOS_UNICOS:
+        # dois pedidos simultâneos: o segundo espera o commit do primeiro e enxerga o job dele
+        await db.execute(select(func.pg_advisory_xact_lock(CHAVE_LOCK_JOBS_UNICOS)))
+        ativo = await db.scalar(
+            select(Job)
+            .where(Job.tipo == tipo, Job.status.in_((StatusJob.PENDENTE.value, StatusJob.EXECUTANDO.value)))
+            .order_by(Job.id)
+            .limit(1)
+        )
+        if ativo is not None:
+            return ativo
+    job = Job(tipo=tipo, parametros=parametros, usuario_id=usuario_id, max_tentativas=max_tentativas)
+    db.add(job)
+    await db.flush()
+    await notificacoes.notificar(db, notificacoes.CANAL_JOBS, tipo)
+    return job
+
+
+def caminho_resultado(job_id: int, formato: str) -> str:
+    return os.path.join(DIRETORIO_RESULTADOS, f"{job_id}.{formato}")
+
+
+# --- tipos de job ---
+# cada um recebe a linha retirada da fila e devolve o resultado (JSON) gravado em jobs.resultado
+
+async def _exportar(job) -> dict:
+    formato = job.parametros.get("formato", "csv")
+    filtros = FiltroTitulos(**job.parametros.get("filtros", {}))
+    os.makedirs(DIRETORIO_RESULTADOS, exist_ok=True)
+    fd, caminho_tmp = tempfile.mkstemp(dir=DIRETORIO_RESULTADOS)
+    tamanho = 0
+    try:
+        with os.fdopen(fd, "wb") as arquivo:
+            async with SessionLocal() as db:
+                async for pedaco in exportacao.gerar_exportacao(db, filtros, formato):
+                    dados = pedaco.encode()
+                    tamanho += len(dados)
+                    await asyncio.to_thread(arquivo.write, dados)
+        # o arquivo só aparece completo: uma nova tentativa não deixa meia exportação para trás
+        os.replace(caminho_tmp, caminho_resultado(job.id, formato))
+    except BaseException:
+        try:
+            os.remove(caminho_tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    return {"formato": formato, "bytes": tamanho}
+
+
+async def _ler_arquivo(caminho: str):
+    with open(caminho, "rb") as arquivo:
+        while True:
+            bloco = await asyncio.to_thread(arquivo.read, anexos.TAMANHO_BLOCO)
+            if not bloco:
+                return
+            yield bloco
+
+
+async def _conciliar(job) -> dict:
+    # o extrato foi gravado no armazenamento de anexos (por SHA-256) ao enfileirar
+    p = job.parametros
+    caminho = anexos.caminho_absoluto(p["sha256"])
+    if not os.path.isfile(caminho):
+        raise ErroPermanente("Arquivo do extrato não encontrado.")
+    fluxo = _ler_arquivo(caminho)
+    leitor = conciliacao.ler_ofx(fluxo) if p["formato"] == "ofx" else conciliacao.ler_csv(fluxo)
+    async with SessionLocal() as db:
+        try:
+            resultado = await conciliacao.conciliar(db, p["conta_id"], leitor, p["janela_dias"], p["baixar"])
+        except conciliacao.ErroExtrato as e:
+            raise ErroPermanente(str(e))
+        if resultado["baixados"] and job.usuario_id is not None:
+            await leitura.registrar_escrita(db, job.usuario_id)
+        await db.commit()
+    return ResultadoConciliacao(**resultado).model_dump(mode="json")
+
+
+async def _reconstruir_rollup(job) -> dict:
+    async with SessionLocal() as db:
+        return {"linhas": await agregados.reconstruir(db)}
+
+
+TIPOS: Dict[str, Callable[..., Awaitable[dict]]] = {
+    "exportacao": _exportar,
+    "conciliacao": _conciliar,
+    "reconstruir_rollup": _reconstruir_rollup,
+}
+
+
+# --- execução ---
+
+async def _retirar(db: AsyncSession):
+    # o predicado do índice parcial vai como literal (ver tarefas._marcar_lote_vencidos)
+    proximo = (
+        select(Job.id)
+        .where(Job.status == literal_column("'PENDENTE'"))
+        .where(Job.executar_em <= func.now())
+        .order_by(Job.executar_em)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .cte("proximo")
+    )
+    stmt = (
+        update(Job)
+        .where(Job.id == proximo.c.id)
+        .values(
+            status=StatusJob.EXECUTANDO,
+            tentativas=Job.tentativas + 1,
+            data_inicio=func.now(),
+            travado_ate=func.now() + timedelta(seconds=TEMPO_LIMITE + MARGEM_TRAVA),
+        )
+        .returning(Job.id, Job.tipo, Job.parametros, Job.tentativas, Job.max_tentativas, Job.usuario_id)
+    )
+    job = (await db.execute(stmt)).first()
+    await db.commit()
+    return job
+
+
+async def _finalizar(job, **valores):
+    # a condição em 'tentativas' descarta o fim de uma execução cuja trava já tinha vencido
+    # (o job voltou para a fila e outro worker pode estar com ele)
+    async with SessionLocal() as db:
+        await db.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.tentativas == job.tentativas, Job.status == StatusJob.EXECUTANDO)
+            .values(travado_ate=None, **valores)
+        )
+        await db.commit()
+
+
+def _backoff(tentativas: int) -> timedelta:
+    espera = min(BACKOFF_BASE * 2 ** (tentativas - 1), BACKOFF_MAX)
+    # jitter: jobs que falharam juntos (ex: banco fora) não voltam todos no mesmo instante
+    return timedelta(seconds=espera * random.uniform(0.5, 1.0))
+
+
+async def _rodar(job) -> dict:
+    funcao = TIPOS.get(job.tipo)
+    if funcao is None:
+        # job de um tipo que esta versão não conhece mais
+        raise ErroPermanente(f"tipo de job desconhecido: {job.tipo}")
+    return await funcao(job)
+
+
+async def _executar(job):
+    inicio = time.perf_counter()
+    try:
+        resultado = await asyncio.wait_for(_rodar(job), TEMPO_LIMITE)
+    except asyncio.CancelledError:
+        # desligamento do worker: devolve o job sem gastar a tentativa
+        await _finalizar(job, status=StatusJob.PENDENTE, tentativas=job.tentativas - 1, executar_em=func.now())
+        raise
+    except Exception as e:
+        if isinstance(e, asyncio.TimeoutError):
+            erro = "tempo limite excedido"
+        else:
+            erro = str(e) if isinstance(e, ErroPermanente) else f"{type(e).__name__}: {e}"
+        definitivo = isinstance(e, ErroPermanente) or job.tentativas >= job.max_tentativas
+        if definitivo:
+            await _finalizar(job, status=StatusJob.FALHOU, erro=erro, data_conclusao=func.now())
+        else:
+            await _finalizar(job, status=StatusJob.PENDENTE, erro=erro,
+                             executar_em=func.now() + _backoff(job.tentativas))
+        print(f" [Jobs] {job.tipo} #{job.id} falhou (tentativa {job.tentativas}/{job.max_tentativas}): {erro}")
+        return
+    await _finalizar(job, status=StatusJob.CONCLUIDO, resultado=resultado, erro=None, data_conclusao=func.now())
+    print(f" [Jobs] {job.tipo} #{job.id} concluído em {(time.perf_counter() - inicio) * 1000:.0f}ms")
+
+
+async def recuperar_travados() -> int:
+
+    # jobs EXECUTANDO com a trava vencida (worker morreu): voltam para a fila, ou FALHOU se
+    # já gastaram todas as tentativas
+
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(Job)
+            .where(Job.status == literal_column("'EXECUTANDO'"))
+            .where(Job.travado_ate < func.now())
+            .values(
+                status=case(
+                    (Job.tentativas >= Job.max_tentativas, StatusJob.FALHOU.value),
+                    else_=StatusJob.PENDENTE.value,
+                ),
+                erro="execução interrompida (trava vencida)",
+                travado_ate=None,
+                executar_em=func.now(),
+            )
+        )
+        await db.commit()
+    return result.rowcount
+
+
+_novo_job = asyncio.Event()
+_tarefas: list = []
+
+notificacoes.registrar(notificacoes.CANAL_JOBS, lambda _payload: _novo_job.set())
+
+
+async def _trabalhador(numero: int):
+    while True:
+        try:
+            # limpo antes de consultar: um NOTIFY que chegue durante a consulta não se perde
+            _novo_job.clear()
+            async with SessionLocal() as db:
+                job = await _retirar(db)
+            if job is not None:
+                await _executar(job)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f" [Jobs] worker {numero}: {e}")
+        try:
+            await asyncio.wait_for(_novo_job.wait(), INTERVALO_FILA)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _recuperar_periodicamente():
+    while True:
+        try:
+            recuperados = await recuperar_travados()
+            if recuperados:
+                print(f" [Jobs] {recuperados} job(s) com trava vencida devolvido(s) à fila")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f" [Jobs] falha ao recuperar jobs travados: {e}")
+        await asyncio.sleep(INTERVALO_RECUPERACAO)
+
+
+def iniciar(quantidade: int = JOBS_WORKERS):
+    if quantidade <= 0:
+        return
+    _tarefas.append(asyncio.create_task(_recuperar_periodicamente()))
+    for numero in range(quantidade):
+        _tarefas.append(asyncio.create_task(_trabalhador(numero)))
+
+
+async def parar():
+    for tarefa in _tarefas:
+        tarefa.cancel()
+    for tarefa in _tarefas:
+        try:
+            await tarefa
+        except asyncio.CancelledError:
+            pass
+    _tarefas.clear()
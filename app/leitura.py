@@ -0,0 +1,149 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import notificacoes, versao
+from app.database import engine, engine_leitura
+
+# Roteamento das leituras para a réplica (DATABASE_READ_URL), ver deps.get_read_db.
+#
+# Uma requisição de leitura vai para a réplica quando:
+# - a réplica responde e o atraso dela é de no máximo LEITURA_ATRASO_MAX segundos
+# - o usuário não escreveu nada nos últimos LEITURA_JANELA_ESCRITA segundos
+#   (leitura das próprias escritas: quem acabou de criar um título lê do primário)
+# Caso contrário, a leitura cai no primário.
+#
+# Cache de respostas/ETag (app/versao.py): uma resposta só pode ser guardada com a versão V
+# se a réplica já aplicou todas as escritas até V. O monitor amostra periodicamente
+# (versão conhecida, LSN atual do primário) e compara com o LSN já aplicado na réplica:
+# 'versao_replicada' é a maior versão que com certeza está na réplica. Respostas da réplica
+# com versão acima disso saem sem ETag e sem cache (ainda dentro do atraso tolerado).
+
+LEITURA_ATRASO_MAX = float(os.getenv("LEITURA_ATRASO_MAX", "5"))  # segundos
+LEITURA_JANELA_ESCRITA = float(os.getenv("LEITURA_JANELA_ESCRITA", "5"))  # segundos
+INTERVALO_MONITOR = float(os.getenv("LEITURA_MONITOR_INTERVALO", "1"))  # segundos
+
+replica_disponivel = False
+atraso_replica: Optional[float] = None  # segundos
+versao_replicada = 0
+
+_amostras: deque = deque(maxlen=256)  # (versao, lsn do primário)
+_escritas_por_usuario: dict = {}  # usuario_id -> time.monotonic() da última escrita
+_tarefa: asyncio.Task = None
+
+
+def _lsn(valor: str) -> int:
+    # 'XXXXXXXX/YYYYYYYY' -> posição no WAL
+    alto, baixo = valor.split("/")
+    return (int(alto, 16) << 32) | int(baixo, 16)
+
+
+def _marcar_escrita(usuario_id: int):
+    agora = time.monotonic()
+    _escritas_por_usuario[usuario_id] = agora
+    # limpeza preguiçosa das marcas vencidas
+    if len(_escritas_por_usuario) > 10_000:
+        for uid, instante in list(_escritas_por_usuario.items()):
+            if agora - instante > LEITURA_JANELA_ESCRITA:
+                del _escritas_por_usuario[uid]
+
+
+def _ao_notificar(payload: str):
+    _marcar_escrita(int(payload))
+
+
+notificacoes.registrar(notificacoes.CANAL_ESCRITAS, _ao_notificar)
+
+
+async def registrar_escrita(db: AsyncSession, usuario_id: int):
+
+    # chamar dentro da transação de escrita de uma rota: no COMMIT, todos os workers
+    # passam a mandar as leituras deste usuário ao primário por LEITURA_JANELA_ESCRITA segundos
+
+    if engine_leitura is None:
+        return
+    await notificacoes.notificar(db, notificacoes.CANAL_ESCRITAS, str(usuario_id))
+    event.listen(db.sync_session, "after_commit", lambda _sessao: _marcar_escrita(usuario_id), once=True)
+
+
+def versao_limite_replica(usuario_id: int) -> Optional[int]:
+
+    # None: ler do primário; senão: ler da réplica, que garantidamente contém as escritas
+    # até a versão devolvida (limite para guardar respostas no cache)
+
+    if engine_leitura is None or not replica_disponivel:
+        return None
+    if atraso_replica is None or atraso_replica > LEITURA_ATRASO_MAX:
+        return None
+    ultima_escrita = _escritas_por_usuario.get(usuario_id)
+    if ultima_escrita is not None and time.monotonic() - ultima_escrita < LEITURA_JANELA_ESCRITA:
+        return None
+    return versao_replicada
+
+
+async def _amostrar():
+    global replica_disponivel, atraso_replica, versao_replicada
+
+    # versão lida ANTES do LSN: toda escrita com versão <= v já foi commitada antes deste LSN
+    v = versao.atual()
+    async with engine.connect() as conexao:
+        lsn_primario = await conexao.scalar(text("SELECT pg_current_wal_lsn()::text"))
+    if v is not None:
+        _amostras.append((v, _lsn(lsn_primario)))
+
+    async with engine_leitura.connect() as conexao:
+        linha = (await conexao.execute(text(
+            "SELECT pg_last_wal_replay_lsn()::text, "
+            "CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        ))).one()
+
+    lsn_replica, atraso = linha
+    if lsn_replica is None:
+        # não é um standby (ex: DATABASE_READ_URL aponta para o próprio primário): sempre em dia
+        atraso_replica = 0.0
+        if v is not None:
+            versao_replicada = max(versao_replicada, v)
+        _amostras.clear()
+    else:
+        atraso_replica = float(atraso or 0)
+        aplicado = _lsn(lsn_replica)
+        while _amostras and _amostras[0][1] <= aplicado:
+            versao_replicada = max(versao_replicada, _amostras.popleft()[0])
+    replica_disponivel = True
+
+
+async def _monitorar():
+    global replica_disponivel
+    while True:
+        try:
+            await _amostrar()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if replica_disponivel:
+                print(f" [Leitura] réplica indisponível, leituras no primário: {e}")
+            replica_disponivel = False
+        await asyncio.sleep(INTERVALO_MONITOR)
+
+
+def iniciar():
+    global _tarefa
+    if engine_leitura is not None and _tarefa is None:
+        _tarefa = asyncio.create_task(_monitorar())
+
+
+async def parar():
+    global _tarefa
+    if _tarefa is not None:
+        _tarefa.cancel()
+        try:
+            await _tarefa
+        except asyncio.CancelledError:
+            pass
+        _tarefa = None
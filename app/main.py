@@ -1,9 +1,11 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.database import init_db
+from app.database import init_db, SessionLocal, engine
 from app.rotas import router 
+from app import agregados, notificacoes, tarefas, instrumentacao, metricas, leitura, jobs, indices
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -11,10 +13,33 @@ async def lifespan(app: FastAPI):
     try:
         await init_db()
         print(" [Database] tabelas verificadas/criadas com sucesso.")
+        async with engine.connect() as conexao:
+            faltando = await indices.faltantes(conexao)
+        if faltando:
+            print(f" [Database] {len(faltando)} índice(s) do modelo faltando: rode 'python -m app.indices'.")
+        async with SessionLocal() as db:
+            await agregados.garantir_resumo(db)
+        print(" [Database] rollup do dashboard verificado.")
     except Exception as e:
         print(f" [Erro Crítico] Falha ao conectar no banco: {e}")
     
+    # LISTEN/NOTIFY para invalidar caches em memória (ex: usuários autenticados)
+    notificacoes.iniciar()
+    # tarefas agendadas (ex: PENDENTE -> VENCIDO), ver app/tarefas.py
+    tarefas.iniciar()
+    # workers da fila de jobs (JOBS_WORKERS; 0 quando rodam só em 'python -m app.worker')
+    jobs.iniciar()
+    # atraso do event loop para /metrics
+    metricas.iniciar()
+    # monitor do atraso da réplica de leitura (só com DATABASE_READ_URL)
+    leitura.iniciar()
+    
     yield 
+    await leitura.parar()
+    await metricas.parar()
+    await jobs.parar()
+    await tarefas.parar()
+    await notificacoes.parar()
     print("desligando sistema financeiro")
 
 # Definição da API
@@ -38,8 +63,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],   
     allow_headers=["*"],   
+    # cursor da paginação de /titulos, cabeçalhos do download de anexos (Range/retomada)
+    # e Location dos jobs enfileirados
+    expose_headers=["X-Proximo-Cursor", "Content-Disposition", "Content-Range", "Accept-Ranges", "ETag", "Location"],
 )
 
+# Server-Timing + log de SQL lenta por requisição (SQL_INSTRUMENTACAO)
+instrumentacao.instalar(app)
+# latência por rota e requisições em andamento para /metrics (mais externo: mede tudo)
+app.add_middleware(metricas.MiddlewareMetricas)
+
 app.include_router(router)
 
 # ver se está tudo ok
@@ -48,5 +81,11 @@ async def health_check():
     return {
         "status": "active",
         "servico": "financeiro-api",
-        "versao": "1.0.0"
-    }
\ No newline at end of file
+        "versao": "1.0.0",
+        "tarefas": {"marcar_vencidos": tarefas.ultima_execucao_vencidos},
+    }
+
+@app.get("/metrics", tags=["Monitoramento"], response_class=PlainTextResponse)
+async def metrics():
+    # formato texto do Prometheus (version=0.0.4)
+    return PlainTextResponse(metricas.renderizar(), media_type="text/plain; version=0.0.4")
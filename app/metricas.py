@@ -0,0 +1,195 @@
+import asyncio
+import time
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+# Métricas em memória expostas em /metrics (formato texto do Prometheus).
+#
+# Tudo aqui é atualizado só no event loop (uma thread): contadores são ints e floats simples,
+# sem locks no caminho da requisição. Cada worker expõe os próprios números; o Prometheus
+# soma os workers pelas labels de instância.
+#
+# - latência por rota (histograma) e requisições em andamento (gauge)
+# - pool de conexões: checked out, overflow, tamanho e tempo de espera por conexão (histograma,
+#   medido pelo pool de app/database.py), com a label pool="primario" ou pool="leitura" (réplica)
+# - atraso do event loop (lag), fila do bcrypt e última execução das tarefas agendadas
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_ESPERA_POOL = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+INTERVALO_LAG = 0.5  # segundos entre medições do atraso do event loop
+
+
+class Histograma:
+
+    __slots__ = ("buckets", "contagens", "soma", "total")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)  # último = +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome: str, labels: str = "") -> list:
+        separador = "," if labels else ""
+        saida = []
+        acumulado = 0
+        for limite, contagem in zip(self.buckets, self.contagens):
+            acumulado += contagem
+            saida.append(f'{nome}_bucket{{{labels}{separador}le="{limite}"}} {acumulado}')
+        saida.append(f'{nome}_bucket{{{labels}{separador}le="+Inf"}} {self.total}')
+        sufixo = f"{{{labels}}}" if labels else ""
+        saida.append(f"{nome}_sum{sufixo} {self.soma}")
+        saida.append(f"{nome}_count{sufixo} {self.total}")
+        return saida
+
+
+# (método, rota, status) -> histograma; a rota é o template (/titulos/{titulo_id}), nunca o caminho
+# real, para a cardinalidade não crescer com ids
+latencia_rotas: Dict[Tuple[str, str, str], Histograma] = {}
+requisicoes_em_andamento = 0
+
+# nome do pool (PoolMedido.nome) -> histograma: a espera da réplica não se mistura à do primário
+espera_pool: Dict[str, Histograma] = {
+    "primario": Histograma(BUCKETS_ESPERA_POOL),
+    "leitura": Histograma(BUCKETS_ESPERA_POOL),
+}
+
+lag_event_loop = 0.0
+lag_event_loop_max = 0.0
+_tarefa_lag: asyncio.Task = None
+
+
+class MiddlewareMetricas:
+
+    # ASGI puro, mesmo formato do middleware de app/instrumentacao.py
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global requisicoes_em_andamento
+        status = ["500"]
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status[0] = str(mensagem["status"])
+            await send(mensagem)
+
+        requisicoes_em_andamento += 1
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            requisicoes_em_andamento -= 1
+            # o roteador do FastAPI grava a rota encontrada no próprio scope
+            rota = scope.get("route")
+            chave = (scope["method"], getattr(rota, "path", "desconhecida"), status[0])
+            histograma = latencia_rotas.get(chave)
+            if histograma is None:
+                histograma = latencia_rotas[chave] = Histograma(BUCKETS_LATENCIA)
+            histograma.observar(time.perf_counter() - inicio)
+
+
+async def _medir_lag():
+    # dorme INTERVALO_LAG e mede quanto acordou atrasado: tempo em que o loop estava ocupado
+    global lag_event_loop, lag_event_loop_max
+    while True:
+        inicio = time.perf_counter()
+        await asyncio.sleep(INTERVALO_LAG)
+        lag_event_loop = max(0.0, time.perf_counter() - inicio - INTERVALO_LAG)
+        lag_event_loop_max = max(lag_event_loop_max, lag_event_loop)
+
+
+def iniciar():
+    global _tarefa_lag
+    if _tarefa_lag is None:
+        _tarefa_lag = asyncio.create_task(_medir_lag())
+
+
+async def parar():
+    global _tarefa_lag
+    if _tarefa_lag is not None:
+        _tarefa_lag.cancel()
+        try:
+            await _tarefa_lag
+        except asyncio.CancelledError:
+            pass
+        _tarefa_lag = None
+
+
+def _metrica(saida: list, nome: str, tipo: str, ajuda: str, valores: list):
+    saida.append(f"# HELP {nome} {ajuda}")
+    saida.append(f"# TYPE {nome} {tipo}")
+    saida.extend(valores)
+
+
+def renderizar() -> str:
+    # importados aqui: database importa este módulo (histograma de espera do pool)
+    from app.database import engine
+    from app import seguranca, tarefas, leitura, versao
+
+    saida = []
+
+    linhas_latencia = []
+    for (metodo, rota, status), histograma in sorted(latencia_rotas.items()):
+        labels = f'method="{metodo}",route="{rota}",status="{status}"'
+        linhas_latencia.extend(histograma.linhas("http_request_duration_seconds", labels))
+    _metrica(saida, "http_request_duration_seconds", "histogram",
+             "Latência das requisições HTTP por rota.", linhas_latencia)
+    _metrica(saida, "http_requests_in_flight", "gauge",
+             "Requisições HTTP em andamento.", [f"http_requests_in_flight {requisicoes_em_andamento}"])
+
+    pools = [("primario", engine)]
+    if leitura.engine_leitura is not None:
+        pools.append(("leitura", leitura.engine_leitura))
+    medidas = {"size": [], "checked_out": [], "checked_in": [], "overflow": [], "wait": []}
+    for nome, engine_pool in pools:
+        pool = engine_pool.sync_engine.pool
+        labels = f'pool="{nome}"'
+        medidas["size"].append(f"db_pool_size{{{labels}}} {pool.size()}")
+        medidas["checked_out"].append(f"db_pool_checked_out{{{labels}}} {pool.checkedout()}")
+        medidas["checked_in"].append(f"db_pool_checked_in{{{labels}}} {pool.checkedin()}")
+        medidas["overflow"].append(f"db_pool_overflow{{{labels}}} {pool.overflow()}")
+        medidas["wait"].extend(espera_pool[nome].linhas("db_pool_wait_seconds", labels))
+    _metrica(saida, "db_pool_size", "gauge", "Tamanho fixo do pool de conexões.", medidas["size"])
+    _metrica(saida, "db_pool_checked_out", "gauge", "Conexões emprestadas a sessões.", medidas["checked_out"])
+    _metrica(saida, "db_pool_checked_in", "gauge", "Conexões livres no pool.", medidas["checked_in"])
+    _metrica(saida, "db_pool_overflow", "gauge", "Conexões abertas além do pool_size (negativo: pool ainda não cheio).",
+             medidas["overflow"])
+    _metrica(saida, "db_pool_wait_seconds", "histogram", "Espera para obter uma conexão do pool.", medidas["wait"])
+
+    if leitura.engine_leitura is not None:
+        _metrica(saida, "db_replica_up", "gauge", "Réplica de leitura respondendo ao monitor.",
+                 [f"db_replica_up {int(leitura.replica_disponivel)}"])
+        _metrica(saida, "db_replica_lag_seconds", "gauge", "Atraso de replay da réplica de leitura.",
+                 [f"db_replica_lag_seconds {leitura.atraso_replica if leitura.atraso_replica is not None else 'NaN'}"])
+        _metrica(saida, "db_replica_versions_behind", "gauge", "Versões de dados ainda não confirmadas na réplica.",
+                 [f"db_replica_versions_behind {max(0, (versao.atual() or 0) - leitura.versao_replicada)}"])
+
+    _metrica(saida, "event_loop_lag_seconds", "gauge", "Atraso do event loop na última medição.",
+             [f"event_loop_lag_seconds {lag_event_loop}"])
+    _metrica(saida, "event_loop_lag_max_seconds", "gauge", "Maior atraso do event loop desde o início.",
+             [f"event_loop_lag_max_seconds {lag_event_loop_max}"])
+
+    _metrica(saida, "bcrypt_queue_depth", "gauge", "Operações de senha em execução ou na fila do pool do bcrypt.",
+             [f"bcrypt_queue_depth {seguranca.operacoes_senha_pendentes()}"])
+    _metrica(saida, "bcrypt_queue_capacity", "gauge", "Limite de operações de senha (workers + fila).",
+             [f"bcrypt_queue_capacity {seguranca.BCRYPT_WORKERS + seguranca.BCRYPT_FILA_MAX}"])
+
+    vencidos = tarefas.ultima_execucao_vencidos
+    if vencidos["duracao_ms"] is not None:
+        _metrica(saida, "tarefa_vencidos_duracao_seconds", "gauge", "Duração da última execução de marcar_vencidos.",
+                 [f"tarefa_vencidos_duracao_seconds {vencidos['duracao_ms'] / 1000}"])
+        _metrica(saida, "tarefa_vencidos_linhas", "gauge", "Títulos marcados como vencidos na última execução.",
+                 [f"tarefa_vencidos_linhas {vencidos['linhas']}"])
+
+    return "\n".join(saida) + "\n"
@@ -2,8 +2,9 @@ import uuid
 from datetime import date, datetime
 from decimal import Decimal
 from enum import Enum
-from typing import List, Optional
-from sqlalchemy import ForeignKey, String, Numeric, Date, DateTime, func
+from typing import Any, List, Optional
+from sqlalchemy import ForeignKey, String, Text, Numeric, Date, DateTime, BigInteger, Index, Sequence, func, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 # Enums e Constantes
@@ -19,11 +20,21 @@ class StatusTitulo(str, Enum):
     VENCIDO = "VENCIDO"
     CANCELADO = "CANCELADO"
 
+class StatusJob(str, Enum):
+    PENDENTE = "PENDENTE"
+    EXECUTANDO = "EXECUTANDO"
+    CONCLUIDO = "CONCLUIDO"
+    FALHOU = "FALHOU"
+
 # Configuração Base do ORM
 
 class Base(DeclarativeBase):
     pass
 
+# contador global de versão dos dados (ETags e cache de respostas, ver app/versao.py)
+# avança a cada transação que escreve em titulos/categorias/contatos
+versao_dados_seq = Sequence("versao_dados_seq", metadata=Base.metadata)
+
 # Tabelas Auxiliares e Cadastros Básicos
 
 class Usuario(Base):
@@ -53,6 +64,14 @@ class Contato(Base):
 
     __tablename__ = "contatos"
 
+    # busca do autocomplete (ver consultas.buscar_contatos):
+    # - trigramas (pg_trgm, GIN) para 'contém' em qualquer posição do nome
+    # - btree em lower(nome) com text_pattern_ops para 'começa com' (termos curtos, ranking)
+    __table_args__ = (
+        Index("ix_contatos_nome_trgm", "nome", postgresql_using="gin", postgresql_ops={"nome": "gin_trgm_ops"}),
+        Index("ix_contatos_nome_prefixo", text("lower(nome) text_pattern_ops")),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     nome: Mapped[str] = mapped_column(String(100), index=True)
     documento: Mapped[Optional[str]] = mapped_column(String(20)) # CPF ou CNPJ sem formatação
@@ -83,6 +102,25 @@ class Titulo(Base):
     
     __tablename__ = "titulos"
 
+    # índices compostos para a listagem paginada por cursor (keyset) em (data_vencimento, id):
+    # cada filtro de igualdade tem um índice com o filtro na frente e a ordenação em seguida,
+    # então qualquer página custa uma descida na árvore + 'limit' linhas, seja a 1ª ou a 10.000ª
+    __table_args__ = (
+        Index("ix_titulos_vencimento_id", "data_vencimento", "id"),
+        Index("ix_titulos_tipo_vencimento_id", "tipo", "data_vencimento", "id"),
+        Index("ix_titulos_status_vencimento_id", "status", "data_vencimento", "id"),
+        Index("ix_titulos_categoria_vencimento_id", "categoria_id", "data_vencimento", "id"),
+        Index("ix_titulos_contato_vencimento_id", "contato_id", "data_vencimento", "id"),
+        Index("ix_titulos_conta_vencimento_id", "conta_bancaria_id", "data_vencimento", "id"),
+        # índice parcial da tarefa de vencidos (app/tarefas.py): só contém os PENDENTES,
+        # então localizar os que venceram custa proporcional a eles, não ao histórico
+        Index("ix_titulos_pendentes_vencimento", "data_vencimento", postgresql_where=text("status = 'PENDENTE'")),
+    )
+
+    # eager_defaults: o INSERT já devolve os defaults do servidor (data_criacao) via RETURNING,
+    # então N parcelas são gravadas em um único INSERT ... RETURNING sem refresh por linha
+    __mapper_args__ = {"eager_defaults": True}
+
     id: Mapped[int] = mapped_column(primary_key=True)
     descricao: Mapped[str] = mapped_column(String(255))
     
@@ -90,13 +128,13 @@ class Titulo(Base):
     valor: Mapped[Decimal] = mapped_column(Numeric(15, 2)) 
     
     # controle de datas essencial para fluxo de caixa
-    data_vencimento: Mapped[date] = mapped_column(Date, index=True)
+    data_vencimento: Mapped[date] = mapped_column(Date) # indexado via __table_args__
     data_pagamento: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
     data_criacao: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     
     # classificação
     tipo: Mapped[TipoLancamento] = mapped_column(String(10)) 
-    status: Mapped[StatusTitulo] = mapped_column(String(10), default=StatusTitulo.PENDENTE, index=True)
+    status: Mapped[StatusTitulo] = mapped_column(String(10), default=StatusTitulo.PENDENTE) # indexado via __table_args__
 
     # lógica de parcelamento
     # 'id_transacao_pai' serve como correlation_id
@@ -125,6 +163,89 @@ class Anexo(Base):
     nome_arquivo: Mapped[str] = mapped_column(String(255)) # Nome original para download
     caminho_arquivo: Mapped[str] = mapped_column(String(500)) # Path relativo ou S3 Key
     data_upload: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+
+    # arquivos enviados pela API ficam endereçados pelo conteúdo (app/anexos.py): anexos com o
+    # mesmo SHA-256 compartilham um único arquivo no disco. Nulos em registros antigos/importados.
+    sha256: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, index=True)
+    tamanho: Mapped[Optional[int]] = mapped_column(BigInteger, nullable=True)
+    tipo_conteudo: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     
-    titulo_id: Mapped[int] = mapped_column(ForeignKey("titulos.id"))
-    titulo: Mapped["Titulo"] = relationship(back_populates="anexos")
\ No newline at end of file
+    # com 'titulos' particionada a FK vira trigger (app/particionamento.py); o índice atende
+    # a verificação de anexos ao apagar um título
+    titulo_id: Mapped[int] = mapped_column(ForeignKey("titulos.id"), index=True)
+    titulo: Mapped["Titulo"] = relationship(back_populates="anexos")
+
+
+# agregados (rollups)
+
+class ResumoMensal(Base):
+
+    # rollup dos títulos por mês de vencimento usado pelos endpoints do dashboard
+    # mantido incrementalmente na mesma transação de cada escrita em 'titulos' (ver app/agregados.py)
+    # o volume desta tabela cresce com meses x categorias x contas, não com o número de títulos
+
+    __tablename__ = "resumo_mensal"
+
+    # primeiro dia do mês de vencimento
+    mes: Mapped[date] = mapped_column(Date, primary_key=True)
+    tipo: Mapped[TipoLancamento] = mapped_column(String(10), primary_key=True)
+    status: Mapped[StatusTitulo] = mapped_column(String(10), primary_key=True)
+    categoria_id: Mapped[int] = mapped_column(ForeignKey("categorias.id"), primary_key=True)
+    conta_bancaria_id: Mapped[int] = mapped_column(ForeignKey("contas_bancarias.id"), primary_key=True)
+
+    total: Mapped[Decimal] = mapped_column(Numeric(17, 2), default=0)
+    quantidade: Mapped[int] = mapped_column(default=0)
+
+class SaldoContato(Base):
+
+    # saldo em aberto (PENDENTE + VENCIDO) por contato e tipo, mantido junto com o resumo_mensal
+    # evita reagregar 'titulos' a cada tecla do autocomplete e no ranking de devedores/credores
+
+    __tablename__ = "saldo_contato"
+
+    contato_id: Mapped[int] = mapped_column(ForeignKey("contatos.id"), primary_key=True)
+    tipo: Mapped[TipoLancamento] = mapped_column(String(10), primary_key=True)
+
+    total_aberto: Mapped[Decimal] = mapped_column(Numeric(17, 2), default=0)
+    quantidade_aberta: Mapped[int] = mapped_column(default=0)
+
+
+# fila de jobs (ver app/jobs.py)
+
+class Job(Base):
+
+    # trabalho pesado (exportações, conciliações, reconstrução do rollup) executado fora da
+    # requisição pelos workers da fila; a própria tabela é a fila, sem broker externo
+
+    __tablename__ = "jobs"
+
+    __table_args__ = (
+        # a retirada da fila só enxerga os PENDENTES, em ordem de execução
+        Index("ix_jobs_pendentes_executar_em", "executar_em", postgresql_where=text("status = 'PENDENTE'")),
+        # jobs de workers que morreram no meio da execução (trava vencida)
+        Index("ix_jobs_executando_travado_ate", "travado_ate", postgresql_where=text("status = 'EXECUTANDO'")),
+    )
+
+    # o INSERT já devolve executar_em/data_criacao (resposta do enfileiramento sem refresh)
+    __mapper_args__ = {"eager_defaults": True}
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    tipo: Mapped[str] = mapped_column(String(50))
+    parametros: Mapped[dict] = mapped_column(JSONB, default=dict)
+    status: Mapped[StatusJob] = mapped_column(String(10), default=StatusJob.PENDENTE)
+
+    tentativas: Mapped[int] = mapped_column(default=0)
+    max_tentativas: Mapped[int] = mapped_column(default=5)
+    # próxima execução: agora ao enfileirar, depois o backoff de cada falha
+    executar_em: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    # enquanto EXECUTANDO: depois disso o worker é considerado morto e o job volta para a fila
+    travado_ate: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    resultado: Mapped[Optional[Any]] = mapped_column(JSONB, nullable=True)
+    erro: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+
+    # remover o usuário (app/admin.py) mantém o histórico dos jobs dele
+    usuario_id: Mapped[Optional[int]] = mapped_column(ForeignKey("usuarios.id", ondelete="SET NULL"), nullable=True)
+    data_criacao: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    data_inicio: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    data_conclusao: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
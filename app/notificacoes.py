@@ -0,0 +1,104 @@
+import asyncio
+import inspect
+from typing import Callable, Dict, List
+
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import engine
+
+# Invalidação de caches em memória entre processos via LISTEN/NOTIFY do Postgres.
+#
+# Cada worker da API mantém uma conexão dedicada (fora do pool) escutando os canais
+# registrados. Quem escreve chama notificar() dentro da própria transação: o Postgres
+# só entrega a notificação no COMMIT, então nenhum worker invalida algo que acabou em rollback.
+# Se a conexão cair, as notificações do intervalo se perdem; por isso, a cada (re)conexão,
+# todos os handlers de conexão são chamados (normalmente: limpar/ressincronizar o cache)
+# e, enquanto 'conectado' for False, quem depende das notificações não deve confiar no cache.
+
+CANAL_USUARIOS = "halon_usuarios"
+CANAL_VERSAO = "halon_versao"
+CANAL_ESCRITAS = "halon_escritas"  # leitura das próprias escritas (app/leitura.py)
+CANAL_JOBS = "halon_jobs"  # job novo na fila: acorda os workers (app/jobs.py)
+
+_handlers: Dict[str, List[Callable[[str], None]]] = {}
+_handlers_conexao: List[Callable] = []
+_tarefa: asyncio.Task = None
+
+conectado = False
+
+INTERVALO_RECONEXAO = 5  # segundos
+
+
+def registrar(canal: str, handler: Callable[[str], None]):
+    # handler recebe o payload (str) e roda no event loop: deve ser rápido e síncrono
+    _handlers.setdefault(canal, []).append(handler)
+
+
+def registrar_conexao(handler: Callable):
+    # chamado depois de cada (re)conexão, já escutando os canais; pode ser síncrono ou async
+    _handlers_conexao.append(handler)
+
+
+async def notificar(db: AsyncSession, canal: str, payload: str = ""):
+    # entregue aos outros processos (e a este) somente no commit da transação de 'db'
+    await db.execute(text("SELECT pg_notify(:canal, :payload)"), {"canal": canal, "payload": payload})
+
+
+def _despachar(canal: str, payload: str):
+    for handler in _handlers.get(canal, []):
+        try:
+            handler(payload)
+        except Exception as e:
+            print(f" [Notificações] erro no handler de '{canal}': {e}")
+
+
+async def _escutar():
+    global conectado
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        conexao = None
+        try:
+            conexao = await asyncpg.connect(dsn)
+            perdida = asyncio.Event()
+            conexao.add_termination_listener(lambda _c: perdida.set())
+            for canal in _handlers:
+                await conexao.add_listener(canal, lambda _c, _pid, canal, payload: _despachar(canal, payload))
+
+            # notificações perdidas enquanto estava desconectado: ressincroniza os caches
+            for handler in _handlers_conexao:
+                resultado = handler()
+                if inspect.isawaitable(resultado):
+                    await resultado
+            conectado = True
+
+            # fica parado até a conexão cair
+            await perdida.wait()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f" [Notificações] conexão de LISTEN indisponível: {e}")
+        finally:
+            conectado = False
+            if conexao is not None and not conexao.is_closed():
+                await conexao.close()
+
+        await asyncio.sleep(INTERVALO_RECONEXAO)
+
+
+def iniciar():
+    global _tarefa
+    if _tarefa is None:
+        _tarefa = asyncio.create_task(_escutar())
+
+
+async def parar():
+    global _tarefa
+    if _tarefa is not None:
+        _tarefa.cancel()
+        try:
+            await _tarefa
+        except asyncio.CancelledError:
+            pass
+        _tarefa = None
@@ -0,0 +1,224 @@
+import uuid
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List, Optional
+
+from sqlalchemy import select, update, text, func, case, cast, literal, Date, DateTime, Integer
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import agregados
+from app.consultas import COLUNAS_TITULO_RESPONSE
+from app.modelo import Titulo, StatusTitulo
+from app.schemas import CAMPOS_TITULO_RESPONSE
+
+# Operações sobre um parcelamento inteiro (parcelas com o mesmo id_transacao_pai, ver
+# servicos.criar_titulos_parcelados).
+#
+# Cada operação é um único comando SQL para o grupo todo, no mesmo molde de app/baixa.py:
+# - 'alvo' trava as parcelas em aberto (PENDENTE/VENCIDO) em ORDER BY id + FOR UPDATE, então
+#   operações concorrentes sobre o mesmo grupo (ou uma baixa em lote) esperam em vez de
+#   entrarem em deadlock; parcelas PAGO/CANCELADO nunca são alteradas
+# - o estado anterior sai do próprio 'alvo' no RETURNING e alimenta os deltas do rollup
+#   (app/agregados.py), aplicados na mesma transação
+#
+# Nenhuma função faz commit: a rota decide (e registra a escrita para o roteamento de leituras).
+
+STATUS_ABERTOS = (StatusTitulo.PENDENTE.value, StatusTitulo.VENCIDO.value)
+
+_COLUNAS_ROLLUP = (
+    Titulo.valor, Titulo.data_vencimento, Titulo.tipo, Titulo.status,
+    Titulo.categoria_id, Titulo.conta_bancaria_id, Titulo.contato_id,
+)
+
+
+def _alvo(id_transacao_pai: uuid.UUID):
+    # MATERIALIZED: o lock na ordem do ORDER BY acontece uma vez, antes do UPDATE
+    return (
+        select(Titulo.id, Titulo.status, Titulo.data_vencimento, Titulo.numero_parcela, Titulo.total_parcelas)
+        .where(Titulo.id_transacao_pai == id_transacao_pai)
+        .where(Titulo.status.in_(STATUS_ABERTOS))
+        .order_by(Titulo.id)
+        .with_for_update()
+        .cte("alvo")
+        .prefix_with("MATERIALIZED")
+    )
+
+
+def _anteriores(linhas) -> list:
+    # estado de cada linha antes do comando, a partir de status_anterior/vencimento_anterior do RETURNING
+    return [
+        SimpleNamespace(**{**linha._mapping, "status": linha.status_anterior, "data_vencimento": linha.vencimento_anterior})
+        for linha in linhas
+    ]
+
+
+async def buscar_grupo(db: AsyncSession, id_transacao_pai: uuid.UUID) -> List[dict]:
+    # todas as parcelas do grupo (qualquer status), na ordem das parcelas; lista vazia se não existe
+    query = (
+        select(*COLUNAS_TITULO_RESPONSE)
+        .where(Titulo.id_transacao_pai == id_transacao_pai)
+        .order_by(Titulo.numero_parcela, Titulo.id)
+    )
+    result = await db.execute(query)
+    return [dict(zip(CAMPOS_TITULO_RESPONSE, linha)) for linha in result.all()]
+
+
+async def cancelar_grupo(db: AsyncSession, id_transacao_pai: uuid.UUID) -> int:
+
+    # parcelas em aberto -> CANCELADO; devolve quantas foram canceladas
+
+    alvo = _alvo(id_transacao_pai)
+    stmt = (
+        update(Titulo)
+        .where(Titulo.id == alvo.c.id)
+        .values(status=StatusTitulo.CANCELADO)
+        .returning(
+            *_COLUNAS_ROLLUP,
+            alvo.c.status.label("status_anterior"),
+            alvo.c.data_vencimento.label("vencimento_anterior"),
+        )
+    )
+    cancelados = (await db.execute(stmt)).all()
+    if cancelados:
+        await agregados.aplicar_deltas(db, removidos=_anteriores(cancelados), adicionados=cancelados)
+    return len(cancelados)
+
+
+async def reagendar_grupo(db: AsyncSession, id_transacao_pai: uuid.UUID, meses: int) -> int:
+
+    # desloca 'meses' (negativo antecipa) o vencimento das parcelas em aberto; devolve quantas mudaram
+    #
+    # Mesma semântica de relativedelta(months=...) usada na criação, mas sem perder o dia
+    # original da série: um parcelamento criado no dia 31 tem parcelas em 28/02 e 30/04, e
+    # deslocar 30/04 em um mês dá 31/05, não 30/05. O dia de uma parcela qualquer pode já ter
+    # sido limitado (28/02), então o dia da série é o maior dia entre todas as parcelas da série
+    # (qualquer status): as do grupo com o mesmo total_parcelas da primeira parcela em aberto,
+    # o que separa as parcelas de uma renegociação (numeradas depois da última, ver
+    # renegociar_grupo) da série original. Só uma série inteira em meses curtos (ex: uma
+    # única parcela em 30/04) não guarda o dia 31. O dia é limitado ao último dia de cada
+    # mês de destino.
+    # Parcelas VENCIDO que passam a vencer a partir de hoje voltam para PENDENTE; o inverso
+    # fica para a tarefa marcar_vencidos (app/tarefas.py).
+
+    alvo = _alvo(id_transacao_pai)
+    total_serie = (
+        select(alvo.c.total_parcelas)
+        .order_by(alvo.c.numero_parcela, alvo.c.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    serie = aliased(Titulo)
+    dia_serie = (
+        select(func.max(func.extract("day", serie.data_vencimento)))
+        .where(serie.id_transacao_pai == id_transacao_pai)
+        .where(serie.total_parcelas == total_serie)
+        .correlate(None)
+        .scalar_subquery()
+    )
+    mes_destino = func.date_trunc("month", cast(alvo.c.data_vencimento, DateTime)) + func.make_interval(0, literal(meses, Integer))
+    novo_vencimento = cast(
+        func.least(
+            mes_destino + func.make_interval(0, 0, 0, cast(dia_serie, Integer) - 1),
+            mes_destino + func.make_interval(0, 1, 0, -1),
+        ),
+        Date,
+    )
+
+    stmt = (
+        update(Titulo)
+        .where(Titulo.id == alvo.c.id)
+        .values(
+            data_vencimento=novo_vencimento,
+            status=case(
+                (novo_vencimento >= func.current_date(), StatusTitulo.PENDENTE.value),
+                else_=alvo.c.status,
+            ),
+        )
+        .returning(
+            *_COLUNAS_ROLLUP,
+            alvo.c.status.label("status_anterior"),
+            alvo.c.data_vencimento.label("vencimento_anterior"),
+        )
+    )
+    reagendados = (await db.execute(stmt)).all()
+    if reagendados:
+        await agregados.aplicar_deltas(db, removidos=_anteriores(reagendados), adicionados=reagendados)
+    return len(reagendados)
+
+
+# as parcelas em aberto são canceladas e o saldo (ou 'valor_total') vira 'total_parcelas'
+# parcelas novas no mesmo grupo, numeradas depois da última existente.
+# Divisão igual à de servicos.criar_titulos_parcelados: a primeira parcela leva a diferença
+# de centavos; vencimentos mensais a partir de 'primeiro' (ou do vencimento da primeira
+# parcela em aberto), com o dia limitado ao fim do mês como no relativedelta.
+_SQL_RENEGOCIAR = text(r"""
+    WITH alvo AS MATERIALIZED (
+        SELECT id, status, valor, data_vencimento, tipo, categoria_id, conta_bancaria_id,
+               contato_id, numero_parcela, descricao
+        FROM titulos
+        WHERE id_transacao_pai = :grupo AND status IN ('PENDENTE', 'VENCIDO')
+        ORDER BY id
+        FOR UPDATE
+    ),
+    base AS (
+        SELECT regexp_replace(descricao, ' \((renegociação )?\d+/\d+\)$', '') AS descricao,
+               tipo, categoria_id, conta_bancaria_id, contato_id,
+               coalesce(CAST(:primeiro AS date), data_vencimento) AS primeiro
+        FROM alvo
+        ORDER BY numero_parcela, id
+        LIMIT 1
+    ),
+    saldo AS (
+        SELECT coalesce(CAST(:valor_total AS numeric), sum(valor)) AS total,
+               round(coalesce(CAST(:valor_total AS numeric), sum(valor)) / CAST(:parcelas AS integer), 2) AS parcela,
+               (SELECT max(numero_parcela) FROM titulos WHERE id_transacao_pai = :grupo) AS ultima
+        FROM alvo
+    ),
+    cancelados AS (
+        UPDATE titulos t SET status = 'CANCELADO'
+        FROM alvo
+        WHERE t.id = alvo.id
+        RETURNING t.valor, t.data_vencimento, t.tipo, t.status, t.categoria_id, t.conta_bancaria_id,
+                  t.contato_id, alvo.status AS status_anterior, alvo.data_vencimento AS vencimento_anterior
+    ),
+    novos AS (
+        INSERT INTO titulos (descricao, valor, data_vencimento, tipo, status, categoria_id, contato_id,
+                             conta_bancaria_id, id_transacao_pai, numero_parcela, total_parcelas)
+        SELECT b.descricao || ' (renegociação ' || k || '/' || CAST(:parcelas AS integer) || ')',
+               s.parcela + CASE WHEN k = 1 THEN s.total - s.parcela * CAST(:parcelas AS integer) ELSE 0 END,
+               CAST(b.primeiro + make_interval(months => k - 1) AS date),
+               b.tipo, 'PENDENTE', b.categoria_id, b.contato_id, b.conta_bancaria_id,
+               :grupo, s.ultima + k, s.ultima + CAST(:parcelas AS integer)
+        FROM base b, saldo s, generate_series(1, CAST(:parcelas AS integer)) AS k
+        RETURNING valor, data_vencimento, tipo, status, categoria_id, conta_bancaria_id, contato_id
+    )
+    SELECT *, true AS cancelado FROM cancelados
+    UNION ALL
+    SELECT *, NULL, NULL, false FROM novos
+""")
+
+
+async def renegociar_grupo(
+    db: AsyncSession,
+    id_transacao_pai: uuid.UUID,
+    total_parcelas: int,
+    valor_total: Optional[Decimal] = None,
+    primeiro_vencimento: Optional[date] = None,
+) -> int:
+
+    # devolve quantas parcelas novas foram criadas (0 se o grupo não tem parcelas em aberto)
+
+    linhas = (await db.execute(_SQL_RENEGOCIAR, {
+        "grupo": id_transacao_pai,
+        "parcelas": total_parcelas,
+        "valor_total": valor_total,
+        "primeiro": primeiro_vencimento,
+    })).all()
+
+    cancelados = [linha for linha in linhas if linha.cancelado]
+    novos = [linha for linha in linhas if not linha.cancelado]
+    if linhas:
+        await agregados.aplicar_deltas(db, removidos=_anteriores(cancelados), adicionados=cancelados + novos)
+    return len(novos)
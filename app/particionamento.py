@@ -0,0 +1,322 @@
+import asyncio
+import os
+import sys
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.schema import CreateIndex
+
+from app.database import SessionLocal, engine
+from app.modelo import Titulo
+
+# Particionamento nativo (RANGE por ano de data_vencimento) da tabela 'titulos'. Opt-in:
+# bancos novos continuam com a tabela simples criada pelo create_all.
+#
+#   python -m app.particionamento migrar [tamanho_lote]   converte a tabela existente, sem parar a API
+#   python -m app.particionamento garantir                cria partições futuras
+#   python -m app.particionamento remover-antiga          apaga 'titulos_antiga' depois de validar
+#
+# Estrutura: titulos_AAAA (1º jan a 1º jan) + titulos_padrao (DEFAULT) para datas fora das
+# partições criadas (ex: parcelas de um financiamento em 360x). A PK passa a ser
+# (id, data_vencimento), exigência do PostgreSQL; o 'id' continua vindo da mesma sequence.
+# Filtros por data_vencimento (listagem, exportação, projeção, tarefa de vencidos) ficam
+# restritos às partições do intervalo (partition pruning).
+#
+# Migração sem downtime:
+# 1. cria 'titulos_part' particionada (mesmas colunas, índices e FKs) e um trigger em 'titulos'
+#    que replica INSERT/UPDATE/DELETE nela enquanto a cópia acontece
+# 2. copia por faixas de id, uma transação curta por lote (FOR SHARE: um UPDATE concorrente
+#    espera o lote e é replicado pelo trigger logo depois)
+# 3. troca os nomes numa transação curta (ACCESS EXCLUSIVE só durante os RENAMEs)
+#
+# A FK anexos.titulo_id -> titulos.id não pode existir contra a PK composta: ela é substituída
+# por triggers com o mesmo efeito (anexo exige título existente; título com anexos não pode
+# ser apagado). A 'titulos' antiga fica como 'titulos_antiga' até remover-antiga.
+
+PARTICOES_FUTURAS_ANOS = int(os.getenv("PARTICOES_FUTURAS_ANOS", "2"))
+TAMANHO_LOTE_MIGRACAO = 50_000
+
+# chave arbitrária (int64) do pg_try_advisory_xact_lock de garantir_particoes_futuras
+CHAVE_LOCK_PARTICOES = 7_310_002
+
+TABELA_NOVA = "titulos_part"
+TABELA_ANTIGA = "titulos_antiga"
+PARTICAO_PADRAO = "titulos_padrao"
+SUFIXO_INDICE_NOVO = "_p"
+
+
+def _nome_particao(ano: int) -> str:
+    return f"titulos_{ano}"
+
+
+async def esta_particionada(db: AsyncSession) -> bool:
+    return bool(await db.scalar(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('titulos'))"
+    )))
+
+
+async def _existe_tabela(db: AsyncSession, nome: str) -> bool:
+    return await db.scalar(text("SELECT to_regclass(:nome) IS NOT NULL"), {"nome": nome})
+
+
+def _ddl_indices(tabela_destino: str, sufixo: str) -> list:
+    # os mesmos índices declarados no modelo (app/modelo.py), apontando para outra tabela
+    comandos = []
+    for indice in Titulo.__table__.indexes:
+        ddl = str(CreateIndex(indice).compile(dialect=engine.dialect))
+        cabecalho = f"INDEX {indice.name} ON titulos "
+        assert cabecalho in ddl, ddl
+        comandos.append(ddl.replace(cabecalho, f"INDEX {indice.name}{sufixo} ON {tabela_destino} ", 1))
+    return comandos
+
+
+_FUNCOES_ANEXOS = [
+    # FOR KEY SHARE, como a FK faria: um DELETE concorrente do título espera o fim desta
+    # transação e então vê o anexo no titulos_restringir_anexos
+    """
+    CREATE OR REPLACE FUNCTION anexos_verificar_titulo() RETURNS trigger AS $$
+    BEGIN
+        PERFORM 1 FROM titulos WHERE id = NEW.titulo_id FOR KEY SHARE;
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'título % não existe', NEW.titulo_id USING ERRCODE = 'foreign_key_violation';
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    # AFTER ROW dispara no fim do comando: num UPDATE que troca a linha de partição
+    # (DELETE + INSERT internos) a linha nova já existe quando a verificação roda
+    """
+    CREATE OR REPLACE FUNCTION titulos_restringir_anexos() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('halon.movendo_particao', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF EXISTS (SELECT 1 FROM anexos WHERE titulo_id = OLD.id)
+           AND NOT EXISTS (SELECT 1 FROM titulos WHERE id = OLD.id) THEN
+            RAISE EXCEPTION 'título % possui anexos', OLD.id USING ERRCODE = 'foreign_key_violation';
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+    """,
+]
+
+_FUNCAO_SINCRONIA = f"""
+    CREATE OR REPLACE FUNCTION titulos_sincronizar_particionada() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM {TABELA_NOVA} WHERE id = OLD.id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            INSERT INTO {TABELA_NOVA} SELECT (NEW).* ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql
+"""
+
+
+async def _criar_particao(db: AsyncSession, ano: int):
+
+    # cria titulos_AAAA fora da tabela, move para ela as linhas do ano que estavam na
+    # partição padrão e só então anexa (ATTACH falharia com essas linhas no DEFAULT)
+    # o ATTACH cria na partição os índices, a PK e os triggers da tabela mãe
+
+    nome = _nome_particao(ano)
+    de, ate = date(ano, 1, 1), date(ano + 1, 1, 1)
+    await db.execute(text("SET LOCAL halon.movendo_particao = 'on'"))
+    await db.execute(text(f"CREATE TABLE {nome} (LIKE titulos INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    if await _existe_tabela(db, PARTICAO_PADRAO):
+        faixa = {"de": de, "ate": ate}
+        await db.execute(text(
+            f"INSERT INTO {nome} SELECT * FROM {PARTICAO_PADRAO} WHERE data_vencimento >= :de AND data_vencimento < :ate"
+        ), faixa)
+        await db.execute(text(
+            f"DELETE FROM {PARTICAO_PADRAO} WHERE data_vencimento >= :de AND data_vencimento < :ate"
+        ), faixa)
+    await db.execute(text(
+        f"ALTER TABLE titulos ATTACH PARTITION {nome} FOR VALUES FROM ('{de.isoformat()}') TO ('{ate.isoformat()}')"
+    ))
+
+
+async def garantir_particoes_futuras(db: AsyncSession, anos: int = PARTICOES_FUTURAS_ANOS) -> list:
+
+    # partições do ano corrente + 'anos' seguintes; sem efeito se 'titulos' não é particionada
+    # chamada no startup e periodicamente pela tarefa agendada (app/tarefas.py)
+
+    if not await esta_particionada(db):
+        return []
+    if not await db.scalar(text("SELECT pg_try_advisory_xact_lock(:chave)"), {"chave": CHAVE_LOCK_PARTICOES}):
+        return []  # outro worker está criando
+
+    criadas = []
+    ano_atual = date.today().year
+    for ano in range(ano_atual, ano_atual + anos + 1):
+        if not await _existe_tabela(db, _nome_particao(ano)):
+            await _criar_particao(db, ano)
+            criadas.append(_nome_particao(ano))
+    await db.commit()
+    return criadas
+
+
+async def _preparar(db: AsyncSession, primeiro_ano: int):
+    ano_final = max(primeiro_ano, date.today().year) + PARTICOES_FUTURAS_ANOS
+
+    await db.execute(text(
+        f"CREATE TABLE {TABELA_NOVA} (LIKE titulos INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        f"PARTITION BY RANGE (data_vencimento)"
+    ))
+    await db.execute(text(f"ALTER TABLE {TABELA_NOVA} ADD CONSTRAINT {TABELA_NOVA}_pkey PRIMARY KEY (id, data_vencimento)"))
+    for fk in Titulo.__table__.foreign_key_constraints:
+        coluna = fk.column_keys[0]
+        destino = fk.elements[0].column
+        await db.execute(text(
+            f"ALTER TABLE {TABELA_NOVA} ADD FOREIGN KEY ({coluna}) REFERENCES {destino.table.name} ({destino.name})"
+        ))
+    for ano in range(primeiro_ano, ano_final + 1):
+        de, ate = date(ano, 1, 1), date(ano + 1, 1, 1)
+        await db.execute(text(
+            f"CREATE TABLE {_nome_particao(ano)} PARTITION OF {TABELA_NOVA} "
+            f"FOR VALUES FROM ('{de.isoformat()}') TO ('{ate.isoformat()}')"
+        ))
+    await db.execute(text(f"CREATE TABLE {PARTICAO_PADRAO} PARTITION OF {TABELA_NOVA} DEFAULT"))
+    # tabela ainda vazia: índices criados antes da cópia saem baratos
+    for ddl in _ddl_indices(TABELA_NOVA, SUFIXO_INDICE_NOVO):
+        await db.execute(text(ddl))
+
+    # bancos criados antes do índice no modelo: o trigger que substitui a FK consulta anexos por titulo_id
+    await db.execute(text("CREATE INDEX IF NOT EXISTS ix_anexos_titulo_id ON anexos (titulo_id)"))
+
+    # a partir do commit, toda escrita em 'titulos' também chega em 'titulos_part'
+    await db.execute(text(_FUNCAO_SINCRONIA))
+    await db.execute(text(
+        "CREATE TRIGGER titulos_sincronizar_particionada AFTER INSERT OR UPDATE OR DELETE ON titulos "
+        "FOR EACH ROW EXECUTE FUNCTION titulos_sincronizar_particionada()"
+    ))
+    await db.commit()
+
+
+async def _copiar_lotes(tamanho_lote: int):
+    async with SessionLocal() as db:
+        # lido depois do trigger existir: ids maiores chegam pelo trigger
+        minimo, maximo = (await db.execute(text("SELECT min(id), max(id) FROM titulos"))).one()
+    if minimo is None:
+        return
+
+    copiadas = 0
+    for inicio in range(minimo, maximo + 1, tamanho_lote):
+        async with SessionLocal() as db:
+            result = await db.execute(text(
+                f"WITH lote AS (SELECT * FROM titulos WHERE id >= :de AND id < :ate FOR SHARE) "
+                f"INSERT INTO {TABELA_NOVA} SELECT * FROM lote ON CONFLICT DO NOTHING"
+            ), {"de": inicio, "ate": inicio + tamanho_lote})
+            await db.commit()
+        copiadas += result.rowcount
+        print(f"\r   -> ids até {min(inicio + tamanho_lote - 1, maximo)} de {maximo} ({copiadas} linhas copiadas)", end="", flush=True)
+        # dá espaço para o tráfego normal entre os lotes
+        await asyncio.sleep(0.05)
+    print()
+
+
+async def _trocar(db: AsyncSession):
+    await db.execute(text("SET LOCAL lock_timeout = '5s'"))
+    await db.execute(text("LOCK TABLE titulos, anexos IN ACCESS EXCLUSIVE MODE"))
+
+    await db.execute(text("DROP TRIGGER titulos_sincronizar_particionada ON titulos"))
+    await db.execute(text("DROP FUNCTION titulos_sincronizar_particionada()"))
+
+    fks_anexos = (await db.execute(text(
+        "SELECT conname FROM pg_constraint "
+        "WHERE conrelid = 'anexos'::regclass AND confrelid = 'titulos'::regclass AND contype = 'f'"
+    ))).scalars().all()
+    for nome in fks_anexos:
+        await db.execute(text(f'ALTER TABLE anexos DROP CONSTRAINT "{nome}"'))
+
+    await db.execute(text(f"ALTER TABLE titulos RENAME TO {TABELA_ANTIGA}"))
+    await db.execute(text(f"ALTER TABLE {TABELA_ANTIGA} RENAME CONSTRAINT titulos_pkey TO {TABELA_ANTIGA}_pkey"))
+    for indice in Titulo.__table__.indexes:
+        await db.execute(text(f"ALTER INDEX IF EXISTS {indice.name} RENAME TO {indice.name}_antigo"))
+
+    await db.execute(text(f"ALTER TABLE {TABELA_NOVA} RENAME TO titulos"))
+    await db.execute(text(f"ALTER TABLE titulos RENAME CONSTRAINT {TABELA_NOVA}_pkey TO titulos_pkey"))
+    for indice in Titulo.__table__.indexes:
+        await db.execute(text(f"ALTER INDEX {indice.name}{SUFIXO_INDICE_NOVO} RENAME TO {indice.name}"))
+
+    # a sequence passa a pertencer à tabela nova (senão DROP da antiga a levaria junto)
+    await db.execute(text("ALTER SEQUENCE titulos_id_seq OWNED BY titulos.id"))
+
+    for funcao in _FUNCOES_ANEXOS:
+        await db.execute(text(funcao))
+    await db.execute(text(
+        "CREATE TRIGGER anexos_verificar_titulo BEFORE INSERT OR UPDATE OF titulo_id ON anexos "
+        "FOR EACH ROW EXECUTE FUNCTION anexos_verificar_titulo()"
+    ))
+    await db.execute(text(
+        "CREATE TRIGGER titulos_restringir_anexos AFTER DELETE ON titulos "
+        "FOR EACH ROW EXECUTE FUNCTION titulos_restringir_anexos()"
+    ))
+    await db.commit()
+
+
+async def migrar(tamanho_lote: int = TAMANHO_LOTE_MIGRACAO) -> int:
+    async with SessionLocal() as db:
+        if await esta_particionada(db):
+            print("'titulos' já é particionada.")
+            return 0
+        if await _existe_tabela(db, TABELA_ANTIGA):
+            print(f"'{TABELA_ANTIGA}' existe: remova-a antes de migrar de novo.")
+            return 1
+
+        if not await _existe_tabela(db, TABELA_NOVA):
+            primeiro = await db.scalar(text("SELECT min(data_vencimento) FROM titulos"))
+            print("1/3 criando tabela particionada e trigger de sincronia...")
+            await _preparar(db, (primeiro or date.today()).year)
+        else:
+            # migração interrompida: o trigger continua ativo, basta retomar a cópia
+            print("1/3 tabela particionada já existe, retomando a cópia...")
+
+    print("2/3 copiando em lotes...")
+    await _copiar_lotes(tamanho_lote)
+
+    print("3/3 trocando as tabelas...")
+    async with SessionLocal() as db:
+        await _trocar(db)
+
+    async with engine.execution_options(isolation_level="AUTOCOMMIT").connect() as conexao:
+        await conexao.execute(text("ANALYZE titulos"))
+    print(f"Migração concluída. A tabela original ficou em '{TABELA_ANTIGA}'.")
+    return 0
+
+
+async def _cli(comando: str, argumentos: list) -> int:
+    if comando == "migrar":
+        return await migrar(int(argumentos[0]) if argumentos else TAMANHO_LOTE_MIGRACAO)
+
+    async with SessionLocal() as db:
+        if comando == "garantir":
+            criadas = await garantir_particoes_futuras(db)
+            print(f"Partições criadas: {', '.join(criadas) or 'nenhuma'}")
+            return 0
+
+        # remover-antiga
+        if not await _existe_tabela(db, TABELA_ANTIGA):
+            print(f"'{TABELA_ANTIGA}' não existe.")
+            return 0
+        await db.execute(text(f"DROP TABLE {TABELA_ANTIGA}"))
+        await db.commit()
+        print(f"'{TABELA_ANTIGA}' removida.")
+        return 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else ""
+    if comando not in ("migrar", "garantir", "remover-antiga"):
+        print("Uso: python -m app.particionamento [migrar [tamanho_lote]|garantir|remover-antiga]")
+        sys.exit(2)
+
+    sys.exit(asyncio.run(_cli(comando, sys.argv[2:])))
@@ -1,8 +1,11 @@
+import argparse
 import asyncio
 import os
 import random
 import sys
+import time
 import uuid
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
 from decimal import Decimal
 
@@ -15,9 +18,10 @@ try:
 except ImportError:
     pass
 
-from app.database import SessionLocal
-from app.modelo import Usuario, Categoria, Contato, ContaBancaria, Titulo, TipoLancamento, StatusTitulo, Anexo
+from app.database import SessionLocal, reservar_ids, copiar_registros
+from app.modelo import Usuario, Categoria, Contato, ContaBancaria
 from app.seguranca import gerar_hash_senha
+from app import agregados, versao
 
 
 BANCOS_BRASIL = [
@@ -53,6 +57,115 @@ CATEGORIAS_MOCK = [
     {"nome": "Manutenção e Limpeza", "tipo": "DESPESA"},
 ]
 
+# CARGA RÁPIDA DE TÍTULOS (modo CLI e opção 2 do menu)
+# - geração em lotes "vetorizados": rng.choices(k=n) por coluna em vez de um sorteio por campo
+# - lotes gerados em paralelo em processos (CPU) enquanto outros lotes são gravados (I/O)
+# - ids pré-alocados da sequence, títulos e anexos gravados com COPY (sem flush por linha)
+# - cada lote tem a própria semente (semente:indice) e os ids são reservados na ordem dos lotes:
+#   o resultado é o mesmo com qualquer número de workers
+
+TAMANHO_LOTE = 50_000
+MAX_WORKERS = 8  # cada worker segura uma conexão do pool durante o COPY
+
+COLUNAS_TITULOS = [
+    "id", "descricao", "valor", "data_vencimento", "data_pagamento", "tipo", "status",
+    "numero_parcela", "total_parcelas", "categoria_id", "contato_id", "conta_bancaria_id",
+]
+COLUNAS_ANEXOS = ["nome_arquivo", "caminho_arquivo", "titulo_id"]
+
+_cadastros_worker = None
+
+
+def _iniciar_worker(cadastros):
+    # cadastros vão uma vez por processo, não a cada lote
+    global _cadastros_worker
+    _cadastros_worker = cadastros
+
+
+def _gerar_lote(semente: int, indice: int, ids: list, de: date, ate: date, hoje: date):
+    categorias, contatos, contas = _cadastros_worker
+    rng = random.Random(f"{semente}:{indice}")
+    n = len(ids)
+
+    datas = [de + timedelta(days=d) for d in range((ate - de).days + 1)]
+    cats = rng.choices(categorias, k=n)
+    vencimentos = rng.choices(datas, k=n)
+    # valores realistas (maioria valores baixos, poucos valores altos), em centavos
+    baixos = rng.choices(range(5_000, 200_001), k=n)
+    altos = rng.choices(range(200_000, 1_500_001), k=n)
+    eh_baixo = rng.choices((True, False), weights=(80, 20), k=n)
+    # se já venceu, grande chance de estar pago (entre 5 dias antes e 5 depois do vencimento)
+    pago = rng.choices((True, False), weights=(85, 15), k=n)
+    atraso = rng.choices(range(-5, 6), k=n)
+    notas = rng.choices(range(1000, 10000), k=n)
+    ids_contatos = rng.choices(contatos, k=n)
+    ids_contas = rng.choices(contas, k=n)
+    # 80% dos lançamentos têm comprovante
+    tem_anexo = rng.choices((True, False), weights=(80, 20), k=n)
+    extensoes = rng.choices(("pdf", "png", "jpg"), k=n)
+
+    titulos, anexos = [], []
+    for k in range(n):
+        titulo_id = ids[k]
+        categoria_id, nome_categoria, tipo = cats[k]
+        vencimento = vencimentos[k]
+        status, data_pag = "PENDENTE", None
+        if vencimento <= hoje:
+            if pago[k]:
+                status, data_pag = "PAGO", vencimento + timedelta(days=atraso[k])
+            else:
+                status = "VENCIDO"
+        valor = Decimal(baixos[k] if eh_baixo[k] else altos[k]).scaleb(-2)
+        titulos.append((
+            titulo_id, f"Ref. {nome_categoria} - Nota {notas[k]}", valor, vencimento, data_pag,
+            tipo, status, 1, 1, categoria_id, ids_contatos[k], ids_contas[k],
+        ))
+        if tem_anexo[k]:
+            ext = extensoes[k]
+            anexos.append((
+                f"comprovante_{titulo_id}.{ext}",
+                f"s3://bucket-financeiro/docs/{vencimento.year}/{titulo_id}.{ext}",
+                titulo_id,
+            ))
+    return titulos, anexos
+
+
+async def carregar_titulos(qtd: int, cadastros: tuple, semente: int, de: date, ate: date,
+                           hoje: date = None, workers: int = 1):
+
+    # cadastros: ([(categoria_id, nome, tipo)], [contato_id], [conta_id]), já existentes no banco
+    # não atualiza o rollup do dashboard: quem chama faz agregados.reconstruir no fim
+
+    hoje = hoje or date.today()
+    workers = max(1, min(workers, MAX_WORKERS))
+    loop = asyncio.get_running_loop()
+    vagas = asyncio.Semaphore(workers)
+    gravados = 0
+
+    async def processar(pool, indice, ids):
+        nonlocal gravados
+        try:
+            titulos, anexos = await loop.run_in_executor(pool, _gerar_lote, semente, indice, ids, de, ate, hoje)
+            async with SessionLocal() as db:
+                await copiar_registros(db, "titulos", COLUNAS_TITULOS, titulos)
+                await copiar_registros(db, "anexos", COLUNAS_ANEXOS, anexos)
+                await db.commit()
+            gravados += len(titulos)
+            print(f"\r   -> {gravados}/{qtd} títulos", end="", flush=True)
+        finally:
+            vagas.release()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker, initargs=(cadastros,)) as pool:
+        tarefas = []
+        async with SessionLocal() as db:
+            for indice, inicio in enumerate(range(0, qtd, TAMANHO_LOTE)):
+                await vagas.acquire()
+                ids = await reservar_ids(db, "titulos", min(TAMANHO_LOTE, qtd - inicio))
+                await db.commit()
+                tarefas.append(asyncio.create_task(processar(pool, indice, ids)))
+        await asyncio.gather(*tarefas)
+    print()
+
 async def verificar_admin_existe(db: AsyncSession) -> bool:
     result = await db.execute(select(Usuario))
     usuario = result.scalars().first()
@@ -77,18 +190,22 @@ async def criar_admin_manual(db: AsyncSession):
     await db.commit()
     print(f"Usuário {email} criado.")
 
-async def gerar_dados_ficticios(db: AsyncSession):
-    try:
-        qtd_input = input("\nQuantos lançamentos simular? (Recomendado: 500): ")
-        qtd = int(qtd_input) if qtd_input else 500
-    except ValueError:
-        qtd = 500
+async def gerar_dados_ficticios(db: AsyncSession, qtd: int = None, semente: int = None,
+                                de: date = None, ate: date = None, workers: int = 1):
+    if qtd is None:
+        try:
+            qtd_input = input("\nQuantos lançamentos simular? (Recomendado: 500): ")
+            qtd = int(qtd_input) if qtd_input else 500
+        except ValueError:
+            qtd = 500
+    if semente is not None:
+        random.seed(semente)
 
     print(f"\n🚀 Iniciando simulação de carga com {qtd} registros...")
 
     # 1. BANCOS (Cria entre 5 e 10 bancos ativos para a empresa)
     print("   -> Verificando/Criando Contas Bancárias...")
-    result_contas = await db.execute(select(ContaBancaria))
+    result_contas = await db.execute(select(ContaBancaria).order_by(ContaBancaria.id))
     contas_existentes = result_contas.scalars().all()
 
     if len(contas_existentes) < 5:
@@ -108,7 +225,7 @@ async def gerar_dados_ficticios(db: AsyncSession):
                 )
                 db.add(nova_conta)
         await db.commit()
-        result_contas = await db.execute(select(ContaBancaria))
+        result_contas = await db.execute(select(ContaBancaria).order_by(ContaBancaria.id))
         contas_existentes = result_contas.scalars().all()
 
     # 2. CATEGORIAS
@@ -118,10 +235,11 @@ async def gerar_dados_ficticios(db: AsyncSession):
         if not obj:
             obj = Categoria(nome=cat["nome"], descricao="Gerado auto")
             db.add(obj)
+    await versao.registrar_escrita(db)
     await db.commit()
     # Mapa para saber o tipo (Receita/Despesa) pelo nome
     mapa_tipos = {c["nome"]: c["tipo"] for c in CATEGORIAS_MOCK}
-    categorias_db = (await db.execute(select(Categoria))).scalars().all()
+    categorias_db = (await db.execute(select(Categoria).order_by(Categoria.id))).scalars().all()
 
     # 3. CONTATOS (Aqui está a simulação real: Volume alto)
     # criar um número de contatos proporcional aos lançamentos (30% do volume)
@@ -132,98 +250,45 @@ async def gerar_dados_ficticios(db: AsyncSession):
     print(f"   -> Gerando {qtd_contatos} Empresas/Contatos Fakes...")
     
     contatos_para_adicionar = []
+    nomes_usados = set()
     for _ in range(qtd_contatos):
         nome_fake = gerar_nome_empresa_fake()
         # evita duplicados na lista de inserção
-        if not any(c.nome == nome_fake for c in contatos_para_adicionar):
+        if nome_fake not in nomes_usados:
+            nomes_usados.add(nome_fake)
             contatos_para_adicionar.append(
                 Contato(nome=nome_fake, documento=gerar_cnpj_fake())
             )
     
     db.add_all(contatos_para_adicionar)
+    await versao.registrar_escrita(db)
     await db.commit()
     
     # Pega todos os contatos do banco (incluindo antigos) para misturar tudo
-    contatos_db = (await db.execute(select(Contato))).scalars().all()
+    contatos_db = (await db.execute(select(Contato).order_by(Contato.id))).scalars().all()
 
     # 4. TÍTULOS E ANEXOS
     print(f"   -> Gerando {qtd} Lançamentos com Anexos...")
     
     hoje = date.today()
-    
-    for i in range(qtd):
-        categoria = random.choice(categorias_db)
-        contato = random.choice(contatos_db)
-        conta = random.choice(contas_existentes)
-        
-        tipo_str = mapa_tipos.get(categoria.nome, "DESPESA")
-        tipo_enum = TipoLancamento.RECEITA if tipo_str == "RECEITA" else TipoLancamento.DESPESA
-        
-        # Distribuição de Datas: 
-        # 60% Passado (Histórico), 10% Hoje, 30% Futuro (Projeção)
-        sorteio_data = random.random()
-        if sorteio_data < 0.6:
-            dias = random.randint(-90, -1) # Passado
-        elif sorteio_data < 0.7:
-            dias = 0 # Hoje
-        else:
-            dias = random.randint(1, 60) # Futuro
-            
-        vencimento = hoje + timedelta(days=dias)
-        
-        # Valores realistas (maioria valores baixos, poucos valores altos)
-        if random.random() < 0.8:
-            valor = Decimal(random.randint(50, 2000))
-        else:
-            valor = Decimal(random.randint(2000, 15000))
-        
-        # Status Lógico
-        status = StatusTitulo.PENDENTE
-        data_pag = None
-        
-        if vencimento <= hoje:
-            # Se já venceu, grande chance de estar pago, pequena de estar vencido
-            if random.random() < 0.85: 
-                status = StatusTitulo.PAGO
-                # Pagou entre 5 dias antes e 5 dias depois do vencimento
-                delta_pag = random.randint(-5, 5)
-                data_pag = vencimento + timedelta(days=delta_pag)
-            else:
-                status = StatusTitulo.VENCIDO
-        
-        t = Titulo(
-            descricao=f"Ref. {categoria.nome} - Nota {random.randint(1000, 9999)}",
-            valor=valor,
-            data_vencimento=vencimento,
-            data_pagamento=data_pag,
-            tipo=tipo_enum,
-            status=status,
-            categoria_id=categoria.id,
-            contato_id=contato.id,
-            conta_bancaria_id=conta.id,
-            numero_parcela=1,
-            total_parcelas=1
-        )
-        db.add(t)
-        
-        # Flush para gerar o ID do título e podermos criar o anexo
-        await db.flush()
-        
-        # Simulação de Anexo (80% dos lançamentos têm comprovante)
-        if random.random() < 0.8:
-            ext = random.choice(['pdf', 'png', 'jpg'])
-            anexo = Anexo(
-                nome_arquivo=f"comprovante_{t.id}.{ext}",
-                caminho_arquivo=f"s3://bucket-financeiro/docs/{date.today().year}/{t.id}.{ext}",
-                titulo_id=t.id
-            )
-            db.add(anexo)
-            
-        # Commit em lotes pequenos para não estourar memória se for muuuito dado
-        if i % 100 == 0:
-            await db.commit()
-    
+    cadastros = (
+        [(c.id, c.nome, mapa_tipos.get(c.nome, "DESPESA")) for c in categorias_db],
+        [c.id for c in contatos_db],
+        [c.id for c in contas_existentes],
+    )
+    inicio = time.perf_counter()
+    await carregar_titulos(
+        qtd, cadastros,
+        semente=semente if semente is not None else random.randrange(2**32),
+        de=de or hoje - timedelta(days=90), ate=ate or hoje + timedelta(days=60),
+        hoje=hoje, workers=workers,
+    )
+    # um único recálculo do rollup do dashboard no fim (mais barato que deltas por lote)
+    await agregados.reconstruir(db)
+    await versao.registrar_escrita(db)
     await db.commit()
+    print(f"   -> {qtd} títulos carregados em {time.perf_counter() - inicio:.1f}s")
+    
     print("\n" + "="*50)
     print(f"SIMULAÇÃO CONCLUÍDA COM SUCESSO!")
     print(f"Resumo do Cenário:")
@@ -259,8 +324,30 @@ async def menu_principal():
             else:
                 print("Opção inválida.")
 
+async def popular_cli(args):
+    async with SessionLocal() as db:
+        await gerar_dados_ficticios(
+            db, qtd=args.titulos, semente=args.semente, de=args.de, ate=args.ate, workers=args.workers
+        )
+
 if __name__ == "__main__":
-    if not sys.stdin.isatty():
-        print("Modo não interativo detectado.")
+    # sem argumentos: menu interativo; com --titulos: carga direta, sem perguntas
+    #   python -m app.popular --titulos 1000000 --semente 42 --de 2025-01-01 --ate 2026-12-31 --workers 4
+    parser = argparse.ArgumentParser(description="Carga de dados fictícios (seed)")
+    parser.add_argument("--titulos", type=int, help="quantidade de títulos (ativa o modo não interativo)")
+    parser.add_argument("--semente", type=int, help="semente do gerador (mesma semente = mesmos dados)")
+    parser.add_argument("--de", type=date.fromisoformat, help="menor data de vencimento (padrão: hoje - 90 dias)")
+    parser.add_argument("--ate", type=date.fromisoformat, help="maior data de vencimento (padrão: hoje + 60 dias)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help=f"processos geradores (máx. {MAX_WORKERS})")
+    args = parser.parse_args()
+    # compara já com os padrões: só --de no futuro distante também é um intervalo vazio
+    hoje = date.today()
+    if (args.de or hoje - timedelta(days=90)) > (args.ate or hoje + timedelta(days=60)):
+        parser.error("--de deve ser menor ou igual a --ate")
+
+    if args.titulos is not None:
+        asyncio.run(popular_cli(args))
+    elif not sys.stdin.isatty():
+        print("Modo não interativo detectado. Use --titulos N para carregar sem perguntas.")
     else:
         asyncio.run(menu_principal())
\ No newline at end of file
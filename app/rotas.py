@@ -1,20 +1,56 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import io
+import os
+import uuid
+from datetime import date, timedelta
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, case 
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.database import get_db
-from app.modelo import Usuario, Titulo, Categoria, Contato, ContaBancaria
+from app.modelo import Usuario, Categoria, Titulo, Anexo, ContaBancaria, Job, StatusJob
 from app.schemas import (
     UsuarioCreate, UsuarioResponse, Token, 
-    TituloCreate, TituloResponse
+    TituloCreate, TituloResponse, TituloLinha, CAMPOS_TITULO_RESPONSE
 )
-from app import seguranca, deps, servicos
-from app.schemas import CategoriaResponse
+from app import seguranca, deps, servicos, agregados, consultas, exportacao, importacao, versao, leitura, anexos, baixa, conciliacao, parcelamentos, jobs
+from app.schemas import CategoriaResponse, FiltroTitulos, FiltroDashboard, ResultadoImportacao, AnexoResponse
+from app.schemas import BaixaTitulos, ResultadoBaixa, ResultadoConciliacao
+from app.schemas import ReagendamentoParcelas, RenegociacaoParcelas, JobResponse
 
 router = APIRouter()
 
+# serializadores dos response_model usados quando a rota devolve a resposta pronta (cache/ETag)
+ADAPTADOR_CATEGORIAS = TypeAdapter(List[CategoriaResponse])
+
+# caminho rápido das listas de títulos: dicts simples -> JSON direto no pydantic-core (Decimal, date
+# e datetime nativos), sem validação nem jsonable_encoder; mesmos bytes de List[TituloResponse]
+# (comparação em benchmarks/serializacao.py)
+ADAPTADOR_LINHAS_TITULOS = TypeAdapter(List[TituloLinha])
+
+PROJECAO_MAX_DIAS = 366
+
+def _validar_filtro_dashboard(filtros: FiltroDashboard):
+    if filtros.de is not None and filtros.ate is not None and filtros.ate < filtros.de:
+        raise HTTPException(status_code=400, detail="'ate' deve ser igual ou posterior a 'de'.")
+
+def _json_titulos(titulos, status_code: int = 200) -> Response:
+    # objetos Titulo já carregados (ex: recém inseridos) -> JSON de List[TituloResponse]
+    linhas = [{campo: getattr(t, campo) for campo in CAMPOS_TITULO_RESPONSE} for t in titulos]
+    return Response(ADAPTADOR_LINHAS_TITULOS.dump_json(linhas), status_code=status_code, media_type="application/json")
+
+def _erro_pool_senhas():
+    # resposta imediata quando o pool do bcrypt está saturado (ver seguranca.BCRYPT_FILA_MAX)
+    return HTTPException(
+        status_code=503,
+        detail="Serviço de autenticação sobrecarregado, tente novamente em instantes.",
+        headers={"Retry-After": "1"},
+    )
+
 @router.post("/auth/registro", response_model=UsuarioResponse, status_code=201)
 async def registrar_usuario(usuario: UsuarioCreate, db: AsyncSession = Depends(get_db)):
     # Verifica se email já existe
@@ -23,10 +59,15 @@ async def registrar_usuario(usuario: UsuarioCreate, db: AsyncSession = Depends(g
     if result.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Email já cadastrado.")
     
-    # Cria usuário com senha hash
+    # Cria usuário com senha hash (bcrypt fora do event loop)
+    try:
+        senha_hash = await seguranca.gerar_hash_senha_async(usuario.senha)
+    except seguranca.PoolSenhasSaturado:
+        raise _erro_pool_senhas()
+    
     novo_usuario = Usuario(
         email=usuario.email, 
-        senha_hash=seguranca.gerar_hash_senha(usuario.senha)
+        senha_hash=senha_hash
     )
     db.add(novo_usuario)
     await db.commit()
@@ -43,7 +84,15 @@ async def login(
     result = await db.execute(query)
     usuario = result.scalar_one_or_none()
     
-    if not usuario or not seguranca.verificar_senha(form_data.password, usuario.senha_hash):
+    # bcrypt fora do event loop: um pico de logins não trava o restante da API
+    try:
+        senha_ok = usuario is not None and await seguranca.verificar_senha_async(
+            form_data.password, usuario.senha_hash
+        )
+    except seguranca.PoolSenhasSaturado:
+        raise _erro_pool_senhas()
+    
+    if not senha_ok:
         raise HTTPException(status_code=400, detail="Email ou senha incorretos")
     
     token_acesso = seguranca.criar_token_acesso(dados={"sub": usuario.email})
@@ -61,170 +110,502 @@ async def criar_titulo(
     novos_titulos = servicos.criar_titulos_parcelados(dados)
     
     db.add_all(novos_titulos)
+    # flush = um único INSERT ... RETURNING para todas as parcelas (ids + data_criacao),
+    # sem o refresh por parcela que custava N idas ao banco
+    await db.flush()
+    # mantém o rollup do dashboard na mesma transação da inserção
+    await agregados.registrar_insercao(db, novos_titulos)
+    # as próximas leituras deste usuário vão ao primário (não à réplica atrasada)
+    await leitura.registrar_escrita(db, usuario_atual.id)
     await db.commit()
     
-    for t in novos_titulos:
-        await db.refresh(t)
-        
-    return novos_titulos
+    # o response_model fica para a documentação; a serialização vai pelo caminho rápido
+    return _json_titulos(novos_titulos, status_code=201)
 
-@router.get("/titulos", response_model=List[TituloResponse])
-async def listar_titulos(
-    skip: int = 0, 
-    limit: int = 100,
+@router.post("/titulos/bulk", response_model=ResultadoImportacao, status_code=201)
+async def importar_titulos(
+    request: Request,
     db: AsyncSession = Depends(get_db),
     usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
 ):
-    query = select(Titulo).offset(skip).limit(limit).order_by(Titulo.data_vencimento)
-    result = await db.execute(query)
-    return result.scalars().all()
+    
+    # Importação em massa (integração ERP). Aceita:
+    # - application/json: array de objetos no formato de TituloBase
+    # - text/csv: corpo CSV com cabeçalho
+    # - multipart/form-data: arquivo CSV no campo 'arquivo'
+    # Linhas inválidas voltam em 'erros' sem impedir a gravação das válidas.
+    
+    tipo_conteudo = request.headers.get("content-type", "")
+    
+    if tipo_conteudo.startswith("multipart/form-data"):
+        form = await request.form()
+        arquivo = form.get("arquivo")
+        if not isinstance(arquivo, UploadFile):
+            raise HTTPException(status_code=400, detail="Envie o CSV no campo 'arquivo'.")
+        linhas = importacao.ler_csv(io.TextIOWrapper(arquivo.file, encoding="utf-8-sig", newline=""))
+    elif tipo_conteudo.startswith("text/csv"):
+        try:
+            corpo = (await request.body()).decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV não está em UTF-8.")
+        linhas = importacao.ler_csv(io.StringIO(corpo, newline=""))
+    else:
+        try:
+            linhas = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON inválido.")
+        if not isinstance(linhas, list):
+            raise HTTPException(status_code=400, detail="Envie um array de títulos.")
+    
+    # entregue no commit da importação: leituras seguintes deste usuário vão ao primário
+    await leitura.registrar_escrita(db, usuario_atual.id)
+    try:
+        return await importacao.importar_titulos(db, linhas)
+    except importacao.ImportacaoGrandeDemais as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except importacao.ArquivoInvalido as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/dashboard/resumo")
-async def obter_resumo_financeiro(
+@router.post("/titulos/baixa", response_model=ResultadoBaixa)
+async def baixar_titulos(
+    dados: BaixaTitulos,
     db: AsyncSession = Depends(get_db),
     usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
 ):
-   
-    query = select(
-        # 1. Saldo Líquido (Tudo que entrou - Tudo que saiu, independente do status)
-        # (Ou ajustamos para ser apenas PAGOS se quiser fluxo de caixa realizado)
-        func.sum(case((Titulo.tipo == "RECEITA", Titulo.valor), else_=0)) -
-        func.sum(case((Titulo.tipo == "DESPESA", Titulo.valor), else_=0)),
-        
-        # 2. A Receber (Apenas Pendentes)
-        func.sum(case((
-            (Titulo.tipo == "RECEITA") & (Titulo.status == "PENDENTE"), 
-            Titulo.valor
-        ), else_=0)),
-        
-        # 3. A Pagar (Apenas Pendentes)
-        func.sum(case((
-            (Titulo.tipo == "DESPESA") & (Titulo.status == "PENDENTE"), 
-            Titulo.valor
-        ), else_=0)),
-        
-        # 4. Total Vencido (Crítico - Risco Financeiro)
-        func.sum(case((Titulo.status == "VENCIDO", Titulo.valor), else_=0))
-    )
     
-    result = await db.execute(query)
-    saldo, a_receber, a_pagar, vencido = result.one()
+    # Baixa em lote (retorno do banco): marca como PAGO os títulos em aberto dos 'ids' enviados
+    # ou de todos que atendem 'filtros', com a 'data_pagamento' informada.
+    # Um único UPDATE para o lote inteiro, com o rollup do dashboard na mesma transação (ver app/baixa.py)
     
-    # Tratamento de Nulos (Se o banco estiver vazio, retorna 0.00)
-    return {
-        "saldo_geral": saldo or 0,
-        "total_a_receber": a_receber or 0,
-        "total_a_pagar": a_pagar or 0,
-        "total_inadimplente": vencido or 0
-    }
+    if (dados.ids is None) == (dados.filtros is None):
+        raise HTTPException(status_code=400, detail="Informe 'ids' ou 'filtros' (apenas um dos dois).")
+    if dados.filtros is not None and not dados.filtros.model_dump(exclude_none=True):
+        raise HTTPException(status_code=400, detail="'filtros' vazio baixaria todos os títulos em aberto.")
+    
+    resultado = await baixa.baixar_titulos(db, dados.data_pagamento, dados.ids, dados.filtros)
+    if resultado["baixados"]:
+        await leitura.registrar_escrita(db, usuario_atual.id)
+    await db.commit()
+    return resultado
 
-@router.get("/dashboard/por-categoria")
-async def obter_totais_por_categoria(
+async def _json_grupo(db: AsyncSession, id_transacao_pai: uuid.UUID) -> Response:
+    linhas = await parcelamentos.buscar_grupo(db, id_transacao_pai)
+    if not linhas:
+        raise HTTPException(status_code=404, detail="Parcelamento não encontrado.")
+    return Response(ADAPTADOR_LINHAS_TITULOS.dump_json(linhas), media_type="application/json")
+
+@router.get("/parcelamentos/{id_transacao_pai}", response_model=List[TituloResponse])
+async def obter_parcelamento(
+    id_transacao_pai: uuid.UUID,
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # Todas as parcelas do grupo (mesmo id_transacao_pai), em ordem de parcela
+    return await _json_grupo(db, id_transacao_pai)
+
+@router.post("/parcelamentos/{id_transacao_pai}/cancelamento", response_model=List[TituloResponse])
+async def cancelar_parcelamento(
+    id_transacao_pai: uuid.UUID,
     db: AsyncSession = Depends(get_db),
     usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
 ):
     
-    #Dados para Gráfico de Rosca.
-    #Mostra onde o dinheiro está indo (Top Despesas/Receitas).
+    # Cancela as parcelas em aberto do grupo; as já pagas ficam como estão.
+    # As operações de parcelamento são um único comando SQL cada (ver app/parcelamentos.py)
+    # e devolvem o grupo inteiro já atualizado.
     
-    query = (
-        select(Categoria.nome, func.sum(Titulo.valor))
-        .join(Titulo.categoria)
-        .group_by(Categoria.nome)
-        .order_by(func.sum(Titulo.valor).desc()) # Ordena do maior para o menor
+    if await parcelamentos.cancelar_grupo(db, id_transacao_pai):
+        await leitura.registrar_escrita(db, usuario_atual.id)
+    resposta = await _json_grupo(db, id_transacao_pai)
+    await db.commit()
+    return resposta
+
+@router.post("/parcelamentos/{id_transacao_pai}/reagendamento", response_model=List[TituloResponse])
+async def reagendar_parcelamento(
+    id_transacao_pai: uuid.UUID,
+    dados: ReagendamentoParcelas,
+    db: AsyncSession = Depends(get_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # Desloca em 'meses' o vencimento das parcelas em aberto, mantendo o dia da série
+    if await parcelamentos.reagendar_grupo(db, id_transacao_pai, dados.meses):
+        await leitura.registrar_escrita(db, usuario_atual.id)
+    resposta = await _json_grupo(db, id_transacao_pai)
+    await db.commit()
+    return resposta
+
+@router.post("/parcelamentos/{id_transacao_pai}/renegociacao", response_model=List[TituloResponse])
+async def renegociar_parcelamento(
+    id_transacao_pai: uuid.UUID,
+    dados: RenegociacaoParcelas,
+    db: AsyncSession = Depends(get_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # Troca as parcelas em aberto por 'total_parcelas' novas com o saldo (ou 'valor_total')
+    criadas = await parcelamentos.renegociar_grupo(
+        db, id_transacao_pai, dados.total_parcelas, dados.valor_total, dados.primeiro_vencimento
+    )
+    resposta = await _json_grupo(db, id_transacao_pai)
+    if not criadas:
+        raise HTTPException(status_code=409, detail="Parcelamento sem parcelas em aberto.")
+    await leitura.registrar_escrita(db, usuario_atual.id)
+    await db.commit()
+    return resposta
+
+@router.post("/contas/{conta_id}/conciliacao", response_model=ResultadoConciliacao)
+async def conciliar_extrato(
+    conta_id: int,
+    request: Request,
+    formato: Optional[Literal["csv", "ofx"]] = Query(None, description="Detectado pelo conteúdo quando omitido"),
+    janela_dias: int = Query(conciliacao.JANELA_PADRAO_DIAS, ge=0, le=30),
+    baixar: bool = Query(False, description="Baixa os títulos dos lançamentos confirmados"),
+    db: AsyncSession = Depends(get_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    
+    # Conciliação do extrato bancário (corpo = arquivo OFX ou CSV, lido em streaming) com os
+    # títulos em aberto da conta: devolve os lançamentos confirmados, os sugeridos (com até 3
+    # candidatos cada) e os sem correspondência. Ver app/conciliacao.py
+    
+    if await db.scalar(select(ContaBancaria.id).where(ContaBancaria.id == conta_id)) is None:
+        raise HTTPException(status_code=404, detail="Conta bancária não encontrada.")
+    # devolve a conexão ao pool durante o upload; conciliar só volta ao banco com o extrato lido
+    await db.commit()
+    
+    fluxo = request.stream()
+    inicio = await anext(fluxo, b"")
+    if formato is None:
+        formato = conciliacao.detectar_formato(inicio)
+    
+    async def corpo():
+        # devolve o pedaço já lido para a detecção do formato
+        yield inicio
+        async for pedaco in fluxo:
+            yield pedaco
+    
+    leitor = conciliacao.ler_ofx(corpo()) if formato == "ofx" else conciliacao.ler_csv(corpo())
+    try:
+        resultado = await conciliacao.conciliar(db, conta_id, leitor, janela_dias, baixar)
+    except conciliacao.ErroExtrato as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if resultado["baixados"]:
+        await leitura.registrar_escrita(db, usuario_atual.id)
+    await db.commit()
+    return resultado
+
+@router.get("/titulos", response_model=List[TituloResponse])
+async def listar_titulos(
+    request: Request,
+    filtros: FiltroTitulos = Depends(),
+    cursor: Optional[str] = Query(None, description="Token 'X-Proximo-Cursor' da página anterior"),
+    skip: int = Query(0, ge=0, description="Obsoleto: use 'cursor' (OFFSET fica mais lento a cada página)"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # o corpo continua sendo a lista de títulos (compatível com o front),
+    # o cursor da próxima página vai no header 'X-Proximo-Cursor'
+    if cursor is not None:
+        try:
+            consultas.decodificar_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido.")
+    
+    async def gerar(cabecalhos):
+        linhas, proximo_cursor = await consultas.listar_titulos_linhas(db, filtros, limit, cursor, skip)
+        if proximo_cursor:
+            cabecalhos["X-Proximo-Cursor"] = proximo_cursor
+        return ADAPTADOR_LINHAS_TITULOS.dump_json(linhas)
+    
+    return await versao.responder_com_cache(request, gerar)
+
+@router.get("/titulos/export")
+async def exportar_titulos(
+    filtros: FiltroTitulos = Depends(),
+    formato: Literal["csv", "ndjson"] = "csv",
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # Exporta o razão inteiro (ou o recorte dos filtros) em streaming.
+    # Mesmos filtros da listagem; memória constante e primeiro byte imediato (ver app/exportacao.py)
+    nome_arquivo = f"titulos.{formato}"
+    return StreamingResponse(
+        exportacao.stream_exportacao(filtros, formato),
+        media_type=exportacao.FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'}
     )
+
+@router.post("/titulos/{titulo_id}/anexos", response_model=AnexoResponse, status_code=201)
+async def enviar_anexo(
+    titulo_id: int,
+    request: Request,
+    nome: str = Query(..., min_length=1, max_length=255, description="Nome original do arquivo"),
+    db: AsyncSession = Depends(get_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # O corpo da requisição é o próprio arquivo (sem multipart), gravado em streaming.
+    # Arquivos idênticos são guardados uma única vez (ver app/anexos.py).
+    tamanho_declarado = request.headers.get("content-length")
+    if tamanho_declarado and tamanho_declarado.isdigit() and int(tamanho_declarado) > anexos.TAMANHO_MAX_ANEXO:
+        raise HTTPException(status_code=413, detail="Anexo grande demais.")
+    
+    if await db.scalar(select(Titulo.id).where(Titulo.id == titulo_id)) is None:
+        raise HTTPException(status_code=404, detail="Título não encontrado.")
+    # devolve a conexão ao pool durante o upload (pode levar minutos)
+    await db.commit()
     
+    try:
+        sha256, tamanho, _ = await anexos.gravar(request.stream())
+    except anexos.AnexoGrandeDemais as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    anexo = Anexo(
+        titulo_id=titulo_id,
+        nome_arquivo=nome,
+        caminho_arquivo=anexos.caminho_relativo(sha256),
+        sha256=sha256,
+        tamanho=tamanho,
+        tipo_conteudo=request.headers.get("content-type") or "application/octet-stream",
+    )
+    db.add(anexo)
+    try:
+        await db.flush()
+    except IntegrityError:
+        # título excluído durante o upload (a FK/trigger de anexos.titulo_id barra o insert);
+        # o arquivo gravado fica sem registro (ver app/anexos.py)
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Título não encontrado.")
+    await leitura.registrar_escrita(db, usuario_atual.id)
+    await db.commit()
+    return anexo
+
+@router.get("/titulos/{titulo_id}/anexos", response_model=List[AnexoResponse])
+async def listar_anexos(
+    titulo_id: int,
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    query = select(Anexo).where(Anexo.titulo_id == titulo_id).order_by(Anexo.id)
     result = await db.execute(query)
-    dados = result.all()
+    return result.scalars().all()
+
+@router.get("/titulos/{titulo_id}/anexos/{anexo_id}")
+async def baixar_anexo(
+    titulo_id: int,
+    anexo_id: int,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # Download com Range (retomada, leitura parcial de PDFs) e ETag = SHA-256 do conteúdo.
+    anexo = await db.scalar(select(Anexo).where(Anexo.id == anexo_id, Anexo.titulo_id == titulo_id))
+    # anexos sem sha256 vieram de importações/seed e não têm arquivo local
+    if anexo is None or anexo.sha256 is None or not os.path.isfile(anexos.caminho_absoluto(anexo.sha256)):
+        raise HTTPException(status_code=404, detail="Anexo não encontrado.")
+    return anexos.responder_download(request, anexo)
+
+async def _job_enfileirado(db: AsyncSession, resposta: Response, tipo: str, parametros: dict, usuario_id: int) -> Job:
+    job = await jobs.enfileirar(db, tipo, parametros, usuario_id)
+    await db.commit()
+    resposta.headers["Location"] = f"/jobs/{job.id}"
+    return job
+
+@router.post("/jobs/exportacao", response_model=JobResponse, status_code=202)
+async def enfileirar_exportacao(
+    resposta: Response,
+    filtros: FiltroTitulos = Depends(),
+    formato: Literal["csv", "ndjson"] = "csv",
+    db: AsyncSession = Depends(get_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # Mesma exportação de /titulos/export, gerada por um worker da fila (app/jobs.py):
+    # acompanhe em GET /jobs/{id} e baixe em GET /jobs/{id}/arquivo
+    parametros = {"formato": formato, "filtros": filtros.model_dump(mode="json", exclude_none=True)}
+    return await _job_enfileirado(db, resposta, "exportacao", parametros, usuario_atual.id)
+
+@router.post("/jobs/conciliacao", response_model=JobResponse, status_code=202)
+async def enfileirar_conciliacao(
+    request: Request,
+    resposta: Response,
+    conta_id: int = Query(...),
+    formato: Optional[Literal["csv", "ofx"]] = Query(None, description="Detectado pelo conteúdo quando omitido"),
+    janela_dias: int = Query(conciliacao.JANELA_PADRAO_DIAS, ge=0, le=30),
+    baixar: bool = Query(False, description="Baixa os títulos dos lançamentos confirmados"),
+    db: AsyncSession = Depends(get_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    
+    # Conciliação de /contas/{id}/conciliacao em segundo plano, para extratos grandes.
+    # O extrato é gravado em streaming no armazenamento de anexos antes de enfileirar;
+    # o resultado (mesmo JSON da rota síncrona) sai em GET /jobs/{id}.
+    
+    if await db.scalar(select(ContaBancaria.id).where(ContaBancaria.id == conta_id)) is None:
+        raise HTTPException(status_code=404, detail="Conta bancária não encontrada.")
+    await db.commit()
     
-    return [{"categoria": nome, "total": valor} for nome, valor in dados]
+    try:
+        sha256, _, _ = await anexos.gravar(request.stream())
+    except anexos.AnexoGrandeDemais as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    if formato is None:
+        with open(anexos.caminho_absoluto(sha256), "rb") as arquivo:
+            formato = conciliacao.detectar_formato(arquivo.read(4096))
+    
+    parametros = {"conta_id": conta_id, "sha256": sha256, "formato": formato, "janela_dias": janela_dias, "baixar": baixar}
+    return await _job_enfileirado(db, resposta, "conciliacao", parametros, usuario_atual.id)
 
-@router.get("/dashboard/fluxo-caixa")
-async def obter_fluxo_caixa_mensal(
+async def _obter_job(db: AsyncSession, job_id: int, usuario: Usuario) -> Job:
+    # cada usuário só enxerga os próprios jobs
+    job = await db.scalar(select(Job).where(Job.id == job_id, Job.usuario_id == usuario.id))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def obter_job(
+    job_id: int,
     db: AsyncSession = Depends(get_db),
     usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
 ):
-  
-    # Extrai o 'YYYY-MM' da data no Postgres
-    mes_ano = func.to_char(Titulo.data_vencimento, 'YYYY-MM')
-    
-    query = (
-        select(
-            mes_ano.label("mes"),
-            Titulo.tipo,
-            func.sum(Titulo.valor)
-        )
-        .group_by(mes_ano, Titulo.tipo)
-        .order_by(mes_ano)
+    # lido do primário: o status muda a todo momento e o cliente consulta logo após enfileirar
+    return await _obter_job(db, job_id, usuario_atual)
+
+@router.get("/jobs/{job_id}/arquivo")
+async def baixar_arquivo_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # arquivo gerado por um job de exportação
+    job = await _obter_job(db, job_id, usuario_atual)
+    if job.tipo != "exportacao":
+        raise HTTPException(status_code=404, detail="Este job não gera arquivo.")
+    if job.status != StatusJob.CONCLUIDO:
+        raise HTTPException(status_code=409, detail=f"Job ainda não concluído ({job.status}).")
+    formato = job.resultado["formato"]
+    caminho = jobs.caminho_resultado(job.id, formato)
+    if not os.path.isfile(caminho):
+        raise HTTPException(status_code=404, detail="Arquivo do job não encontrado.")
+    return FileResponse(caminho, media_type=exportacao.FORMATOS[formato], filename=f"titulos.{formato}")
+
+@router.get("/dashboard")
+async def obter_dashboard(
+    request: Request,
+    filtros: FiltroDashboard = Depends(),
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    
+    # Carga completa do dashboard em uma única requisição.
+    # As 5 consultas usam uma única sessão de leitura (réplica quando disponível, ver
+    # deps.get_read_db), ou seja, uma conexão do pool, contra 5 conexões quando o front
+    # chama os endpoints individuais em paralelo.
+    # Os filtros (período/conta/categoria) valem para todas as seções, inclusive os últimos títulos.
+    _validar_filtro_dashboard(filtros)
+    filtros_titulos = FiltroTitulos(
+        vencimento_de=filtros.de, vencimento_ate=filtros.ate,
+        conta_bancaria_id=filtros.conta_bancaria_id, categoria_id=filtros.categoria_id,
     )
     
-    result = await db.execute(query)
-    dados = result.all()
-    
-    # Transforma a lista plana do SQL em um objeto estruturado para o Front
-    # De: [('2025-01', 'RECEITA', 100), ('2025-01', 'DESPESA', 50)]
-    # Para: {'2025-01': {'receitas': 100, 'despesas': 50}}
-    relatorio = {}
-    for mes, tipo, valor in dados:
-        if mes not in relatorio:
-            relatorio[mes] = {"mes": mes, "receitas": 0, "despesas": 0}
+    async def gerar(cabecalhos):
+        resumo = await consultas.resumo_financeiro(db, filtros)
+        categorias = await consultas.totais_por_categoria(db, filtros)
+        fluxo = await consultas.fluxo_caixa_mensal(db, filtros)
+        titulos, _ = await consultas.listar_titulos(db, filtros_titulos, limit=10)
+        ranking = await consultas.ranking_contatos(db, filtros)
         
-        if tipo == "RECEITA":
-            relatorio[mes]["receitas"] = valor
-        else:
-            relatorio[mes]["despesas"] = valor
-            
-    return list(relatorio.values())
+        # as chaves espelham o retorno de dashboardService.carregarTudo no front
+        return {
+            "resumo": resumo,
+            "categorias": categorias,
+            "fluxo": fluxo,
+            "titulos": [TituloResponse.model_validate(t) for t in titulos],
+            "ranking": ranking
+        }
+    
+    return await versao.responder_com_cache(request, gerar)
+
+@router.get("/dashboard/resumo")
+async def obter_resumo_financeiro(
+    request: Request,
+    filtros: FiltroDashboard = Depends(),
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    _validar_filtro_dashboard(filtros)
+    return await versao.responder_com_cache(request, lambda _: consultas.resumo_financeiro(db, filtros))
+
+@router.get("/dashboard/por-categoria")
+async def obter_totais_por_categoria(
+    request: Request,
+    filtros: FiltroDashboard = Depends(),
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    _validar_filtro_dashboard(filtros)
+    return await versao.responder_com_cache(request, lambda _: consultas.totais_por_categoria(db, filtros))
+
+@router.get("/dashboard/fluxo-caixa")
+async def obter_fluxo_caixa_mensal(
+    request: Request,
+    filtros: FiltroDashboard = Depends(),
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    _validar_filtro_dashboard(filtros)
+    return await versao.responder_com_cache(request, lambda _: consultas.fluxo_caixa_mensal(db, filtros))
 
 @router.get("/dashboard/ranking")
 async def obter_ranking_contatos(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    filtros: FiltroDashboard = Depends(),
+    db: AsyncSession = Depends(deps.get_read_db),
     usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
 ):
-   
-    # 1. Top Devedores (Quem nos deve)
-    query_devedores = (
-        select(Contato.nome, func.sum(Titulo.valor))
-        .join(Titulo.contato)
-        .where(Titulo.tipo == "RECEITA")
-        .where(Titulo.status.in_(["PENDENTE", "VENCIDO"]))
-        .group_by(Contato.nome)
-        .order_by(func.sum(Titulo.valor).desc())
-        .limit(5) # Top 5
-    )
+    _validar_filtro_dashboard(filtros)
+    return await versao.responder_com_cache(request, lambda _: consultas.ranking_contatos(db, filtros))
+
+@router.get("/dashboard/projecao")
+async def obter_projecao_saldos(
+    request: Request,
+    de: Optional[date] = Query(None, description="Primeiro dia da janela (padrão: hoje)"),
+    ate: Optional[date] = Query(None, description="Último dia da janela (padrão: de + 90 dias)"),
+    db: AsyncSession = Depends(deps.get_read_db),
+    usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
+):
+    # Saldo projetado e realizado dia a dia por conta bancária e consolidado.
+    # O custo é proporcional à janela (máx. PROJECAO_MAX_DIAS), não ao histórico (ver consultas.projecao_saldos)
+    hoje = date.today()
+    de = de or hoje
+    ate = ate or de + timedelta(days=90)
+    if ate < de:
+        raise HTTPException(status_code=400, detail="'ate' deve ser igual ou posterior a 'de'.")
+    if (ate - de).days >= PROJECAO_MAX_DIAS:
+        raise HTTPException(status_code=400, detail=f"Janela máxima de {PROJECAO_MAX_DIAS} dias.")
     
-    # 2. Top Credores (Quem nós devemos)
-    query_credores = (
-        select(Contato.nome, func.sum(Titulo.valor))
-        .join(Titulo.contato)
-        .where(Titulo.tipo == "DESPESA")
-        .where(Titulo.status.in_(["PENDENTE", "VENCIDO"]))
-        .group_by(Contato.nome)
-        .order_by(func.sum(Titulo.valor).desc())
-        .limit(5) # Top 5
+    # sem 'de' explícito a janela depende de hoje: a data entra na ETag/cache
+    return await versao.responder_com_cache(
+        request, lambda _: consultas.projecao_saldos(db, de, ate), variante=hoje.isoformat()
     )
-    
-    res_devedores = await db.execute(query_devedores)
-    res_credores = await db.execute(query_credores)
-    
-    return {
-        "devedores": [{"nome": nome, "total": valor} for nome, valor in res_devedores.all()],
-        "credores": [{"nome": nome, "total": valor} for nome, valor in res_credores.all()]
-    }
 
 @router.get("/categorias", response_model=List[CategoriaResponse])
 async def listar_categorias(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_read_db),
     usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
 ):
-    query = select(Categoria).order_by(Categoria.nome)
-    result = await db.execute(query)
-    return result.scalars().all()
+    async def gerar(cabecalhos):
+        query = select(Categoria).order_by(Categoria.nome)
+        result = await db.execute(query)
+        return result.scalars().all()
+    
+    return await versao.responder_com_cache(request, gerar, ADAPTADOR_CATEGORIAS)
 
 @router.get("/dashboard/busca-contato")
 async def buscar_financeiro_contato(
+    request: Request,
     q: str, # Query param: ?q=Nome
-    db: AsyncSession = Depends(get_db),
+    limite: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(deps.get_read_db),
     usuario_atual: Usuario = Depends(deps.obter_usuario_logado)
 ):
     """
@@ -234,34 +615,4 @@ async def buscar_financeiro_contato(
     if len(q) < 2:
         return [] # Não busca com menos de 2 letras para poupar banco
 
-    query = (
-        select(
-            Contato.nome,
-            # Soma Receitas Pendentes/Vencidas (Quanto ele nos deve)
-            func.sum(case((
-                (Titulo.tipo == "RECEITA") & (Titulo.status.in_(["PENDENTE", "VENCIDO"])), 
-                Titulo.valor
-            ), else_=0)).label("divida_cliente"),
-            
-            # Soma Despesas Pendentes/Vencidas (Quanto nós devemos a ele)
-            func.sum(case((
-                (Titulo.tipo == "DESPESA") & (Titulo.status.in_(["PENDENTE", "VENCIDO"])), 
-                Titulo.valor
-            ), else_=0)).label("credito_fornecedor")
-        )
-        .join(Titulo.contato)
-        .where(Contato.nome.ilike(f"%{q}%")) 
-        .group_by(Contato.nome)
-    )
-    
-    result = await db.execute(query)
-    dados = result.all()
-    
-    return [
-        {
-            "nome": row.nome,
-            "a_receber": row.divida_cliente or 0,
-            "a_pagar": row.credito_fornecedor or 0
-        }
-        for row in dados
-    ]
\ No newline at end of file
+    return await versao.responder_com_cache(request, lambda _: consultas.buscar_contatos(db, q, limite))
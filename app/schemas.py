@@ -1,8 +1,9 @@
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from decimal import Decimal
 from datetime import date, datetime
-from typing import Optional, List
-from app.modelo import TipoLancamento, StatusTitulo
+from typing import Any, Optional, List
+from typing_extensions import TypedDict  # TypedDict do typing só é aceito pelo Pydantic no Python 3.12+
+from app.modelo import TipoLancamento, StatusTitulo, StatusJob
 
 class TokenData(BaseModel):
     # Schema usado para validar o payload do JWT.
@@ -77,4 +78,132 @@ class TituloResponse(TituloBase):
     total_parcelas: int
     data_criacao: datetime
     #configDict(from_attributes=True) para ler o retorno do banco
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class TituloLinha(TypedDict):
+    # mesmo JSON de TituloResponse (campos na mesma ordem), montado direto das colunas do banco:
+    # serializado por TypeAdapter.dump_json sem objetos do ORM nem validação (listagens grandes)
+    # tipo/status como str: a coluna já guarda o valor do enum, que é o que TituloResponse emite
+    descricao: str
+    valor: Decimal
+    data_vencimento: date
+    tipo: str
+    categoria_id: int
+    contato_id: int
+    conta_bancaria_id: int
+    id: int
+    status: str
+    numero_parcela: int
+    total_parcelas: int
+    data_criacao: datetime
+
+CAMPOS_TITULO_RESPONSE = tuple(TituloLinha.__annotations__)
+assert CAMPOS_TITULO_RESPONSE == tuple(TituloResponse.model_fields), "TituloLinha divergiu de TituloResponse"
+
+class FiltroTitulos(BaseModel):
+    # filtros server-side da listagem (e exportação) de títulos
+    # cada filtro de igualdade tem um índice composto correspondente em Titulo
+    tipo: Optional[TipoLancamento] = None
+    status: Optional[StatusTitulo] = None
+    categoria_id: Optional[int] = None
+    contato_id: Optional[int] = None
+    conta_bancaria_id: Optional[int] = None
+    vencimento_de: Optional[date] = None
+    vencimento_ate: Optional[date] = None
+
+
+class FiltroDashboard(BaseModel):
+    # recorte dos endpoints /dashboard/*: período de vencimento (inclusivo) e conta/categoria
+    # sem filtros, os totais cobrem todo o histórico
+    de: Optional[date] = None
+    ate: Optional[date] = None
+    conta_bancaria_id: Optional[int] = None
+    categoria_id: Optional[int] = None
+
+
+class BaixaTitulos(BaseModel):
+    # baixa em lote: 'ids' OU 'filtros' (os mesmos da listagem de títulos), nunca os dois
+    data_pagamento: date
+    ids: Optional[List[int]] = Field(None, min_length=1, max_length=100_000)
+    filtros: Optional[FiltroTitulos] = None
+
+class ResultadoBaixa(BaseModel):
+    baixados: int
+    ids: List[int]
+    # ids enviados que não existem ou não estavam em aberto (já PAGO ou CANCELADO)
+    ignorados: List[int] = []
+
+class ReagendamentoParcelas(BaseModel):
+    # desloca o vencimento das parcelas em aberto (negativo antecipa)
+    meses: int = Field(..., ge=-120, le=120)
+
+class RenegociacaoParcelas(BaseModel):
+    # as parcelas em aberto viram 'total_parcelas' novas; sem 'valor_total', renegocia o saldo em aberto
+    total_parcelas: int = Field(..., ge=1, le=360)
+    valor_total: Optional[Decimal] = Field(None, gt=0, max_digits=15, decimal_places=2)
+    primeiro_vencimento: Optional[date] = None
+
+
+class AnexoResponse(BaseModel):
+    id: int
+    titulo_id: int
+    nome_arquivo: str
+    tipo_conteudo: Optional[str] = None
+    tamanho: Optional[int] = None
+    sha256: Optional[str] = None
+    data_upload: datetime
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ErroLinhaImportacao(BaseModel):
+    # 'linha' é 1-based na ordem do arquivo/array enviado (sem contar o cabeçalho do CSV)
+    linha: int
+    erros: List[str]
+
+class ResultadoImportacao(BaseModel):
+    inseridos: int
+    ids: List[int]
+    erros: List[ErroLinhaImportacao]
+
+class CandidatoConciliacao(BaseModel):
+    # um título, ou várias parcelas do mesmo parcelamento pagas num único lançamento
+    titulo_ids: List[int]
+    documento_coincide: bool
+    # vencimento (da última parcela) menos a data do lançamento
+    diferenca_dias: int
+
+class LancamentoConciliado(BaseModel):
+    linha: int
+    data: date
+    valor: Decimal
+    tipo: TipoLancamento
+    descricao: Optional[str] = None
+    documento: Optional[str] = None
+    id_externo: Optional[str] = None
+    titulo_ids: List[int] = []  # confirmados
+    candidatos: List[CandidatoConciliacao] = []  # sugeridos
+
+class ResultadoConciliacao(BaseModel):
+    linhas: int
+    confirmados: List[LancamentoConciliado]
+    sugeridos: List[LancamentoConciliado]
+    sem_correspondencia: List[int]
+    erros: List[ErroLinhaImportacao]
+    baixados: int
+
+
+class JobResponse(BaseModel):
+    id: int
+    tipo: str
+    status: StatusJob
+    tentativas: int
+    max_tentativas: int
+    executar_em: datetime
+    data_criacao: datetime
+    data_inicio: Optional[datetime] = None
+    data_conclusao: Optional[datetime] = None
+    # última falha (também nos jobs que voltaram para a fila)
+    erro: Optional[str] = None
+    # JSON devolvido pelo job; exportações ficam em GET /jobs/{id}/arquivo
+    resultado: Optional[Any] = None
+    model_config = ConfigDict(from_attributes=True)
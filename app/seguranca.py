@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from passlib.context import CryptContext
@@ -21,6 +23,40 @@ def gerar_hash_senha(senha: str) -> str:
     # hash seguro da senha para salvar no banco.
     return contexto_cripto.hash(senha)
 
+# pool dedicado para o bcrypt
+# cada hash/verificação leva ~200ms de CPU; rodando direto no handler async isso congela o
+# event loop inteiro. O bcrypt libera o GIL, então threads rodam em paralelo de verdade.
+# BCRYPT_WORKERS limita a CPU gasta com senhas e BCRYPT_FILA_MAX limita quantas operações
+# podem esperar na fila: além disso a API responde 503 na hora em vez de acumular latência.
+
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_FILA_MAX = int(os.getenv("BCRYPT_FILA_MAX", "32"))
+
+_pool_senhas = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_operacoes_pendentes = 0  # em execução + na fila; só é alterado no event loop
+
+class PoolSenhasSaturado(Exception):
+    pass
+
+def operacoes_senha_pendentes() -> int:
+    return _operacoes_pendentes
+
+async def _executar_no_pool(funcao, *args):
+    global _operacoes_pendentes
+    if _operacoes_pendentes >= BCRYPT_WORKERS + BCRYPT_FILA_MAX:
+        raise PoolSenhasSaturado()
+    _operacoes_pendentes += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_pool_senhas, funcao, *args)
+    finally:
+        _operacoes_pendentes -= 1
+
+async def verificar_senha_async(senha_texto_puro: str, senha_hash: str) -> bool:
+    return await _executar_no_pool(verificar_senha, senha_texto_puro, senha_hash)
+
+async def gerar_hash_senha_async(senha: str) -> str:
+    return await _executar_no_pool(gerar_hash_senha, senha)
+
 def criar_token_acesso(dados: dict, tempo_vida: Optional[timedelta] = None):
     # token JWT que o frontend vai usar para autenticar
     dados_para_codificar = dados.copy()
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import select, update, func, literal_column
+
+from app import agregados, particionamento
+from app.database import SessionLocal
+from app.modelo import Titulo, StatusTitulo
+
+# Tarefas agendadas que rodam dentro do processo da API (iniciadas no lifespan de app/main.py).
+#
+# marcar_vencidos: move títulos PENDENTE com vencimento no passado para VENCIDO.
+# - lotes pequenos, cada um na sua transação: nenhum lock fica preso por muito tempo
+# - FOR UPDATE SKIP LOCKED: não espera por linhas que uma requisição está alterando
+# - advisory lock por lote: com vários workers, só um executa por vez; os outros desistem da rodada
+# - cada lote atualiza os rollups do dashboard na mesma transação (app/agregados.py)
+#
+# garantir_particoes: cria as partições anuais futuras de 'titulos' (app/particionamento.py);
+# sem efeito enquanto a tabela não for particionada. Roda também no startup.
+
+INTERVALO_VENCIDOS = int(os.getenv("TAREFA_VENCIDOS_INTERVALO", "300"))  # segundos; 0 desliga
+LOTE_VENCIDOS = int(os.getenv("TAREFA_VENCIDOS_LOTE", "1000"))
+INTERVALO_PARTICOES = int(os.getenv("TAREFA_PARTICOES_INTERVALO", "86400"))  # segundos; 0 desliga
+
+# chave arbitrária (int64) do pg_try_advisory_xact_lock desta tarefa
+CHAVE_LOCK_VENCIDOS = 7_310_001
+
+# última execução, para /health e /metrics
+ultima_execucao_vencidos = {
+    "inicio": None,
+    "duracao_ms": None,
+    "linhas": None,
+    "status": None,
+}
+
+_tarefas: list = []
+
+
+async def _marcar_lote_vencidos(db, tamanho_lote: int):
+
+    # retorna None se outro worker está com a tarefa, senão o número de linhas do lote
+
+    lock = await db.scalar(select(func.pg_try_advisory_xact_lock(CHAVE_LOCK_VENCIDOS)))
+    if not lock:
+        return None
+
+    # o predicado do índice parcial vai como literal: com parâmetro ($1) o planner não
+    # consegue provar status = 'PENDENTE' e ignora o índice
+    alvo = (
+        select(Titulo.id)
+        .where(Titulo.status == literal_column("'PENDENTE'"))
+        .where(Titulo.data_vencimento < func.current_date())
+        .order_by(Titulo.data_vencimento)
+        .limit(tamanho_lote)
+        .with_for_update(skip_locked=True)
+        .cte("alvo")
+    )
+    stmt = (
+        update(Titulo)
+        .where(Titulo.id == alvo.c.id)
+        .values(status=StatusTitulo.VENCIDO)
+        .returning(
+            Titulo.valor, Titulo.data_vencimento, Titulo.tipo, Titulo.status,
+            Titulo.categoria_id, Titulo.conta_bancaria_id, Titulo.contato_id,
+        )
+    )
+    atualizados = (await db.execute(stmt)).all()
+
+    if atualizados:
+        antes = [SimpleNamespace(**{**linha._mapping, "status": StatusTitulo.PENDENTE}) for linha in atualizados]
+        await agregados.aplicar_deltas(db, removidos=antes, adicionados=atualizados)
+    await db.commit()
+    return len(atualizados)
+
+
+async def marcar_vencidos(tamanho_lote: int = LOTE_VENCIDOS) -> int:
+    inicio = time.perf_counter()
+    ultima_execucao_vencidos["inicio"] = datetime.now(timezone.utc).isoformat()
+    total = 0
+    status = "ok"
+    try:
+        while True:
+            async with SessionLocal() as db:
+                linhas = await _marcar_lote_vencidos(db, tamanho_lote)
+            if linhas is None:
+                status = "ocupado"  # outro worker está executando
+                break
+            total += linhas
+            if linhas < tamanho_lote:
+                break
+            # devolve o event loop entre lotes
+            await asyncio.sleep(0)
+    except Exception:
+        status = "erro"
+        raise
+    finally:
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        ultima_execucao_vencidos.update(duracao_ms=round(duracao_ms, 1), linhas=total, status=status)
+        print(f" [Tarefas] marcar_vencidos: {total} título(s) em {duracao_ms:.0f}ms ({status})")
+    return total
+
+
+async def garantir_particoes():
+    async with SessionLocal() as db:
+        criadas = await particionamento.garantir_particoes_futuras(db)
+    if criadas:
+        print(f" [Tarefas] garantir_particoes: {', '.join(criadas)} criada(s)")
+
+
+async def _agendar(funcao, intervalo: int):
+    while True:
+        try:
+            await funcao()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f" [Tarefas] falha em {funcao.__name__}: {e}")
+        await asyncio.sleep(intervalo)
+
+
+def iniciar():
+    if INTERVALO_VENCIDOS > 0:
+        _tarefas.append(asyncio.create_task(_agendar(marcar_vencidos, INTERVALO_VENCIDOS)))
+    if INTERVALO_PARTICOES > 0:
+        _tarefas.append(asyncio.create_task(_agendar(garantir_particoes, INTERVALO_PARTICOES)))
+
+
+async def parar():
+    for tarefa in _tarefas:
+        tarefa.cancel()
+    for tarefa in _tarefas:
+        try:
+            await tarefa
+        except asyncio.CancelledError:
+            pass
+    _tarefas.clear()
@@ -0,0 +1,170 @@
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import notificacoes
+from app.database import SessionLocal
+
+# Versão dos dados + GET condicional (ETag / If-None-Match) + cache de respostas em memória.
+#
+# Toda transação que escreve em titulos/categorias/contatos chama registrar_escrita(db):
+# ela pega o próximo valor de 'versao_dados_seq' e o publica via NOTIFY. Todos os workers
+# acompanham o maior valor recebido, então a versão (e as ETags) é a mesma em qualquer worker.
+# Com a versão em memória, um If-None-Match igual responde 304 sem tocar no PostgreSQL e
+# respostas repetidas saem do cache (chave: caminho + query string + versão).
+# Sem a conexão de LISTEN não há como saber de escritas de outros processos: nesse caso
+# atual() devolve None e o cache fica desligado até a reconexão.
+
+RESPOSTAS_CACHE_MAX = int(os.getenv("RESPOSTAS_CACHE_MAX", "512"))
+RESPOSTA_CACHE_MAX_BYTES = 1024 * 1024  # respostas maiores não vão para o cache
+
+_versao = 0
+_sincronizada = False
+
+
+def atual() -> Optional[int]:
+    if not (_sincronizada and notificacoes.conectado):
+        return None
+    return _versao
+
+
+def _avancar(valor: int):
+    global _versao
+    if valor > _versao:
+        _versao = valor
+
+
+def _ao_notificar(payload: str):
+    _avancar(int(payload))
+
+
+async def _ao_conectar():
+    # relê a versão do banco: escritas feitas enquanto estava desconectado não chegaram por NOTIFY
+    global _sincronizada
+    _sincronizada = False
+    async with SessionLocal() as db:
+        valor = await db.scalar(text("SELECT last_value FROM versao_dados_seq"))
+    _avancar(valor)
+    _sincronizada = True
+
+
+notificacoes.registrar(notificacoes.CANAL_VERSAO, _ao_notificar)
+notificacoes.registrar_conexao(_ao_conectar)
+
+
+async def registrar_escrita(db: AsyncSession):
+
+    # chamar dentro da transação que escreve; a versão nova vale para todos no COMMIT
+    # (NOTIFY para os outros workers, e localmente logo após o commit: quem escreveu lê o que escreveu)
+
+    result = await db.execute(
+        text("SELECT v, pg_notify(:canal, v::text) FROM nextval('versao_dados_seq') AS v"),
+        {"canal": notificacoes.CANAL_VERSAO},
+    )
+    valor = result.scalar_one()
+    event.listen(db.sync_session, "after_commit", lambda _sessao: _avancar(valor), once=True)
+
+
+class CacheRespostas:
+
+    # LRU de chave -> (versao, corpo, cabeçalhos); entradas de versões antigas nunca são servidas
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def obter(self, chave: str, versao: int) -> Optional[tuple]:
+        entrada = self._entradas.get(chave)
+        if entrada is None or entrada[0] != versao:
+            return None
+        self._entradas.move_to_end(chave)
+        return entrada[1], entrada[2]
+
+    def guardar(self, chave: str, versao: int, corpo: bytes, cabecalhos: dict):
+        if self.max_entradas <= 0 or len(corpo) > RESPOSTA_CACHE_MAX_BYTES:
+            return
+        self._entradas[chave] = (versao, corpo, cabecalhos)
+        self._entradas.move_to_end(chave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+
+cache_respostas = CacheRespostas(RESPOSTAS_CACHE_MAX)
+
+
+def _etag(versao: int, variante: str = "") -> str:
+    return f'W/"v{versao}-{variante}"' if variante else f'W/"v{versao}"'
+
+
+def _chave(request: Request, variante: str = "") -> str:
+    parametros = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return f"{request.url.path}?{parametros}#{variante}"
+
+
+def _nao_modificado(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (v.strip() for v in if_none_match.split(","))
+
+
+async def responder_com_cache(
+    request: Request,
+    gerar: Callable[[dict], Awaitable[Any]],
+    adaptador: Optional[TypeAdapter] = None,
+    variante: str = "",
+) -> Response:
+
+    # gerar(cabecalhos) executa as consultas e devolve o conteúdo (ou o JSON pronto, em bytes);
+    # pode preencher cabeçalhos extras
+    # adaptador: o mesmo tipo do response_model da rota, para serializar byte a byte igual ao FastAPI
+    # variante: o que, além da query string e da versão, muda a resposta (ex: a data de hoje
+    # quando a rota usa valores padrão relativos a hoje); entra na ETag e na chave do cache
+
+    versao = atual()
+    if versao is None:
+        cabecalhos = {}
+        return _montar_resposta(await gerar(cabecalhos), cabecalhos, adaptador)
+
+    etag = _etag(versao, variante)
+    cabecalhos_cache = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if _nao_modificado(request, etag):
+        return Response(status_code=304, headers=cabecalhos_cache)
+
+    chave = _chave(request, variante)
+    em_cache = cache_respostas.obter(chave, versao)
+    if em_cache is not None:
+        corpo, cabecalhos = em_cache
+        return Response(corpo, media_type="application/json", headers={**cabecalhos, **cabecalhos_cache})
+
+    # leitura na réplica (deps.get_read_db) que ainda não aplicou todas as escritas até 'versao':
+    # o conteúdo pode ser anterior a ela, então não leva ETag nem vai para o cache
+    versao_replica = getattr(request.state, "versao_replica", None)
+    if versao_replica is not None and versao_replica < versao:
+        cabecalhos = {}
+        return _montar_resposta(await gerar(cabecalhos), cabecalhos, adaptador)
+
+    # a versão lida ANTES da consulta vai na ETag e na chave: se alguém escrever no meio,
+    # esta resposta fica associada à versão antiga e não é servida de novo
+    cabecalhos = {}
+    resposta = _montar_resposta(await gerar(cabecalhos), cabecalhos, adaptador)
+    cache_respostas.guardar(chave, versao, resposta.body, cabecalhos)
+    resposta.headers.update(cabecalhos_cache)
+    return resposta
+
+
+def _montar_resposta(conteudo, cabecalhos: dict, adaptador: Optional[TypeAdapter]) -> Response:
+    if isinstance(conteudo, bytes):
+        # JSON já serializado pela rota (ex: TypeAdapter.dump_json das listagens de títulos)
+        return Response(conteudo, media_type="application/json", headers=cabecalhos)
+    if adaptador is not None:
+        conteudo = adaptador.dump_python(adaptador.validate_python(conteudo, from_attributes=True), mode="json")
+    return JSONResponse(jsonable_encoder(conteudo), headers=cabecalhos)
@@ -0,0 +1,47 @@
+import asyncio
+import signal
+import sys
+
+# Processo dedicado aos jobs da fila (app/jobs.py), sem servir HTTP:
+#   python -m app.worker [quantidade]
+# 'quantidade' workers asyncio neste processo (padrão JOBS_WORKERS). Pode rodar em quantas
+# máquinas/processos for preciso: a retirada com SKIP LOCKED distribui os jobs entre todos.
+# Com workers dedicados, JOBS_WORKERS=0 na API tira o trabalho pesado dos processos que atendem.
+# SIGTERM/SIGINT: os jobs em execução voltam para a fila sem gastar tentativa.
+
+
+async def _executar(quantidade: int):
+    from app import jobs, notificacoes
+
+    parada = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, parada.set)
+
+    # LISTEN: acorda os workers assim que um job é enfileirado
+    notificacoes.iniciar()
+    jobs.iniciar(quantidade)
+    print(f" [Worker] {quantidade} worker(s) de jobs em execução")
+    await parada.wait()
+    print(" [Worker] encerrando")
+    await jobs.parar()
+    await notificacoes.parar()
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    # depois do .env: os módulos leem a configuração ao serem importados
+    from app.jobs import JOBS_WORKERS
+
+    argumento = sys.argv[1] if len(sys.argv) > 1 else None
+    if argumento is not None and not argumento.isdigit():
+        print("Uso: python -m app.worker [quantidade]")
+        sys.exit(2)
+    quantidade = int(argumento) if argumento else max(JOBS_WORKERS, 1)
+    sys.exit(asyncio.run(_executar(quantidade)))
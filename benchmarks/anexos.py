@@ -0,0 +1,120 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+# Vazão de upload/download de anexos (app/anexos.py) com arquivos de 1 MB e 100 MB.
+#
+# Dois modos:
+# - armazenamento: só a camada de disco (hash SHA-256 + gravação + rename), sem servidor nem
+#   banco, num diretório temporário. Mede o teto do upload no processo da API.
+#   python -m benchmarks.anexos armazenamento --concorrencia 1 8
+# - http: fluxo completo contra a API rodando e o banco semeado por benchmarks.semear
+#   (upload em streaming, download inteiro e download com Range do último 1 MB).
+#   python -m benchmarks.anexos http --url http://localhost:8000 --concorrencia 1 8
+#
+# Cada envio usa conteúdo diferente (sem deduplicação); a rodada 'duplicado' repete o mesmo
+# conteúdo para medir o caminho em que o arquivo já existe.
+
+MB = 1024 * 1024
+TAMANHOS_MB = (1, 100)
+PEDACO = 64 * 1024  # tamanho dos pedaços entregues pelo servidor ASGI
+
+
+def _conteudo_base(tamanho: int) -> bytes:
+    return os.urandom(tamanho)
+
+
+async def _fluxo(base: bytes, marca: bytes):
+    # mesmo tamanho da base, conteúdo único por 'marca'
+    yield marca + base[len(marca):PEDACO]
+    for inicio in range(PEDACO, len(base), PEDACO):
+        yield base[inicio:inicio + PEDACO]
+
+
+def _linha(rotulo, tamanho_mb, concorrencia, total_bytes, decorrido):
+    vazao = total_bytes / MB / decorrido
+    print(f"{rotulo:<12} | {tamanho_mb:>5} MB | x{concorrencia:<3} | {decorrido:>8.2f}s | {vazao:>9.1f} MB/s")
+
+
+async def medir_armazenamento(concorrencias, repeticoes: int):
+    from app import anexos
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        anexos.DIRETORIO_ANEXOS = diretorio
+        for tamanho_mb in TAMANHOS_MB:
+            base = _conteudo_base(tamanho_mb * MB)
+            for concorrencia in concorrencias:
+                for rotulo, unico in (("upload", True), ("duplicado", False)):
+                    total = concorrencia * repeticoes
+                    inicio = time.perf_counter()
+                    for rodada in range(repeticoes):
+                        await asyncio.gather(*(
+                            anexos.gravar(_fluxo(base, f"{rodada}:{i}:{time.time_ns()}".encode() if unico else b""))
+                            for i in range(concorrencia)
+                        ))
+                    _linha(rotulo, tamanho_mb, concorrencia, total * len(base), time.perf_counter() - inicio)
+
+
+async def medir_http(args):
+    import httpx
+    from benchmarks.semear import EMAIL_BENCH, SENHA_BENCH
+
+    limites = httpx.Limits(max_connections=max(args.concorrencia), max_keepalive_connections=max(args.concorrencia))
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=600) as cliente:
+        resposta = await cliente.post("/auth/login", data={"username": EMAIL_BENCH, "password": SENHA_BENCH})
+        resposta.raise_for_status()
+        cabecalhos = {"Authorization": f"Bearer {resposta.json()['access_token']}"}
+
+        async def enviar(base, marca):
+            resposta = await cliente.post(
+                f"/titulos/{args.titulo}/anexos", params={"nome": "bench.bin"},
+                content=_fluxo(base, marca),
+                headers={**cabecalhos, "Content-Type": "application/octet-stream"},
+            )
+            resposta.raise_for_status()
+            return resposta.json()["id"]
+
+        async def baixar(anexo_id, faixa=None):
+            extra = {"Range": faixa} if faixa else {}
+            recebidos = 0
+            async with cliente.stream("GET", f"/titulos/{args.titulo}/anexos/{anexo_id}",
+                                      headers={**cabecalhos, **extra}) as resposta:
+                resposta.raise_for_status()
+                async for pedaco in resposta.aiter_raw():
+                    recebidos += len(pedaco)
+            return recebidos
+
+        for tamanho_mb in TAMANHOS_MB:
+            base = _conteudo_base(tamanho_mb * MB)
+            for concorrencia in args.concorrencia:
+                inicio = time.perf_counter()
+                ids = await asyncio.gather(*(
+                    enviar(base, f"{i}:{time.time_ns()}".encode()) for i in range(concorrencia)
+                ))
+                _linha("upload", tamanho_mb, concorrencia, concorrencia * len(base), time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                recebidos = await asyncio.gather(*(baixar(anexo_id) for anexo_id in ids))
+                _linha("download", tamanho_mb, concorrencia, sum(recebidos), time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                recebidos = await asyncio.gather(*(baixar(anexo_id, f"bytes=-{MB}") for anexo_id in ids))
+                _linha("range", tamanho_mb, concorrencia, sum(recebidos), time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vazão de upload/download de anexos")
+    parser.add_argument("modo", choices=("armazenamento", "http"))
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeticoes", type=int, default=3, help="rodadas por medida (modo armazenamento)")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--titulo", type=int, default=1, help="título que recebe os anexos (modo http)")
+    args = parser.parse_args()
+
+    print(f"{'operação':<12} | {'arquivo':>8} | {'conc':<4} | {'tempo':>9} | {'vazão':>14}")
+    if args.modo == "armazenamento":
+        asyncio.run(medir_armazenamento(args.concorrencia, args.repeticoes))
+    else:
+        asyncio.run(medir_http(args))
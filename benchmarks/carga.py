@@ -0,0 +1,238 @@
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import date, datetime, timezone
+
+import httpx
+
+# Teste de carga da API: cada cenário roda por --duracao segundos com --concorrencia clientes
+# e o resultado (vazão, p50/p95/p99, status) vai para um JSON que pode ser comparado entre
+# commits com benchmarks.comparar.
+#
+# Pré-requisitos: banco carregado com benchmarks.semear e a API rodando.
+#   pip install -r benchmarks/requirements.txt
+#   python -m benchmarks.semear --escala 1m
+#   python -m benchmarks.carga --escala 1m --concorrencia 32 --saida resultados/1m.json
+#
+# A ordem dos cenários é fixa: leituras primeiro, escritas (criar_titulo) por último,
+# para as escritas não invalidarem o cache de respostas no meio das leituras.
+
+TERMOS_BUSCA = ["te", "tec", "glo", "omega", "alfa", "be", "sup", "mega", "ult", "pri", "fas", "eas", "star"]
+PAGINAS_PROFUNDAS = 50  # páginas seguidas via cursor em cada execução de listar_titulos_profundo
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+class Contexto:
+
+    # dados compartilhados pelos cenários: token e ids válidos do banco semeado
+
+    def __init__(self, token, categorias, rng):
+        self.cabecalhos = {"Authorization": f"Bearer {token}"}
+        self.categorias = categorias
+        self.rng = rng
+
+
+async def _get(cliente, ctx, caminho, params=None):
+    return [await cliente.get(caminho, params=params, headers=ctx.cabecalhos)]
+
+
+async def cenario_login(cliente, ctx, email, senha):
+    return [await cliente.post("/auth/login", data={"username": email, "password": senha})]
+
+
+async def cenario_listar_titulos(cliente, ctx):
+    return await _get(cliente, ctx, "/titulos", {"limit": 100})
+
+
+async def cenario_listar_titulos_profundo(cliente, ctx):
+    # percorre PAGINAS_PROFUNDAS páginas pelo cursor; cada página conta como uma requisição
+    respostas = []
+    cursor = None
+    for _ in range(PAGINAS_PROFUNDAS):
+        params = {"limit": 100}
+        if cursor:
+            params["cursor"] = cursor
+        resposta = await cliente.get("/titulos", params=params, headers=ctx.cabecalhos)
+        respostas.append(resposta)
+        cursor = resposta.headers.get("X-Proximo-Cursor")
+        if resposta.status_code != 200 or not cursor:
+            break
+    return respostas
+
+
+async def cenario_dashboard(cliente, ctx):
+    return await _get(cliente, ctx, "/dashboard")
+
+
+async def cenario_resumo(cliente, ctx):
+    return await _get(cliente, ctx, "/dashboard/resumo")
+
+
+async def cenario_por_categoria(cliente, ctx):
+    return await _get(cliente, ctx, "/dashboard/por-categoria")
+
+
+async def cenario_fluxo_caixa(cliente, ctx):
+    return await _get(cliente, ctx, "/dashboard/fluxo-caixa")
+
+
+async def cenario_ranking(cliente, ctx):
+    return await _get(cliente, ctx, "/dashboard/ranking")
+
+
+async def cenario_categorias(cliente, ctx):
+    return await _get(cliente, ctx, "/categorias")
+
+
+async def cenario_busca_contato(cliente, ctx):
+    return await _get(cliente, ctx, "/dashboard/busca-contato", {"q": ctx.rng.choice(TERMOS_BUSCA)})
+
+
+async def cenario_criar_titulo(cliente, ctx):
+    # ids 1..N existem no banco semeado (TRUNCATE ... RESTART IDENTITY)
+    corpo = {
+        "descricao": "[bench] carga",
+        "valor": "1200.00",
+        "data_vencimento": date.today().isoformat(),
+        "tipo": "DESPESA",
+        "categoria_id": ctx.rng.choice(ctx.categorias),
+        "contato_id": ctx.rng.randint(1, 100),
+        "conta_bancaria_id": ctx.rng.randint(1, 8),
+        "parcelado": True,
+        "total_parcelas": 12,
+    }
+    return [await cliente.post("/titulos", json=corpo, headers=ctx.cabecalhos)]
+
+
+CENARIOS = {
+    "listar_titulos": cenario_listar_titulos,
+    "listar_titulos_profundo": cenario_listar_titulos_profundo,
+    "dashboard": cenario_dashboard,
+    "dashboard_resumo": cenario_resumo,
+    "dashboard_por_categoria": cenario_por_categoria,
+    "dashboard_fluxo_caixa": cenario_fluxo_caixa,
+    "dashboard_ranking": cenario_ranking,
+    "categorias": cenario_categorias,
+    "busca_contato": cenario_busca_contato,
+    "login": cenario_login,
+    "criar_titulo": cenario_criar_titulo,
+}
+
+
+async def _cliente_virtual(cliente, ctx, funcao, fim, tempos, status):
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        try:
+            respostas = await funcao(cliente, ctx)
+        except httpx.HTTPError as e:
+            status[type(e).__name__] = status.get(type(e).__name__, 0) + 1
+            continue
+        # tempo médio por requisição (cenários de várias páginas dividem pelo número de páginas)
+        duracao_ms = (time.perf_counter() - inicio) * 1000 / len(respostas)
+        for resposta in respostas:
+            tempos.append(duracao_ms)
+            chave = str(resposta.status_code)
+            status[chave] = status.get(chave, 0) + 1
+
+
+async def _rodar_cenario(cliente, ctx, funcao, concorrencia, duracao):
+    tempos, status = [], {}
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    await asyncio.gather(*(
+        _cliente_virtual(cliente, ctx, funcao, fim, tempos, status) for _ in range(concorrencia)
+    ))
+    decorrido = time.perf_counter() - inicio
+    sucesso = sum(v for k, v in status.items() if k.isdigit() and int(k) < 400)
+    return {
+        "requisicoes": len(tempos),
+        "erros": sum(status.values()) - sucesso,
+        "status": dict(sorted(status.items())),
+        "vazao_rps": round(len(tempos) / decorrido, 2),
+        "p50_ms": round(percentil(tempos, 0.50), 2),
+        "p95_ms": round(percentil(tempos, 0.95), 2),
+        "p99_ms": round(percentil(tempos, 0.99), 2),
+        "max_ms": round(max(tempos, default=0.0), 2),
+    }
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def executar(args):
+    from benchmarks.semear import EMAIL_BENCH, SENHA_BENCH
+
+    email = args.email or EMAIL_BENCH
+    senha = args.senha or SENHA_BENCH
+    nomes = args.cenarios or list(CENARIOS)
+
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=60) as cliente:
+        resposta = await cliente.post("/auth/login", data={"username": email, "password": senha})
+        resposta.raise_for_status()
+        ctx = Contexto(resposta.json()["access_token"], [], random.Random(args.semente))
+        categorias = await cliente.get("/categorias", headers=ctx.cabecalhos)
+        categorias.raise_for_status()
+        ctx.categorias = [c["id"] for c in categorias.json()]
+
+        resultados = {}
+        for nome in nomes:
+            funcao = CENARIOS[nome]
+            if nome == "login":
+                funcao = lambda cl, c: cenario_login(cl, c, email, senha)
+            # aquecimento: conexões abertas, caches e planos preparados antes de medir
+            await _rodar_cenario(cliente, ctx, funcao, args.concorrencia, args.aquecimento)
+            resultados[nome] = await _rodar_cenario(cliente, ctx, funcao, args.concorrencia, args.duracao)
+            r = resultados[nome]
+            print(f"{nome:<26} | {r['vazao_rps']:>9.1f} req/s | p50 {r['p50_ms']:>8.2f} | "
+                  f"p95 {r['p95_ms']:>8.2f} | p99 {r['p99_ms']:>8.2f} | erros {r['erros']}")
+
+    relatorio = {
+        "commit": _commit_atual(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "escala": args.escala,
+        "url": args.url,
+        "concorrencia": args.concorrencia,
+        "duracao_s": args.duracao,
+        "semente": args.semente,
+        "cenarios": resultados,
+    }
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(relatorio, arquivo, indent=2, ensure_ascii=False, sort_keys=True)
+            arquivo.write("\n")
+        print(f"Relatório salvo em {args.saida}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga dos endpoints da API")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", help="padrão: usuário criado por benchmarks.semear")
+    parser.add_argument("--senha")
+    parser.add_argument("--escala", default="desconhecida", help="rótulo da escala semeada (vai para o relatório)")
+    parser.add_argument("--concorrencia", type=int, default=16, help="clientes simultâneos por cenário")
+    parser.add_argument("--duracao", type=float, default=20, help="segundos medidos por cenário")
+    parser.add_argument("--aquecimento", type=float, default=3, help="segundos descartados antes de cada cenário")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--cenarios", nargs="+", choices=CENARIOS, help="padrão: todos, na ordem fixa")
+    parser.add_argument("--saida", help="arquivo JSON do relatório")
+    args = parser.parse_args()
+
+    asyncio.run(executar(args))
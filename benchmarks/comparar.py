@@ -0,0 +1,39 @@
+import argparse
+import json
+
+# Compara dois relatórios de benchmarks.carga (ex: antes e depois de uma mudança em rotas.py).
+#
+#   python -m benchmarks.comparar resultados/base.json resultados/novo.json
+#
+# Variação positiva em vazão é melhora; em latência, piora.
+
+METRICAS = ("vazao_rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _variacao(antes, depois):
+    if not antes:
+        return "    n/a"
+    return f"{(depois - antes) / antes * 100:+7.1f}%"
+
+
+def comparar(base: dict, novo: dict):
+    print(f"base: {base.get('commit')} ({base.get('escala')})  novo: {novo.get('commit')} ({novo.get('escala')})")
+    print(f"{'cenário':<26} | " + " | ".join(f"{m:>20}" for m in METRICAS))
+    print("-" * (29 + 23 * len(METRICAS)))
+    for nome in sorted(set(base["cenarios"]) | set(novo["cenarios"])):
+        a, b = base["cenarios"].get(nome), novo["cenarios"].get(nome)
+        if a is None or b is None:
+            print(f"{nome:<26} | só em {'novo' if a is None else 'base'}")
+            continue
+        colunas = [f"{b[m]:>10.2f} {_variacao(a[m], b[m])}" for m in METRICAS]
+        print(f"{nome:<26} | " + " | ".join(f"{c:>20}" for c in colunas))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara dois relatórios de benchmarks.carga")
+    parser.add_argument("base")
+    parser.add_argument("novo")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as a, open(args.novo, encoding="utf-8") as b:
+        comparar(json.load(a), json.load(b))
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import time
+
+import httpx
+
+# Latência do dashboard durante uma tempestade de logins.
+#
+# Mede o p50/p99 de GET /dashboard em duas fases: sem carga e com N clientes fazendo
+# login em loop. Com o bcrypt no pool dedicado (seguranca.BCRYPT_WORKERS) o p99 do
+# dashboard deve ficar praticamente igual nas duas fases; os logins excedentes recebem 503.
+#
+# Requer a API rodando e um usuário válido:
+#   pip install -r benchmarks/requirements.txt
+#   python -m benchmarks.login_storm --url http://localhost:8000 --email admin@x.com --senha ...
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+async def _login(cliente, email, senha):
+    return await cliente.post("/auth/login", data={"username": email, "password": senha})
+
+
+async def _medir_dashboard(cliente, token, duracao):
+    tempos = []
+    fim = time.perf_counter() + duracao
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        resposta = await cliente.get("/dashboard", headers={"Authorization": f"Bearer {token}"})
+        resposta.raise_for_status()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+async def _tempestade(cliente, email, senha, parar: asyncio.Event, contagem: dict):
+    while not parar.is_set():
+        resposta = await _login(cliente, email, senha)
+        contagem[resposta.status_code] = contagem.get(resposta.status_code, 0) + 1
+
+
+async def executar(url, email, senha, logins_concorrentes, duracao):
+    limites = httpx.Limits(max_connections=logins_concorrentes + 10)
+    async with httpx.AsyncClient(base_url=url, limits=limites, timeout=30) as cliente:
+        resposta = await _login(cliente, email, senha)
+        resposta.raise_for_status()
+        token = resposta.json()["access_token"]
+
+        base = await _medir_dashboard(cliente, token, duracao)
+
+        parar = asyncio.Event()
+        contagem = {}
+        tarefas = [
+            asyncio.create_task(_tempestade(cliente, email, senha, parar, contagem))
+            for _ in range(logins_concorrentes)
+        ]
+        sob_carga = await _medir_dashboard(cliente, token, duracao)
+        parar.set()
+        await asyncio.gather(*tarefas)
+
+    print(f"{'fase':<22} | {'req':>6} | {'p50 (ms)':>9} | {'p99 (ms)':>9}")
+    print("-" * 56)
+    for nome, tempos in (("sem logins", base), (f"{logins_concorrentes} logins paralelos", sob_carga)):
+        print(f"{nome:<22} | {len(tempos):>6} | {percentil(tempos, 0.5):>9.2f} | {percentil(tempos, 0.99):>9.2f}")
+    print(f"respostas de login por status: {dict(sorted(contagem.items()))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="p99 do dashboard durante tempestade de logins")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--senha", required=True)
+    parser.add_argument("--logins", type=int, default=50, help="clientes fazendo login em paralelo")
+    parser.add_argument("--duracao", type=float, default=15, help="segundos por fase")
+    args = parser.parse_args()
+
+    asyncio.run(executar(args.url, args.email, args.senha, args.logins, args.duracao))
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import registry
+
+# Latência de criação de títulos parcelados: caminho antigo (commit + refresh por parcela)
+# contra o atual (um único INSERT ... RETURNING via eager_defaults).
+# O caminho antigo grava por um mapeamento próprio da tabela 'titulos' com eager_defaults
+# desligado, como era o modelo antes da mudança; com o mapper atual ele também ganharia os
+# defaults do servidor no RETURNING e a comparação mediria só o custo dos refreshes.
+#
+# Use um banco descartável: o benchmark grava títulos marcados com '[bench]',
+# apaga todos ao final e reconstrói o rollup do dashboard.
+#
+#   python -m benchmarks.parcelamento --repeticoes 20
+
+PARCELAS = (1, 12, 120, 360)
+MARCADOR = "[bench]"
+
+
+async def _garantir_cadastros(db):
+    from app.modelo import Categoria, Contato, ContaBancaria
+
+    categoria = await db.scalar(select(Categoria).limit(1)) or Categoria(nome=f"{MARCADOR} categoria")
+    contato = await db.scalar(select(Contato).limit(1)) or Contato(nome=f"{MARCADOR} contato")
+    conta = await db.scalar(select(ContaBancaria).limit(1)) or ContaBancaria(descricao=f"{MARCADOR} conta")
+    db.add_all([categoria, contato, conta])
+    await db.commit()
+    return categoria.id, contato.id, conta.id
+
+
+class _TituloAntigo:
+    pass
+
+
+def _mapear_antigo():
+    from app.modelo import Titulo
+
+    if not hasattr(_TituloAntigo, "__mapper__"):
+        registry().map_imperatively(_TituloAntigo, Titulo.__table__, eager_defaults=False)
+    return Titulo.__table__.columns.keys()
+
+
+async def _criar_antigo(db, dados):
+    from app import agregados, servicos
+
+    colunas = _mapear_antigo()
+    titulos = []
+    for parcela in servicos.criar_titulos_parcelados(dados):
+        titulo = _TituloAntigo()
+        for coluna in colunas:
+            valor = getattr(parcela, coluna)
+            if valor is not None:
+                setattr(titulo, coluna, valor)
+        titulos.append(titulo)
+    db.add_all(titulos)
+    await agregados.registrar_insercao(db, titulos)
+    await db.commit()
+    for t in titulos:
+        await db.refresh(t)
+    return titulos
+
+
+async def _criar_atual(db, dados):
+    from app import agregados, servicos
+
+    titulos = servicos.criar_titulos_parcelados(dados)
+    db.add_all(titulos)
+    await db.flush()
+    await agregados.registrar_insercao(db, titulos)
+    await db.commit()
+    return titulos
+
+
+async def medir(repeticoes: int):
+    from app import agregados
+    from app.database import SessionLocal
+    from app.modelo import Titulo
+    from app.schemas import TituloCreate
+
+    async with SessionLocal() as db:
+        categoria_id, contato_id, conta_id = await _garantir_cadastros(db)
+
+    resultados = {}
+    try:
+        for parcelas in PARCELAS:
+            dados = TituloCreate(
+                descricao=f"{MARCADOR} financiamento",
+                valor=Decimal("100000.00"),
+                data_vencimento=date.today(),
+                tipo="DESPESA",
+                categoria_id=categoria_id,
+                contato_id=contato_id,
+                conta_bancaria_id=conta_id,
+                parcelado=parcelas > 1,
+                total_parcelas=parcelas,
+            )
+            for nome, funcao in (("refresh_por_linha", _criar_antigo), ("insert_returning", _criar_atual)):
+                tempos = []
+                for _ in range(repeticoes):
+                    async with SessionLocal() as db:
+                        inicio = time.perf_counter()
+                        await funcao(db, dados)
+                        tempos.append((time.perf_counter() - inicio) * 1000)
+                resultados[(parcelas, nome)] = tempos
+    finally:
+        async with SessionLocal() as db:
+            await db.execute(delete(Titulo).where(Titulo.descricao.startswith(MARCADOR)))
+            await db.commit()
+            await agregados.reconstruir(db)
+
+    print(f"{'parcelas':>8} | {'caminho':<18} | {'p50 (ms)':>9} | {'p95 (ms)':>9}")
+    print("-" * 54)
+    for (parcelas, nome), tempos in resultados.items():
+        tempos.sort()
+        p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+        print(f"{parcelas:>8} | {nome:<18} | {statistics.median(tempos):>9.2f} | {p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(description="Latência de criação de títulos parcelados")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(medir(args.repeticoes))
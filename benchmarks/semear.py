@@ -0,0 +1,102 @@
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import select, text
+
+# Carga determinística do banco para os benchmarks.
+#
+# Mesma escala + mesma semente = exatamente os mesmos dados (ids, valores, datas), então
+# dois commits medidos com benchmarks.carga comparam a mesma coisa. As datas são relativas
+# a DATA_BASE, não a date.today(), pelo mesmo motivo.
+#
+# APAGA todos os títulos, anexos, contatos, categorias e contas: use um banco descartável.
+#
+#   python -m benchmarks.semear --escala 1m --semente 42
+
+ESCALAS = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+DATA_BASE = date(2026, 1, 1)
+
+EMAIL_BENCH = "bench@halon.local"
+SENHA_BENCH = "bench-halon"
+
+
+async def semear(escala: str, semente: int, workers: int):
+    from app import agregados, versao
+    from app.database import SessionLocal, engine
+    from app.modelo import Usuario, Categoria, Contato, ContaBancaria
+    from app.popular import CATEGORIAS_MOCK, BANCOS_BRASIL, PREFIXOS, RAMOS, SUFIXOS, carregar_titulos
+    from app.seguranca import gerar_hash_senha
+
+    total = ESCALAS[escala]
+    rng = random.Random(semente)
+    inicio = time.perf_counter()
+
+    async with SessionLocal() as db:
+        await db.execute(text(
+            "TRUNCATE anexos, titulos, resumo_mensal, saldo_contato, contatos, categorias, contas_bancarias "
+            "RESTART IDENTITY CASCADE"
+        ))
+
+        db.add_all([Categoria(nome=c["nome"], descricao="bench") for c in CATEGORIAS_MOCK])
+        db.add_all([
+            ContaBancaria(descricao=f"Conta PJ - {banco}", nome_banco=banco, saldo_inicial=Decimal(rng.randint(10_000, 500_000)))
+            for banco in BANCOS_BRASIL[:8]
+        ])
+        # nomes únicos: combinação + número sequencial (a busca-contato precisa de prefixos variados)
+        qtd_contatos = max(100, total // 100)
+        db.add_all([
+            Contato(nome=f"{rng.choice(PREFIXOS)} {rng.choice(RAMOS)} {rng.choice(SUFIXOS)} {i}")
+            for i in range(qtd_contatos)
+        ])
+
+        if await db.scalar(select(Usuario).where(Usuario.email == EMAIL_BENCH)) is None:
+            db.add(Usuario(email=EMAIL_BENCH, senha_hash=gerar_hash_senha(SENHA_BENCH)))
+        await db.commit()
+
+        tipos = {c["nome"]: c["tipo"] for c in CATEGORIAS_MOCK}
+        cadastros = (
+            [(c.id, c.nome, tipos[c.nome]) for c in (await db.execute(select(Categoria).order_by(Categoria.id))).scalars()],
+            list((await db.execute(select(Contato.id).order_by(Contato.id))).scalars()),
+            list((await db.execute(select(ContaBancaria.id).order_by(ContaBancaria.id))).scalars()),
+        )
+
+        # mesmo carregador do app.popular (COPY + ids pré-alocados, lotes em processos):
+        # 18 meses para trás e 6 para frente de DATA_BASE, histórico + projeção
+        await carregar_titulos(
+            total, cadastros, semente=semente,
+            de=DATA_BASE - timedelta(days=540), ate=DATA_BASE + timedelta(days=180),
+            hoje=DATA_BASE, workers=workers,
+        )
+
+        # um único recálculo no fim sai mais barato que deltas por lote
+        await agregados.reconstruir(db)
+        await versao.registrar_escrita(db)
+        await db.commit()
+
+    # estatísticas atualizadas: planos iguais aos de um banco em regime
+    async with engine.execution_options(isolation_level="AUTOCOMMIT").connect() as conexao:
+        await conexao.execute(text("VACUUM ANALYZE"))
+
+    print(f"Escala {escala} (semente {semente}) carregada em {time.perf_counter() - inicio:.1f}s")
+    print(f"Usuário do benchmark: {EMAIL_BENCH} / {SENHA_BENCH}")
+
+
+if __name__ == "__main__":
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(description="Carga determinística do banco para benchmarks")
+    parser.add_argument("--escala", choices=ESCALAS, default="10k")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processos geradores (não altera os dados)")
+    args = parser.parse_args()
+
+    asyncio.run(semear(args.escala, args.semente, args.workers))
@@ -0,0 +1,100 @@
+import argparse
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List
+
+from pydantic import TypeAdapter
+
+# Micro-benchmark da serialização das listas de títulos (GET /titulos, POST /titulos):
+# caminho antigo (objetos do ORM -> validação from_attributes -> jsonable_encoder -> json.dumps)
+# contra o atual (tuplas de colunas -> dicts -> TypeAdapter(List[TituloLinha]).dump_json).
+#
+# Não usa banco: as linhas são geradas em memória, com a mesma forma das devolvidas pelo asyncpg.
+# A montagem dos objetos Titulo entra na medida do caminho antigo como aproximação do custo de
+# hidratação do ORM. Antes de medir, confere que os dois caminhos geram exatamente os mesmos bytes.
+#
+#   python -m benchmarks.serializacao --linhas 100 1000 --repeticoes 50
+
+DESCRICOES = ["Aluguel", "Energia elétrica", "Consultoria São Paulo", "Licença de software", "Manutenção"]
+
+
+def gerar_linhas(quantidade: int, semente: int) -> list:
+    # tuplas na ordem de schemas.CAMPOS_TITULO_RESPONSE
+    rng = random.Random(semente)
+    base = datetime(2026, 1, 1, 8, 30)
+    linhas = []
+    for i in range(1, quantidade + 1):
+        total_parcelas = rng.choice((1, 1, 12, 36))
+        linhas.append((
+            rng.choice(DESCRICOES),
+            Decimal(rng.randint(100, 5_000_000)) / 100,
+            date(2026, 1, 1) + timedelta(days=rng.randint(0, 365)),
+            rng.choice(("RECEITA", "DESPESA")),
+            rng.randint(1, 20),
+            rng.randint(1, 1000),
+            rng.randint(1, 8),
+            i,
+            rng.choice(("PENDENTE", "PAGO", "VENCIDO", "CANCELADO")),
+            rng.randint(1, total_parcelas),
+            total_parcelas,
+            base + timedelta(seconds=i, microseconds=rng.randint(0, 999_999)),
+        ))
+    return linhas
+
+
+def caminho_antigo(linhas, adaptador) -> bytes:
+    from app import versao
+    from app.modelo import Titulo
+    from app.schemas import CAMPOS_TITULO_RESPONSE
+
+    titulos = [Titulo(**dict(zip(CAMPOS_TITULO_RESPONSE, linha))) for linha in linhas]
+    return versao._montar_resposta(titulos, {}, adaptador).body
+
+
+def caminho_atual(linhas) -> bytes:
+    from app.rotas import ADAPTADOR_LINHAS_TITULOS
+    from app.schemas import CAMPOS_TITULO_RESPONSE
+
+    return ADAPTADOR_LINHAS_TITULOS.dump_json([dict(zip(CAMPOS_TITULO_RESPONSE, linha)) for linha in linhas])
+
+
+def _medir(funcao, repeticoes: int) -> list:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def medir(tamanhos, repeticoes: int, semente: int):
+    from app.schemas import TituloResponse
+
+    adaptador_antigo = TypeAdapter(List[TituloResponse])
+
+    print(f"{'linhas':>7} | {'antigo p50 (ms)':>16} | {'atual p50 (ms)':>15} | {'ganho':>6} | {'bytes':>9}")
+    print("-" * 66)
+    for quantidade in tamanhos:
+        linhas = gerar_linhas(quantidade, semente)
+
+        # a conferência também serve de aquecimento (imports, schemas compilados)
+        antigo, atual = caminho_antigo(linhas, adaptador_antigo), caminho_atual(linhas)
+        if antigo != atual:
+            raise SystemExit(f"Saídas diferentes com {quantidade} linhas:\n{antigo[:300]}\n{atual[:300]}")
+
+        t_antigo = statistics.median(_medir(lambda: caminho_antigo(linhas, adaptador_antigo), repeticoes))
+        t_atual = statistics.median(_medir(lambda: caminho_atual(linhas), repeticoes))
+        print(f"{quantidade:>7} | {t_antigo:>16.3f} | {t_atual:>15.3f} | {t_antigo / t_atual:>5.1f}x | {len(atual):>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serialização de listas de títulos: ORM + validação x tuplas + dump_json")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    medir(args.linhas, args.repeticoes, args.semente)
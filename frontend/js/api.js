@@ -51,22 +51,18 @@ export const authService = {
 };
 
 export const dashboardService = {
-    // Busca todos os dados do Dashboard em paralelo (Performance)
-    carregarTudo: async () => {
-        const [resumo, categorias, fluxo, ultimos, ranking] = await Promise.all([
-            api.get('/dashboard/resumo'),        // Cards do topo
-            api.get('/dashboard/por-categoria'), // Gráfico Pizza
-            api.get('/dashboard/fluxo-caixa'),   // Gráfico Barras
-            api.get('/titulos?limit=10'),        // Tabela
-            api.get('/dashboard/ranking')        // Devedores/Credores
-        ]);
+    // Busca todos os dados do Dashboard em uma única requisição (/dashboard)
+    // Uma autenticação e uma conexão no backend, em vez de 5 requisições paralelas
+    // filtros: { de, ate, conta_bancaria_id, categoria_id } (todos opcionais)
+    carregarTudo: async (filtros = {}) => {
+        const { data } = await api.get('/dashboard', { params: filtros });
         
         return {
-            resumo: resumo.data,
-            categorias: categorias.data,
-            fluxo: fluxo.data,
-            titulos: ultimos.data,
-            ranking: ranking.data
+            resumo: data.resumo,
+            categorias: data.categorias,
+            fluxo: data.fluxo,
+            titulos: data.titulos,
+            ranking: data.ranking
         };
     },
 
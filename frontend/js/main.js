@@ -4,9 +4,24 @@ import { ui } from './ui.js';
 // ESTADO GLOBAL
 const state = {
     token: localStorage.getItem('token_fin'),
-    searchTimeout: null // Controle do debounce da busca
+    searchTimeout: null, // Controle do debounce da busca
+    periodo: periodoPadrao() // Recorte do dashboard (de/ate em YYYY-MM-DD)
 };
 
+// Últimos 12 meses fechados em meses inteiros: o backend lê esses meses direto do rollup
+function periodoPadrao() {
+    const hoje = new Date();
+    const inicio = new Date(hoje.getFullYear(), hoje.getMonth() - 11, 1);
+    const fim = new Date(hoje.getFullYear(), hoje.getMonth() + 1, 0);
+    return { de: formatarDataIso(inicio), ate: formatarDataIso(fim) };
+}
+
+function formatarDataIso(data) {
+    const mes = String(data.getMonth() + 1).padStart(2, '0');
+    const dia = String(data.getDate()).padStart(2, '0');
+    return `${data.getFullYear()}-${mes}-${dia}`;
+}
+
 
 // INICIALIZAÇÃO
 document.addEventListener('DOMContentLoaded', () => {
@@ -21,6 +36,7 @@ document.addEventListener('DOMContentLoaded', () => {
         ui.toggleScreens(false);
     }
 
+    ui.preencherPeriodo(state.periodo);
     setupBuscaInteligente();
 });
 
@@ -99,7 +115,7 @@ async function initDashboard() {
     try {
         // Carrega Dados + Lista de Categorias
         const [dados, categoriasLista] = await Promise.all([
-            dashboardService.carregarTudo(),
+            dashboardService.carregarTudo(state.periodo),
             dashboardService.listarCategorias()
         ]);
         
@@ -126,6 +142,16 @@ async function initDashboard() {
     }
 }
 
+window.aplicarPeriodo = () => {
+    const periodo = ui.lerPeriodo();
+    if (periodo.de && periodo.ate && periodo.ate < periodo.de) {
+        alert("A data final deve ser igual ou posterior à inicial.");
+        return;
+    }
+    state.periodo = periodo;
+    initDashboard();
+};
+
 window.salvarTitulo = async () => {
     const btn = document.querySelector('#modalNovo .btn-primary');
     const originalText = btn.innerText;
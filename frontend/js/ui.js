@@ -23,6 +23,22 @@ export const ui = {
         show ? el.classList.remove('hidden') : el.classList.add('hidden');
     },
 
+    // PERÍODO DO DASHBOARD
+    preencherPeriodo: (periodo) => {
+        document.getElementById('filtroDe').value = periodo.de || '';
+        document.getElementById('filtroAte').value = periodo.ate || '';
+    },
+
+    // campos vazios = sem limite naquele lado (o backend agrega todo o histórico)
+    lerPeriodo: () => {
+        const periodo = {};
+        const de = document.getElementById('filtroDe').value;
+        const ate = document.getElementById('filtroAte').value;
+        if (de) periodo.de = de;
+        if (ate) periodo.ate = ate;
+        return periodo;
+    },
+
     //CARDS E TABELAS
     renderCards: (dados) => {
         const setVal = (id, val, colorir = false) => {
@@ -0,0 +1,92 @@
+import os
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+# Precisa de um Postgres descartável (init_db cria as tabelas; cada teste desfaz a própria transação):
+#   TEST_DATABASE_URL=postgresql+asyncpg://... python -m pytest tests
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if not TEST_DATABASE_URL:
+    pytest.skip("TEST_DATABASE_URL não definida", allow_module_level=True)
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ.setdefault("SECRET_KEY", "teste")
+
+from sqlalchemy import select, update
+
+from app import parcelamentos, servicos
+from app.database import SessionLocal, init_db
+from app.modelo import Categoria, Contato, ContaBancaria, Titulo, StatusTitulo
+from app.schemas import TituloCreate
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    await init_db()
+    async with SessionLocal() as sessao:
+        yield sessao
+
+
+async def _criar_serie(db, primeiro: date, parcelas: int, pagas: int):
+    categoria, contato, conta = Categoria(nome="[teste]"), Contato(nome="[teste]"), ContaBancaria(descricao="[teste]")
+    db.add_all([categoria, contato, conta])
+    await db.flush()
+    titulos = servicos.criar_titulos_parcelados(TituloCreate(
+        descricao="[teste] série dia 31",
+        valor=Decimal("400.00"),
+        data_vencimento=primeiro,
+        tipo="DESPESA",
+        categoria_id=categoria.id,
+        contato_id=contato.id,
+        conta_bancaria_id=conta.id,
+        parcelado=True,
+        total_parcelas=parcelas,
+    ))
+    db.add_all(titulos)
+    await db.flush()
+    grupo = titulos[0].id_transacao_pai
+    await db.execute(
+        update(Titulo)
+        .where(Titulo.id_transacao_pai == grupo, Titulo.numero_parcela <= pagas)
+        .values(status=StatusTitulo.PAGO)
+    )
+    return grupo
+
+
+async def _vencimentos(db, grupo) -> list:
+    return list((await db.scalars(
+        select(Titulo.data_vencimento).where(Titulo.id_transacao_pai == grupo).order_by(Titulo.numero_parcela)
+    )).all())
+
+
+async def test_reagendar_mantem_dia_31_com_primeira_parcela_paga(db):
+    # 31/01 (paga), 28/02, 31/03, 30/04: a primeira em aberto foi limitada a 28
+    ano = date.today().year + 2
+    try:
+        grupo = await _criar_serie(db, date(ano, 1, 31), parcelas=4, pagas=1)
+        assert await _vencimentos(db, grupo) == [date(ano, 1, 31), date(ano, 2, 28), date(ano, 3, 31), date(ano, 4, 30)]
+
+        assert await parcelamentos.reagendar_grupo(db, grupo, 0) == 3
+        assert await _vencimentos(db, grupo) == [date(ano, 1, 31), date(ano, 2, 28), date(ano, 3, 31), date(ano, 4, 30)]
+
+        await parcelamentos.reagendar_grupo(db, grupo, 1)
+        assert await _vencimentos(db, grupo) == [date(ano, 1, 31), date(ano, 3, 31), date(ano, 4, 30), date(ano, 5, 31)]
+    finally:
+        await db.rollback()
+
+
+async def test_reagendar_primeira_em_aberto_em_30_04(db):
+    ano = date.today().year + 2
+    try:
+        grupo = await _criar_serie(db, date(ano, 1, 31), parcelas=4, pagas=3)
+        await parcelamentos.reagendar_grupo(db, grupo, 1)
+        assert (await _vencimentos(db, grupo))[-1] == date(ano, 5, 31)
+    finally:
+        await db.rollback()